@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+A/B the analysis pipeline modes on stored bet slips.
+
+Replays the images of stored analyses through two_pass and single_pass
+(alternating which goes first, so neither always gets the warm caches) and
+compares latency per stage, JSON parse rate, agreement on the legs and win
+probability, and - for slips with a won/lost outcome - Brier score.
+
+Usage:
+    python ab_pipeline.py [--limit N] [--graded-only] [--output results.jsonl]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from analysis_pipeline import PIPELINE_MODES, extract_analysis_json, run_analysis_pipeline
+from calibration import GRADED_OUTCOMES
+from prompt_builder import load_tokenizer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def load_corpus(db, limit: int, graded_only: bool) -> list:
+    query = {"image_data": {"$exists": True, "$ne": None}}
+    if graded_only:
+        query["actual_outcome"] = {"$in": GRADED_OUTCOMES}
+    return await db.bet_analyses.find(
+        query,
+        {"_id": 0, "id": 1, "image_data": 1, "actual_outcome": 1, "win_probability": 1}
+    ).sort("created_at", -1).limit(limit).to_list(limit)
+
+
+async def run_mode(mode: str, slip: dict) -> dict:
+    try:
+        run = await run_analysis_pipeline(slip['image_data'], None, mode)
+    except Exception as e:
+        return {"mode": mode, "error": str(e)}
+    result = extract_analysis_json(run.response) or {}
+    probability = result.get('win_probability')
+    try:
+        probability = float(probability) if probability is not None else None
+    except (TypeError, ValueError):
+        probability = None
+    return {
+        "mode": mode,
+        "timings": run.timings,
+        "prompt_tokens": run.prompt.tokens,
+        "parsed": bool(result),
+        "win_probability": probability,
+        "legs": len(result.get('individual_bets') or []),
+        "teams": run.team_names,
+        "models": run.models,
+        "extraction_confidence": run.extraction_confidence
+    }
+
+
+def summarize(rows: list) -> dict:
+    summary = {}
+    for mode in PIPELINE_MODES:
+        runs = [row[mode] for row in rows if mode in row]
+        ok = [r for r in runs if 'error' not in r]
+        totals = [r['timings']['total_ms'] for r in ok]
+        graded = [
+            (r['win_probability'] / 100, 1.0 if row['actual_outcome'] == 'won' else 0.0)
+            for row, r in ((row, row[mode]) for row in rows if mode in row)
+            if 'error' not in r and r['win_probability'] is not None and row.get('actual_outcome') in GRADED_OUTCOMES
+        ]
+        summary[mode] = {
+            "runs": len(runs),
+            "errors": len(runs) - len(ok),
+            "parse_rate": round(sum(r['parsed'] for r in ok) / len(ok) * 100, 1) if ok else None,
+            "median_total_ms": statistics.median(totals) if totals else None,
+            "p90_total_ms": sorted(totals)[int(len(totals) * 0.9)] if totals else None,
+            "mean_prompt_tokens": round(statistics.mean(r['prompt_tokens'] for r in ok)) if ok else None,
+            "brier": round(statistics.mean((p - y) ** 2 for p, y in graded), 4) if graded else None,
+            "graded": len(graded)
+        }
+
+    pairs = [
+        (row['two_pass'], row['single_pass']) for row in rows
+        if 'error' not in row.get('two_pass', {'error': 1}) and 'error' not in row.get('single_pass', {'error': 1})
+    ]
+    probability_pairs = [(a['win_probability'], b['win_probability']) for a, b in pairs
+                         if a['win_probability'] is not None and b['win_probability'] is not None]
+    summary["agreement"] = {
+        "pairs": len(pairs),
+        "same_leg_count": round(sum(a['legs'] == b['legs'] for a, b in pairs) / len(pairs) * 100, 1) if pairs else None,
+        "same_teams": round(sum(a['teams'] == b['teams'] for a, b in pairs) / len(pairs) * 100, 1) if pairs else None,
+        "mean_abs_probability_diff": round(statistics.mean(abs(a - b) for a, b in probability_pairs), 2) if probability_pairs else None
+    }
+    return summary
+
+
+async def main(limit: int, graded_only: bool, output: Path):
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    corpus = await load_corpus(db, limit, graded_only)
+    await load_tokenizer()
+    client.close()
+    print(f"📊 {len(corpus)} stored slips")
+
+    rows = []
+    for i, slip in enumerate(corpus):
+        order = PIPELINE_MODES if i % 2 == 0 else tuple(reversed(PIPELINE_MODES))
+        row = {"id": slip['id'], "actual_outcome": slip.get('actual_outcome')}
+        for mode in order:
+            row[mode] = await run_mode(mode, slip)
+        rows.append(row)
+        times = ", ".join(f"{m} {row[m].get('timings', {}).get('total_ms', 'error')}ms" for m in PIPELINE_MODES)
+        print(f"  [{i + 1}/{len(corpus)}] {slip['id']}: {times}")
+
+    if output:
+        with open(output, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        print(f"Wrote per-slip results to {output}")
+    print(json.dumps(summarize(rows), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--graded-only', action='store_true')
+    parser.add_argument('--output', type=Path, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.graded_only, args.output))
@@ -4,11 +4,13 @@ Admin Dashboard & Subscription System for BetrSlip
 - Device fingerprinting to prevent VPN abuse
 - Usage tracking (5 free analyses)
 - Stripe subscription ($5/month)
+- Materialized admin dashboard counters
 """
 
 import os
+import asyncio
 import hashlib
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict
 from pydantic import BaseModel, Field
 from fastapi import HTTPException, Request
@@ -21,6 +23,11 @@ ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'hundojeff@icloud.com')
 FREE_ANALYSIS_LIMIT = int(os.environ.get('FREE_ANALYSIS_LIMIT', '5'))
 SUBSCRIPTION_PRICE = float(os.environ.get('SUBSCRIPTION_PRICE', '5.00'))
 
+# Dashboard counters live in a single document of the `stats` collection
+ADMIN_STATS_ID = "admin_dashboard"
+ADMIN_STATS_REBUILD_INTERVAL = timedelta(hours=int(os.environ.get('ADMIN_STATS_REBUILD_HOURS', '6')))
+_admin_stats_rebuild_task: Optional[asyncio.Task] = None
+
 
 # ===== MODELS =====
 
@@ -184,7 +191,7 @@ async def check_usage_limit(db, user_id: str, device_fingerprint: str, ip_addres
             "analyses_count": 0,
             "device_fingerprints": [device_fingerprint],
             "ip_addresses": [ip_address],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.user_usage.insert_one(usage)
     else:
@@ -227,7 +234,7 @@ async def increment_usage(db, user_id: str):
         {"user_id": user_id},
         {
             "$inc": {"analyses_count": 1},
-            "$set": {"last_analysis_at": datetime.now(timezone.utc).isoformat()}
+            "$set": {"last_analysis_at": datetime.now(timezone.utc)}
         },
         upsert=True
     )
@@ -242,7 +249,7 @@ async def update_device_fingerprint(db, user_id: str, fingerprint: str, ip_addre
                 "device_fingerprints": fingerprint,
                 "ip_addresses": ip_address
             },
-            "$set": {"last_login": datetime.now(timezone.utc).isoformat()}
+            "$set": {"last_login": datetime.now(timezone.utc)}
         }
     )
 
@@ -284,52 +291,180 @@ async def get_all_users(db, skip: int = 0, limit: int = 50) -> List[dict]:
     return result
 
 
+# ===== MATERIALIZED DASHBOARD COUNTERS =====
+
+def top_bet_bucket(win_probability: float) -> Optional[str]:
+    """Return the dashboard counter a top bet falls into"""
+    if win_probability >= 80:
+        return "elite_bets"
+    elif win_probability >= 70:
+        return "strong_bets"
+    elif win_probability >= 60:
+        return "good_bets"
+    return None
+
+
+def top_bet_counter_deltas(top_bet: dict, sign: int = 1) -> Dict[str, float]:
+    """Counter deltas for inserting (sign=1) or deleting (sign=-1) a top bet"""
+    win_probability = float(top_bet.get('win_probability', 0) or 0)
+    deltas = {
+        "total_top_bets": sign,
+        "top_bets_probability_sum": sign * win_probability
+    }
+    bucket = top_bet_bucket(win_probability)
+    if bucket:
+        deltas[bucket] = sign
+    return deltas
+
+
+async def increment_admin_stats(db, **deltas):
+    """Apply $inc deltas to the dashboard counters document"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    try:
+        await db.stats.update_one(
+            {"_id": ADMIN_STATS_ID},
+            {"$inc": deltas},
+            upsert=True
+        )
+    except Exception as e:
+        # Counters are rebuilt periodically, a missed increment only causes drift
+        logger.error(f"Error updating admin stats counters: {str(e)}")
+
+
+def subscription_counter_delta(previous_status: Optional[str], new_status: Optional[str]) -> int:
+    """Change in active subscriber count for a status transition"""
+    return int(new_status == 'active') - int(previous_status == 'active')
+
+
+async def rebuild_admin_stats(db) -> dict:
+    """Recount every dashboard counter from the source collections to correct drift"""
+    top_bets_summary = await db.top_bets.aggregate([
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "probability_sum": {"$sum": "$win_probability"},
+            "elite": {"$sum": {"$cond": [{"$gte": ["$win_probability", 80]}, 1, 0]}},
+            "strong": {"$sum": {"$cond": [{"$and": [
+                {"$gte": ["$win_probability", 70]}, {"$lt": ["$win_probability", 80]}
+            ]}, 1, 0]}},
+            "good": {"$sum": {"$cond": [{"$and": [
+                {"$gte": ["$win_probability", 60]}, {"$lt": ["$win_probability", 70]}
+            ]}, 1, 0]}}
+        }}
+    ]).to_list(1)
+    top_bets_summary = top_bets_summary[0] if top_bets_summary else {}
+    
+    counters = {
+        "total_users": await db.users.count_documents({}),
+        "banned_users": await db.users.count_documents({"is_banned": True}),
+        "active_subscribers": await db.subscriptions.count_documents({"subscription_status": "active"}),
+        "total_analyses": await db.bet_analyses.count_documents({}),
+        "total_top_bets": top_bets_summary.get("total", 0),
+        "top_bets_probability_sum": top_bets_summary.get("probability_sum", 0) or 0,
+        "elite_bets": top_bets_summary.get("elite", 0),
+        "strong_bets": top_bets_summary.get("strong", 0),
+        "good_bets": top_bets_summary.get("good", 0),
+        "rebuilt_at": datetime.now(timezone.utc)
+    }
+    
+    await db.stats.update_one({"_id": ADMIN_STATS_ID}, {"$set": counters}, upsert=True)
+    logger.info("Rebuilt admin dashboard counters")
+    return counters
+
+
+async def get_admin_stats_document(db) -> dict:
+    """
+    Read the dashboard counters in O(1).
+    Falls back to a full rebuild the first time, when no counters exist yet,
+    and schedules a background rebuild when the counters are stale.
+    """
+    global _admin_stats_rebuild_task
+    
+    stats = await db.stats.find_one({"_id": ADMIN_STATS_ID})
+    if not stats or not stats.get('rebuilt_at'):
+        return await rebuild_admin_stats(db)
+    
+    if admin_stats_is_stale(stats) and (_admin_stats_rebuild_task is None or _admin_stats_rebuild_task.done()):
+        _admin_stats_rebuild_task = asyncio.create_task(rebuild_admin_stats(db))
+    return stats
+
+
+def admin_stats_is_stale(stats: dict) -> bool:
+    """Check whether the counters are due for a drift-correcting rebuild"""
+    rebuilt_at = stats.get('rebuilt_at')
+    if not isinstance(rebuilt_at, datetime):
+        return True
+    if rebuilt_at.tzinfo is None:
+        rebuilt_at = rebuilt_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - rebuilt_at > ADMIN_STATS_REBUILD_INTERVAL
+
+
 async def get_admin_stats(db) -> dict:
     """Get overall statistics for admin dashboard"""
-    total_users = await db.users.count_documents({})
-    banned_users = await db.users.count_documents({"is_banned": True})
-    active_subscribers = await db.subscriptions.count_documents({"subscription_status": "active"})
-    total_analyses = await db.bet_analyses.count_documents({})
-    
-    # Get recent signups (last 7 days)
-    seven_days_ago = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    # Note: This is a simplified query, in production you'd need proper date handling
+    stats = await get_admin_stats_document(db)
     
     return {
-        "total_users": total_users,
-        "banned_users": banned_users,
-        "active_subscribers": active_subscribers,
-        "total_analyses": total_analyses,
+        "total_users": stats.get("total_users", 0),
+        "banned_users": stats.get("banned_users", 0),
+        "active_subscribers": stats.get("active_subscribers", 0),
+        "total_analyses": stats.get("total_analyses", 0),
         "free_analysis_limit": FREE_ANALYSIS_LIMIT,
         "subscription_price": SUBSCRIPTION_PRICE
     }
 
 
+async def get_top_bets_stats(db) -> dict:
+    """Get top bets statistics from the dashboard counters"""
+    stats = await get_admin_stats_document(db)
+    total_top_bets = stats.get("total_top_bets", 0)
+    avg_probability = stats.get("top_bets_probability_sum", 0) / total_top_bets if total_top_bets > 0 else 0
+    
+    return {
+        "total_top_bets": total_top_bets,
+        "elite_bets_80_plus": stats.get("elite_bets", 0),
+        "strong_bets_70_79": stats.get("strong_bets", 0),
+        "good_bets_60_69": stats.get("good_bets", 0),
+        "average_probability": round(avg_probability, 1) if avg_probability else 0
+    }
+
+
 async def ban_user(db, user_id: str, reason: str = None) -> bool:
     """Ban a user"""
-    result = await db.users.update_one(
+    previous = await db.users.find_one_and_update(
         {"id": user_id},
         {
             "$set": {
                 "is_banned": True,
                 "ban_reason": reason or "Violated terms of service",
-                "banned_at": datetime.now(timezone.utc).isoformat()
+                "banned_at": datetime.now(timezone.utc)
             }
-        }
+        },
+        projection={"_id": 0, "is_banned": 1}
     )
-    return result.modified_count > 0
+    if not previous:
+        return False
+    if not previous.get('is_banned', False):
+        await increment_admin_stats(db, banned_users=1)
+    return True
 
 
 async def unban_user(db, user_id: str) -> bool:
     """Unban a user"""
-    result = await db.users.update_one(
+    previous = await db.users.find_one_and_update(
         {"id": user_id},
         {
             "$set": {"is_banned": False},
             "$unset": {"ban_reason": "", "banned_at": ""}
-        }
+        },
+        projection={"_id": 0, "is_banned": 1}
     )
-    return result.modified_count > 0
+    if not previous:
+        return False
+    if previous.get('is_banned', False):
+        await increment_admin_stats(db, banned_users=-1)
+    return True
 
 
 # ===== SUBSCRIPTION FUNCTIONS =====
@@ -342,28 +477,41 @@ async def create_subscription_record(db, user_id: str, email: str, stripe_custom
         "stripe_customer_id": stripe_customer_id,
         "subscription_id": subscription_id,
         "subscription_status": "active",
-        "subscription_start": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "subscription_start": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     }
     
-    await db.subscriptions.update_one(
+    previous = await db.subscriptions.find_one_and_update(
         {"user_id": user_id},
         {"$set": subscription_data},
+        projection={"_id": 0, "subscription_status": 1},
         upsert=True
     )
+    await increment_admin_stats(
+        db,
+        active_subscribers=subscription_counter_delta(
+            previous.get('subscription_status') if previous else None, "active"
+        )
+    )
 
 
 async def update_subscription_status(db, user_id: str, status: str):
     """Update subscription status"""
-    await db.subscriptions.update_one(
+    previous = await db.subscriptions.find_one_and_update(
         {"user_id": user_id},
         {
             "$set": {
                 "subscription_status": status,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             }
-        }
+        },
+        projection={"_id": 0, "subscription_status": 1}
     )
+    if previous:
+        await increment_admin_stats(
+            db,
+            active_subscribers=subscription_counter_delta(previous.get('subscription_status'), status)
+        )
 
 
 async def get_user_subscription(db, user_id: str) -> dict:
@@ -0,0 +1,487 @@
+"""
+Bet slip analysis pipeline for BetrSlip
+- two_pass (default): OCR extraction call, enrichment, then the analysis call
+- single_pass: a cheap first look (team names only) starts enrichment, then one
+  vision call returns the extraction and the analysis together
+- Extraction text is streamed; each team name is detected as it appears and
+  its ESPN / odds / injury / weather fetches start right away (prefetch)
+- Models per stage come from model_router; extraction starts on a cheap model
+  and escalates when extraction_confidence() is low
+- ANALYSIS_PIPELINE_MODE selects the mode; every run records per-stage timings
+  and the models used so the modes can be compared (see ab_pipeline.py)
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from emergentintegrations.llm.chat import UserMessage, ImageContent
+
+from game_context import get_game_context, get_game_contexts, game_context_fields, analysis_context_sections
+from model_router import model_router
+from odds_math import parse_american
+from prompt_builder import BuiltPrompt, PromptSection, build_prompt
+from scoreboard_poller import scoreboard
+from sports_data_service import SportsDataService
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_MODES = ('two_pass', 'single_pass')
+ANALYSIS_PIPELINE_MODE = os.environ.get('ANALYSIS_PIPELINE_MODE', 'two_pass')
+# Extractions scoring below this are redone on the stage's next model
+EXTRACTION_MIN_CONFIDENCE = float(os.environ.get('EXTRACTION_MIN_CONFIDENCE', '0.7'))
+ENRICHMENT_PREFETCH = os.environ.get('ENRICHMENT_PREFETCH', 'true').lower() == 'true'
+# Teams prefetched per slip; enrichment itself only uses the first two
+PREFETCH_MAX_TEAMS = 6
+
+ANALYSIS_SYSTEM_MESSAGE = """You are an elite sports betting analyst with OCR expertise and access to real-time market data. 
+            
+Your analysis must be:
+1. PRECISE: Extract ALL text from bet slips accurately - odds, teams, amounts, bet types
+2. DATA-DRIVEN: Use real-time odds, line movements, and market indicators provided
+3. REALISTIC: Most bets have negative EV - don't be overly optimistic
+4. SHARP: Consider sharp money indicators, line movement, and market efficiency
+
+When real-time data is provided, heavily weight it in your analysis."""
+
+EXTRACTION_PROMPT = """STEP 1: EXTRACT ALL TEXT FROM THIS BET SLIP IMAGE
+
+Focus on extracting EVERY piece of text visible. Be meticulous and accurate.
+
+Return a structured extraction:
+```
+SPORTSBOOK: [App name - DraftKings, FanDuel, Hard Rock, BetMGM, etc.]
+BET_TYPE: [Single, Parlay, Same Game Parlay, Teaser, Round Robin, etc.]
+TOTAL_STAKE: [Amount wagered with $ symbol]
+POTENTIAL_PAYOUT: [Potential win amount]
+TOTAL_ODDS: [Combined odds if shown]
+
+INDIVIDUAL SELECTIONS:
+1. Team/Player: [exact name]
+   Bet Type: [Moneyline, Spread, Over/Under, Player Prop, etc.]
+   Line: [spread or total if applicable]
+   Odds: [American format odds]
+   
+2. Team/Player: [exact name]
+   Bet Type: [...]
+   Line: [...]
+   Odds: [...]
+
+[Continue for all selections...]
+
+OTHER VISIBLE TEXT:
+- [Any other relevant text like game dates, times, leagues]
+```
+
+Be EXACT with names, numbers and odds. If something is unclear, note it as [unclear]."""
+
+ANALYSIS_INSTRUCTIONS = """
+Now provide your COMPREHENSIVE analysis in JSON format:
+
+{
+    "win_probability": <realistic number 0-100>,
+    "confidence_score": <1-10, how confident in this probability>,
+    "bet_type": "<single/parlay/teaser etc>",
+    "total_stake": "<stake amount if visible>",
+    "total_odds": "<combined odds>",
+    "potential_payout": "<payout if visible>",
+    "individual_bets": [
+        {
+            "description": "<team/player and bet type>",
+            "sport": "<NFL, NBA, MLB or NHL>",
+            "odds": "<American odds format e.g. -140, +200>",
+            "individual_probability": <win chance 0-100>,
+            "reasoning": "<brief analysis citing specific data if available>"
+        }
+    ],
+    "risk_factors": [
+        "<specific concern with data support>",
+        "<another concern>",
+        "<another concern>"
+    ],
+    "positive_factors": [
+        "<strength with reasoning>",
+        "<another strength>"
+    ],
+    "analysis": "<2-3 sentences overall assessment>",
+    "bet_details": "<concise summary: stakes, odds, potential payout>",
+    "sharp_analysis": "<based on line movement, book count, and market data - is this sharp or public money>"
+}
+
+IMPORTANT ANALYSIS GUIDELINES:
+- Use the EXTRACTED DATA above for accurate bet details
+- If real-time market data is provided, USE IT to adjust probabilities  
+- Compare user's odds to current market odds - identify value or no-value
+- Consider team form, injuries, and weather if provided
+- Single bets: 30-70% probability range (be critical)
+- 2-leg parlays: 20-50% range  
+- 3-leg parlays: 10-35% range
+- 4+ leg parlays: 5-20% range
+- Confidence score: 8-10 = market data supports analysis, 5-7 = moderate data, 1-4 = limited data
+- Always include odds in American format (e.g., -140, +200)
+- Be realistic and critical - most bets have negative EV"""
+
+FIRST_LOOK_PROMPT = """List every team named on this bet slip image, one per line.
+Team names only - no odds, lines, players or any other text."""
+
+SINGLE_PASS_HEADER = """EXTRACT AND ANALYZE THIS BET SLIP IMAGE IN ONE PASS
+
+First read EVERY piece of text on the slip: sportsbook, bet type, stake, payout,
+total odds and, for each selection, the team/player, bet type, line and odds.
+Be EXACT with names, numbers and odds. Then analyze the slip using the data below.
+"""
+
+# The single-pass answer carries the extraction as a field of the analysis JSON
+SINGLE_PASS_INSTRUCTIONS = ANALYSIS_INSTRUCTIONS.replace(
+    '{\n    "win_probability"',
+    '{\n    "extraction": "<all slip text as lines - SPORTSBOOK:, BET_TYPE:, TOTAL_STAKE:, POTENTIAL_PAYOUT:, TOTAL_ODDS:, then per selection Team/Player:, Bet Type:, Line:, Odds:>",\n    "win_probability"',
+    1
+).replace(
+    "- Use the EXTRACTED DATA above for accurate bet details",
+    "- Read bet details from the slip image exactly"
+)
+
+
+@dataclass(slots=True)
+class PipelineRun:
+    """What the analysis endpoint needs from one run, plus timings"""
+    mode: str
+    extracted_data: str
+    response: str
+    prompt: BuiltPrompt
+    team_names: List[str]
+    context_fields: Dict
+    games_status: Optional[Dict]
+    timings: Dict[str, int] = field(default_factory=dict)
+    models: Dict[str, str] = field(default_factory=dict)       # stage -> provider/model used
+    extraction_confidence: Optional[float] = None
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
+def extract_analysis_json(response: str) -> Optional[dict]:
+    """The JSON object in an LLM answer, tolerating code fences and surrounding prose"""
+    text = response.replace('```json', '').replace('```', '')
+    start = text.find('{')
+    if start != -1:
+        try:
+            result, _ = json.JSONDecoder().raw_decode(text[start:])
+            if isinstance(result, dict):
+                return result
+        except ValueError:
+            pass
+    json_match = re.search(r'\{[^{}]*"win_probability"[^{}]*"analysis"[^{}]*\}', response, re.DOTALL)
+    if not json_match:
+        json_match = re.search(r'\{(?:[^{}]|{[^{}]*})*\}', response, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group())
+        except ValueError:
+            return None
+    return None
+
+
+EXTRACTION_FIELDS = ('SPORTSBOOK', 'BET_TYPE', 'TOTAL_STAKE', 'POTENTIAL_PAYOUT')
+_SELECTION_RE = re.compile(r'Team/Player:', re.IGNORECASE)
+_ODDS_RE = re.compile(r'Odds:\s*([^\n]*)', re.IGNORECASE)
+
+
+def extraction_legs(extracted: str) -> int:
+    return len(_SELECTION_RE.findall(extracted or ""))
+
+
+def extraction_confidence(extracted: str) -> float:
+    """
+    0-1 score of how much an extraction can be trusted: header fields found,
+    selections with readable American odds, nothing marked [unclear]
+    """
+    selections = extraction_legs(extracted)
+    if not selections:
+        return 0.0
+
+    score = 1.0
+    upper = extracted.upper()
+    score -= 0.1 * sum(1 for name in EXTRACTION_FIELDS if f"{name}:" not in upper)
+    score -= 0.2 * upper.count('[UNCLEAR]')
+    odds = _ODDS_RE.findall(extracted)
+    unreadable = selections - len(odds)
+    for value in odds:
+        try:
+            parse_american(value.split()[0] if value.split() else '')
+        except ValueError:
+            unreadable += 1
+    score -= 0.2 * max(unreadable, 0)
+    return round(min(max(score, 0.0), 1.0), 2)
+
+
+def _accept_extraction(extracted: str) -> bool:
+    """
+    A cheap model's extraction stands when it reads confidently, whatever the
+    leg count: every leg's odds count towards the score, so a parlay only
+    escalates when some of it could not be read
+    """
+    return extraction_confidence(extracted) >= EXTRACTION_MIN_CONFIDENCE
+
+
+def _single_pass_extraction(response: str) -> str:
+    extraction = (extract_analysis_json(response) or {}).get('extraction')
+    return extraction if isinstance(extraction, str) else ""
+
+
+def _accept_single_pass(response: str) -> bool:
+    return _accept_extraction(_single_pass_extraction(response))
+
+
+# ===== ENRICHMENT =====
+
+class EnrichmentPrefetch:
+    """
+    Watches an answer as it streams in and starts enrichment for every team
+    name as soon as it appears. The fetches fill the shared caches (and their
+    single-flight locks), so the enrichment stage after extraction joins them
+    instead of starting over.
+    """
+
+    def __init__(self, enabled: bool = ENRICHMENT_PREFETCH):
+        self.enabled = enabled
+        self.teams: List[str] = []
+        self.first_team_ms: Optional[int] = None
+        self._sports: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._scanned = 0
+        self._started = time.perf_counter()
+        # Re-scan this much already-seen text so a name split across chunks is found
+        self._overlap = 16
+
+    def feed(self, text: str):
+        """on_text callback: text is the whole answer so far"""
+        if not self.enabled or len(self.teams) >= PREFETCH_MAX_TEAMS:
+            return
+        try:
+            if len(text) < self._scanned:
+                # A retry or escalation restarted the answer
+                self._scanned = 0
+            tail = text[max(self._scanned - self._overlap, 0):]
+            self._scanned = len(text)
+            for team in SportsDataService.extract_team_names(tail):
+                if team not in self.teams and len(self.teams) < PREFETCH_MAX_TEAMS:
+                    self._start(team)
+        except Exception as e:
+            # Prefetch is only an optimization; never break the extraction call
+            logger.error(f"Error prefetching enrichment: {str(e)}")
+
+    def _start(self, team: str):
+        if self.first_team_ms is None:
+            self.first_team_ms = _elapsed_ms(self._started)
+        self.teams.append(team)
+        self._spawn(get_game_context(team))
+        for sport in SportsDataService.market_sports_for_team(team):
+            if sport not in self._sports:
+                self._sports.add(sport)
+                self._spawn(SportsDataService.get_live_odds(sport))
+        logger.info(f"Prefetching enrichment for {team} ({self.first_team_ms}ms into extraction)")
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        task.add_done_callback(_log_prefetch_error)
+        self._tasks.append(task)
+
+    def record(self, timings: Dict[str, int]):
+        if self.first_team_ms is not None:
+            timings['first_team_ms'] = self.first_team_ms
+        timings['prefetched_teams'] = len(self.teams)
+
+
+def _log_prefetch_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Error in enrichment prefetch: {str(task.exception())}")
+
+
+async def _gather_context(team_names: List[str], bet_details: str) -> Tuple[List[PromptSection], Dict]:
+    """Prompt sections and response fields for the teams; empty on failure"""
+    fields = {'injuries_data': [], 'weather_data': None, 'team_form_data': []}
+    try:
+        game_contexts = await get_game_contexts(team_names)
+        fields = game_context_fields(game_contexts)
+        sections = await analysis_context_sections(game_contexts, [], bet_details)
+        logger.info(f"Enhanced context sections: {[section.name for section in sections]}")
+        logger.info(f"Injuries found: {len(fields['injuries_data'])}, Weather: {fields['weather_data'] is not None}, Team forms: {len(fields['team_form_data'])}")
+        return sections, fields
+    except Exception as e:
+        logger.error(f"Error getting enhanced context: {str(e)}")
+        return [], fields
+
+
+async def _games_status(team_names: List[str]) -> Optional[Dict]:
+    """Have the slip's games already ended? Read from the scoreboard feed when fresh."""
+    try:
+        games_status = await SportsDataService.check_games_status(team_names, scoreboard=scoreboard)
+        if games_status.get('warning_message'):
+            logger.info(f"Game status warning: {games_status['warning_message']}")
+        return games_status
+    except Exception as e:
+        logger.error(f"Error checking games status: {str(e)}")
+        return None
+
+
+def _log_prompt(prompt: BuiltPrompt):
+    logger.info(f"Analysis prompt: {prompt.tokens}/{prompt.budget} tokens ({prompt.estimator}), trimmed: {prompt.trimmed or 'none'}")
+
+
+# ===== PIPELINES =====
+
+async def run_two_pass(image_base64: str, user_id: Optional[str]) -> PipelineRun:
+    """OCR extraction, enrichment from the extracted text, then analysis"""
+    started = time.perf_counter()
+    timings = {}
+    models = {}
+
+    # STEP 1: Dedicated OCR/Extraction Pass
+    # This improves accuracy by focusing solely on text extraction first;
+    # a cheap model reads simple slips, low-confidence extractions escalate
+    stage = time.perf_counter()
+    extraction_msg = UserMessage(
+        text=EXTRACTION_PROMPT,
+        file_contents=[ImageContent(image_base64=image_base64)]
+    )
+    prefetch = EnrichmentPrefetch()
+    extraction = await model_router.call(
+        'extraction', extraction_msg,
+        system_message=ANALYSIS_SYSTEM_MESSAGE,
+        session_prefix="bet_extraction",
+        user_id=user_id,
+        on_text=prefetch.feed,
+        accept=_accept_extraction
+    )
+    extracted_data = extraction.text
+    confidence = extraction_confidence(extracted_data)
+    model_router.record_confidence('extraction', extraction.model, confidence)
+    models['extraction'] = extraction.model.label
+    timings['extraction_ms'] = _elapsed_ms(stage)
+    prefetch.record(timings)
+    logger.info(f"Extracted bet slip data ({extraction.model.label}, confidence {confidence}): {extracted_data[:500]}...")
+
+    # STEP 2: Real-time context and game status for the extracted teams;
+    # mostly already in flight or cached by the prefetch
+    stage = time.perf_counter()
+    team_names = SportsDataService.extract_team_names(extracted_data)
+    logger.info(f"Extracted teams: {team_names}")
+    (context_sections, fields), games_status = await asyncio.gather(
+        _gather_context(team_names, extracted_data),
+        _games_status(team_names)
+    )
+    timings['enrichment_ms'] = _elapsed_ms(stage)
+
+    # STEP 3: Full analysis; optional context is fitted to the token budget
+    prompt = build_prompt([
+        PromptSection('extraction', f"STEP 2: ANALYZE THIS BET SLIP\n\nEXTRACTED BET SLIP DATA:\n{extracted_data}\n"),
+        *context_sections,
+        PromptSection('instructions', ANALYSIS_INSTRUCTIONS)
+    ])
+    _log_prompt(prompt)
+    stage = time.perf_counter()
+    # The analysis model sees the slip too, not only the extracted text
+    analysis = await model_router.call(
+        'analysis',
+        UserMessage(text=prompt.text, file_contents=[ImageContent(image_base64=image_base64)]),
+        system_message=ANALYSIS_SYSTEM_MESSAGE,
+        session_prefix="bet_analysis",
+        user_id=user_id
+    )
+    response = analysis.text
+    models['analysis'] = analysis.model.label
+    timings['analysis_ms'] = _elapsed_ms(stage)
+    timings['total_ms'] = _elapsed_ms(started)
+
+    return PipelineRun('two_pass', extracted_data, response, prompt, team_names, fields, games_status, timings, models, confidence)
+
+
+async def run_single_pass(image_base64: str, user_id: Optional[str]) -> PipelineRun:
+    """Cheap first look for team names, enrichment, then one combined vision call"""
+    started = time.perf_counter()
+    timings = {}
+    models = {}
+
+    # STEP 1: First look - short answer from a small model, only to start enrichment
+    stage = time.perf_counter()
+    prefetch = EnrichmentPrefetch()
+    try:
+        first_look = await model_router.call(
+            'first_look',
+            UserMessage(text=FIRST_LOOK_PROMPT, file_contents=[ImageContent(image_base64=image_base64)]),
+            system_message="You read team names off sports bet slips.",
+            session_prefix="bet_first_look",
+            user_id=user_id,
+            on_text=prefetch.feed
+        )
+        first_look_text = first_look.text
+        models['first_look'] = first_look.model.label
+    except Exception as e:
+        # Enrichment is optional: the combined call can still analyze the slip on its own
+        logger.error(f"First look failed, analyzing without enrichment: {str(e)}")
+        first_look_text = ""
+    timings['first_look_ms'] = _elapsed_ms(stage)
+    prefetch.record(timings)
+
+    # STEP 2: Speculative enrichment from the first-look teams
+    stage = time.perf_counter()
+    team_names = SportsDataService.extract_team_names(first_look_text)
+    logger.info(f"First-look teams: {team_names}")
+    context_sections, fields = await _gather_context(team_names, first_look_text)
+    timings['enrichment_ms'] = _elapsed_ms(stage)
+
+    # STEP 3: One vision call for extraction and analysis
+    prompt = build_prompt([
+        PromptSection('header', SINGLE_PASS_HEADER),
+        *context_sections,
+        PromptSection('instructions', SINGLE_PASS_INSTRUCTIONS)
+    ])
+    _log_prompt(prompt)
+    stage = time.perf_counter()
+    combined = await model_router.call(
+        'single_pass',
+        UserMessage(text=prompt.text, file_contents=[ImageContent(image_base64=image_base64)]),
+        system_message=ANALYSIS_SYSTEM_MESSAGE,
+        session_prefix="bet_analysis",
+        user_id=user_id,
+        accept=_accept_single_pass
+    )
+    response = combined.text
+    models['single_pass'] = combined.model.label
+    timings['analysis_ms'] = _elapsed_ms(stage)
+
+    extraction = _single_pass_extraction(response)
+    extracted_data = extraction if extraction.strip() else first_look_text
+    confidence = extraction_confidence(extraction)
+    model_router.record_confidence('single_pass', combined.model, confidence)
+    logger.info(f"Extracted bet slip data ({combined.model.label}, confidence {confidence}): {extracted_data[:500]}...")
+
+    # The first look can miss or misread a team: response fields and game status follow the real extraction
+    slip_teams = SportsDataService.extract_team_names(extracted_data)
+    if slip_teams[:2] != team_names[:2]:
+        logger.info(f"Slip teams {slip_teams} differ from first look {team_names}")
+        _, fields = await _gather_context(slip_teams, extracted_data)
+    games_status = await _games_status(slip_teams)
+    timings['total_ms'] = _elapsed_ms(started)
+
+    return PipelineRun('single_pass', extracted_data, response, prompt, slip_teams, fields, games_status, timings, models, confidence)
+
+
+PIPELINES = {'two_pass': run_two_pass, 'single_pass': run_single_pass}
+
+
+async def run_analysis_pipeline(image_base64: str, user_id: Optional[str], mode: Optional[str] = None) -> PipelineRun:
+    mode = mode or ANALYSIS_PIPELINE_MODE
+    if mode not in PIPELINES:
+        logger.error(f"Unknown ANALYSIS_PIPELINE_MODE {mode!r}, using two_pass")
+        mode = 'two_pass'
+    run = await PIPELINES[mode](image_base64, user_id)
+    logger.info(f"Analysis pipeline {run.mode}: {run.timings}")
+    return run
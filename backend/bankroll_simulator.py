@@ -0,0 +1,215 @@
+"""
+Monte Carlo bankroll simulator for BetrSlip
+- Simulates sequences of bets drawn from a bet mix (a proposed slip or tracked history)
+- Flat staking vs. fractional Kelly, all strategies on the same random draws
+- Seeded, chunked generation; each chunk is folded into fixed-size per-strategy
+  histograms, so memory is bounded by strategies x CHUNK_PATHS whatever `paths` is
+- Pure function of plain inputs so it can run in a process pool
+"""
+
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from odds_math import kelly_criterion_array
+
+logger = logging.getLogger(__name__)
+
+# Paths simulated per chunk; memory is O(strategies x CHUNK_PATHS)
+CHUNK_PATHS = 20000
+MAX_KELLY_FRACTIONS = 6
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 20
+
+# Final bankrolls are counted on a log grid (relative to the start) for percentiles:
+# ~1% relative resolution from 1e-6x to 1e12x; anything above lands in the top bin
+FINAL_GRID_LOW = 1e-6
+FINAL_GRID_HIGH = 1e12
+FINAL_GRID_BINS = 4000
+DRAWDOWN_GRID_BINS = 1000
+
+
+def bet_mix_from_analyses(analyses: List[dict]) -> Dict[str, list]:
+    """
+    Win probabilities and decimal odds from stored analyses.
+    The slip price is recovered from EV: EV% = (p * d - 1) * 100.
+    """
+    win_probabilities, decimal_odds = [], []
+    for analysis in analyses:
+        p = (analysis.get('win_probability') or 0) / 100
+        ev = analysis.get('expected_value')
+        if p <= 0 or p >= 1 or ev is None:
+            continue
+        d = (1 + ev / 100) / p
+        if d > 1:
+            win_probabilities.append(p * 100)
+            decimal_odds.append(d)
+    return {'win_probabilities': win_probabilities, 'decimal_odds': decimal_odds}
+
+
+def _strategy_names(kelly_fractions: Sequence[float]) -> List[str]:
+    return ['flat'] + [f"kelly_{fraction:g}x" for fraction in kelly_fractions]
+
+
+def _grid_quantile(counts: np.ndarray, edges: np.ndarray, q: float, low: float, high: float) -> float:
+    """Quantile q (0-100) from binned counts, interpolated inside its bin and clamped to the observed range"""
+    cumulative = np.cumsum(counts)
+    target = q / 100 * cumulative[-1]
+    i = min(int(np.searchsorted(cumulative, target)), len(counts) - 1)
+    before = cumulative[i - 1] if i else 0
+    share = (target - before) / counts[i] if counts[i] else 0.0
+    value = edges[i] + share * (edges[i + 1] - edges[i])
+    return float(min(max(value, low), high))
+
+
+class _StrategySummary:
+    """Running totals and fixed-grid histograms of one strategy's paths"""
+
+    def __init__(self, starting_bankroll: float):
+        self.starting_bankroll = starting_bankroll
+        self.final_edges = np.concatenate(([0.0], np.geomspace(
+            starting_bankroll * FINAL_GRID_LOW, starting_bankroll * FINAL_GRID_HIGH, FINAL_GRID_BINS
+        )))
+        self.drawdown_edges = np.linspace(0.0, 1.0, DRAWDOWN_GRID_BINS + 1)
+        self.final_counts = np.zeros(len(self.final_edges) - 1, dtype=np.int64)
+        self.drawdown_counts = np.zeros(DRAWDOWN_GRID_BINS, dtype=np.int64)
+        self.paths = 0
+        self.final_sum = 0.0
+        self.final_min = np.inf
+        self.final_max = -np.inf
+        self.profitable = 0
+        self.ruined = 0
+        self.deep_drawdowns = 0
+
+    def add(self, final: np.ndarray, max_drawdown: np.ndarray, ruined: np.ndarray):
+        self.paths += final.size
+        self.final_sum += float(final.sum())
+        self.final_min = min(self.final_min, float(final.min()))
+        self.final_max = max(self.final_max, float(final.max()))
+        self.profitable += int((final > self.starting_bankroll).sum())
+        self.ruined += int(ruined.sum())
+        self.deep_drawdowns += int((max_drawdown > 0.5).sum())
+        self.final_counts += np.histogram(np.clip(final, 0, self.final_edges[-1]), bins=self.final_edges)[0]
+        self.drawdown_counts += np.histogram(np.clip(max_drawdown, 0, 1), bins=self.drawdown_edges)[0]
+
+    def _display_histogram(self) -> Dict:
+        """HISTOGRAM_BINS equal-width bins over the observed range, re-binned from the grid"""
+        edges = np.linspace(self.final_min, self.final_max, HISTOGRAM_BINS + 1)
+        if self.final_max == self.final_min:
+            counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+            counts[-1] = self.paths
+        else:
+            centers = np.clip((self.final_edges[:-1] + self.final_edges[1:]) / 2, self.final_min, self.final_max)
+            counts = np.histogram(centers, bins=edges, weights=self.final_counts)[0]
+        return {
+            'edges': [round(float(e), 2) for e in edges],
+            'counts': [int(round(c)) for c in counts]
+        }
+
+    def summarize(self) -> Dict:
+        percentiles = [
+            _grid_quantile(self.final_counts, self.final_edges, q, self.final_min, self.final_max)
+            for q in PERCENTILES
+        ]
+        median_drawdown = _grid_quantile(self.drawdown_counts, self.drawdown_edges, 50, 0.0, 1.0)
+        return {
+            'mean_final_bankroll': round(self.final_sum / self.paths, 2),
+            'percentiles': {f"p{p}": round(v, 2) for p, v in zip(PERCENTILES, percentiles)},
+            'probability_of_profit': round(self.profitable / self.paths * 100, 2),
+            'risk_of_ruin': round(self.ruined / self.paths * 100, 2),
+            'median_max_drawdown': round(median_drawdown * 100, 2),
+            'probability_drawdown_over_50': round(self.deep_drawdowns / self.paths * 100, 2),
+            'histogram': self._display_histogram()
+        }
+
+
+def run_simulation(
+    win_probabilities: Sequence[float],
+    decimal_odds: Sequence[float],
+    starting_bankroll: float = 1000,
+    num_bets: int = 100,
+    paths: int = 100000,
+    flat_stake: Optional[float] = None,
+    kelly_fractions: Sequence[float] = (1.0, 0.5, 0.25),
+    ruin_fraction: float = 0.05,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Simulate `paths` bankrolls over `num_bets` bets each. Every bet is drawn
+    uniformly from the mix (win probability 0-100, decimal odds).
+    A path is ruined once its bankroll falls below ruin_fraction of the start
+    and stops betting from then on. Percentiles and the median drawdown are read
+    from fixed grids (about 1% / 0.1 point resolution).
+    """
+    p = np.asarray(win_probabilities, dtype=float)
+    d = np.asarray(decimal_odds, dtype=float)
+    if p.size == 0 or p.shape != d.shape:
+        raise ValueError("Need at least one bet with a win probability and odds")
+    if np.any((p <= 0) | (p >= 100)) or np.any(d <= 1):
+        raise ValueError("Win probabilities must be between 0 and 100 and decimal odds above 1")
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    flat_stake = flat_stake if flat_stake is not None else starting_bankroll * 0.01
+    fractions = np.asarray(kelly_fractions, dtype=float)
+    if fractions.size > MAX_KELLY_FRACTIONS or np.any((fractions <= 0) | (fractions > 1)):
+        raise ValueError(f"Up to {MAX_KELLY_FRACTIONS} Kelly fractions, each above 0 and at most 1")
+
+    # Full (uncapped) Kelly per bet in the mix, as a fraction of bankroll
+    full_kelly = kelly_criterion_array(p, d, cap=100) / 100
+    ruin_level = starting_bankroll * ruin_fraction
+    strategies = 1 + len(fractions)
+
+    summaries = [_StrategySummary(starting_bankroll) for _ in range(strategies)]
+
+    chunk_seeds = np.random.SeedSequence(seed).spawn((paths + CHUNK_PATHS - 1) // CHUNK_PATHS)
+    for chunk, chunk_seed in enumerate(chunk_seeds):
+        rng = np.random.default_rng(chunk_seed)
+        start = chunk * CHUNK_PATHS
+        size = min(CHUNK_PATHS, paths - start)
+
+        bankroll = np.full((strategies, size), float(starting_bankroll))
+        peak = bankroll.copy()
+        drawdown = np.zeros((strategies, size))
+        alive = np.ones((strategies, size), dtype=bool)
+
+        for _ in range(num_bets):
+            # Common random numbers: every strategy sees the same bet and result
+            bet = rng.integers(0, p.size, size)
+            won = rng.random(size) < p[bet] / 100
+            payout = np.where(won, d[bet] - 1, -1.0)                       # per unit staked
+
+            stakes = np.empty((strategies, size))
+            stakes[0] = np.minimum(flat_stake, bankroll[0])
+            stakes[1:] = fractions[:, None] * full_kelly[bet][None, :] * bankroll[1:]
+            stakes = np.where(alive, stakes, 0.0)
+
+            bankroll += stakes * payout[None, :]
+            np.maximum(peak, bankroll, out=peak)
+            np.maximum(drawdown, 1 - bankroll / peak, out=drawdown)
+            alive &= bankroll >= ruin_level
+
+        for s, summary in enumerate(summaries):
+            summary.add(bankroll[s], drawdown[s], ~alive[s])
+
+    names = _strategy_names(fractions)
+    results = {name: summary.summarize() for name, summary in zip(names, summaries)}
+    results['flat']['stake'] = round(float(flat_stake), 2)
+
+    mean_kelly = float(full_kelly.mean())
+    return {
+        'seed': seed,
+        'paths': paths,
+        'num_bets': num_bets,
+        'starting_bankroll': starting_bankroll,
+        'bet_mix': {
+            'bets': int(p.size),
+            'mean_win_probability': round(float(p.mean()), 2),
+            'mean_decimal_odds': round(float(d.mean()), 3),
+            'mean_expected_value': round(float(((p / 100) * d - 1).mean()) * 100, 2),
+            'mean_full_kelly': round(mean_kelly * 100, 2)
+        },
+        'strategies': results
+    }
@@ -0,0 +1,252 @@
+"""
+Calibration tracking of AI win probabilities for BetrSlip
+- Reliability bins, Brier score and log-loss over analyses with a won/lost outcome
+- One rollup document per slice in `calibration_stats`: overall, per sport,
+  per leg count and per model version
+- Incremental $inc updates when outcomes are marked or settled
+- Single aggregation to rebuild every slice from `bet_analyses`, written back
+  with per-slice upserts
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_BINS = 10
+GRADED_OUTCOMES = ["won", "lost"]
+DIMENSIONS = ["overall", "sport", "legs", "model"]
+
+# Probabilities are clipped before log-loss so a 0% / 100% call costs a finite amount
+PROBABILITY_EPSILON = 0.001
+
+# Fields of an analysis the calibration rollups depend on
+CALIBRATION_PROJECTION = {
+    "_id": 0,
+    "actual_outcome": 1,
+    "win_probability": 1,
+    "sport": 1,
+    "model_version": 1,
+    "legs_count": 1,
+    "individual_bets.description": 1
+}
+
+CALIBRATION_COUNTERS = ["count", "wins", "sum_prob", "brier_sum", "log_loss_sum"]
+
+
+def legs_bucket(legs: int) -> str:
+    if legs <= 0:
+        return "unknown"
+    return "5+" if legs >= 5 else str(legs)
+
+
+def probability_bin(p: float) -> int:
+    return min(int(p * CALIBRATION_BINS), CALIBRATION_BINS - 1)
+
+
+def analysis_slices(analysis: dict) -> List[str]:
+    """calibration_stats document ids an analysis counts towards"""
+    legs = analysis.get('legs_count')
+    if legs is None:
+        legs = len(analysis.get('individual_bets') or [])
+    return [
+        "overall",
+        f"sport:{analysis.get('sport') or 'unknown'}",
+        f"legs:{legs_bucket(legs)}",
+        f"model:{analysis.get('model_version') or 'unknown'}"
+    ]
+
+
+def calibration_contribution(analysis: Optional[dict]) -> Dict[str, float]:
+    """Counters one graded analysis adds to each of its slices (empty if ungraded)"""
+    if not analysis or analysis.get('actual_outcome') not in GRADED_OUTCOMES:
+        return {}
+    if analysis.get('win_probability') is None:
+        return {}
+
+    p = min(max(analysis['win_probability'] / 100, PROBABILITY_EPSILON), 1 - PROBABILITY_EPSILON)
+    y = 1 if analysis['actual_outcome'] == 'won' else 0
+    b = probability_bin(p)
+    return {
+        "count": 1,
+        "wins": y,
+        "sum_prob": p,
+        "brier_sum": (p - y) ** 2,
+        "log_loss_sum": -(y * math.log(p) + (1 - y) * math.log(1 - p)),
+        f"bins.{b}.count": 1,
+        f"bins.{b}.wins": y,
+        f"bins.{b}.sum_prob": p
+    }
+
+
+def calibration_delta(before: Optional[dict], after: Optional[dict]) -> Dict[str, Dict[str, float]]:
+    """Per-slice counter changes caused by an analysis going from `before` to `after`"""
+    deltas: Dict[str, Dict[str, float]] = {}
+    for doc, sign in ((before, -1), (after, 1)):
+        contribution = calibration_contribution(doc)
+        if not contribution:
+            continue
+        for slice_id in analysis_slices(doc):
+            slice_delta = deltas.setdefault(slice_id, {})
+            for field, value in contribution.items():
+                slice_delta[field] = slice_delta.get(field, 0) + sign * value
+    return {
+        slice_id: {field: value for field, value in delta.items() if value}
+        for slice_id, delta in deltas.items()
+    }
+
+
+def merge_calibration_deltas(deltas: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Sum many per-analysis deltas, so a batch becomes one $inc per slice"""
+    merged: Dict[str, Dict[str, float]] = {}
+    for delta in deltas:
+        for slice_id, counters in delta.items():
+            target = merged.setdefault(slice_id, {})
+            for field, value in counters.items():
+                target[field] = target.get(field, 0) + value
+    return merged
+
+
+async def apply_calibration_delta(db, delta: Dict[str, Dict[str, float]]):
+    """$inc every affected slice in one bulk write"""
+    operations = [
+        UpdateOne({"_id": slice_id}, {"$inc": counters}, upsert=True)
+        for slice_id, counters in delta.items() if counters
+    ]
+    if not operations:
+        return
+    try:
+        await db.calibration_stats.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Error updating calibration stats: {str(e)}")
+
+
+# ===== REBUILD =====
+
+def calibration_pipeline() -> list:
+    """Aggregation grouping graded analyses by sport, leg bucket, model and bin"""
+    clipped = {"$min": [
+        {"$max": [{"$divide": ["$win_probability", 100]}, PROBABILITY_EPSILON]},
+        1 - PROBABILITY_EPSILON
+    ]}
+    legs = {"$ifNull": ["$legs_count", {"$size": {"$ifNull": ["$individual_bets", []]}}]}
+    return [
+        {"$match": {"actual_outcome": {"$in": GRADED_OUTCOMES}, "win_probability": {"$ne": None}}},
+        {"$project": {
+            "_id": 0,
+            "p": clipped,
+            "y": {"$cond": [{"$eq": ["$actual_outcome", "won"]}, 1, 0]},
+            "sport": {"$ifNull": ["$sport", "unknown"]},
+            "model": {"$ifNull": ["$model_version", "unknown"]},
+            "legs": legs
+        }},
+        {"$group": {
+            "_id": {
+                "sport": "$sport",
+                "model": "$model",
+                "legs": "$legs",
+                "bin": {"$min": [{"$floor": {"$multiply": ["$p", CALIBRATION_BINS]}}, CALIBRATION_BINS - 1]}
+            },
+            "count": {"$sum": 1},
+            "wins": {"$sum": "$y"},
+            "sum_prob": {"$sum": "$p"},
+            "brier_sum": {"$sum": {"$pow": [{"$subtract": ["$p", "$y"]}, 2]}},
+            "log_loss_sum": {"$sum": {"$multiply": [-1, {"$add": [
+                {"$multiply": ["$y", {"$ln": "$p"}]},
+                {"$multiply": [{"$subtract": [1, "$y"]}, {"$ln": {"$subtract": [1, "$p"]}}]}
+            ]}]}}
+        }}
+    ]
+
+
+async def rebuild_calibration(db) -> Dict[str, dict]:
+    """Recompute every slice from scratch (repairs drift, backfills old data)"""
+    rows = await db.bet_analyses.aggregate(calibration_pipeline()).to_list(None)
+
+    slices: Dict[str, dict] = {}
+    for row in rows:
+        key = row["_id"]
+        analysis = {"sport": key["sport"], "model_version": key["model"], "legs_count": key["legs"]}
+        b = int(key["bin"])
+        for slice_id in analysis_slices(analysis):
+            doc = slices.setdefault(slice_id, {counter: 0 for counter in CALIBRATION_COUNTERS})
+            for counter in CALIBRATION_COUNTERS:
+                doc[counter] += row[counter]
+            bin_doc = doc.setdefault("bins", {}).setdefault(str(b), {"count": 0, "wins": 0, "sum_prob": 0})
+            bin_doc["count"] += row["count"]
+            bin_doc["wins"] += row["wins"]
+            bin_doc["sum_prob"] += row["sum_prob"]
+
+    rebuilt_at = datetime.now(timezone.utc)
+    docs = {slice_id: {**doc, "rebuilt_at": rebuilt_at} for slice_id, doc in slices.items()}
+    docs.setdefault("overall", {"rebuilt_at": rebuilt_at})
+    # Replace slice by slice, then drop the ones that no longer exist: readers
+    # never see an empty or half-written collection
+    await db.calibration_stats.bulk_write(
+        [ReplaceOne({"_id": slice_id}, doc, upsert=True) for slice_id, doc in docs.items()],
+        ordered=False
+    )
+    await db.calibration_stats.delete_many({"_id": {"$nin": list(docs)}})
+    logger.info(f"Rebuilt calibration stats: {len(slices)} slices from {len(rows)} groups")
+    return slices
+
+
+# ===== REPORTING =====
+
+def format_calibration(doc: dict) -> dict:
+    """Reliability table and scores for one slice"""
+    count = doc.get("count", 0)
+    bins = []
+    ece = 0.0
+    for b in range(CALIBRATION_BINS):
+        bin_doc = (doc.get("bins") or {}).get(str(b))
+        if not bin_doc or not bin_doc.get("count"):
+            continue
+        predicted = bin_doc["sum_prob"] / bin_doc["count"]
+        observed = bin_doc["wins"] / bin_doc["count"]
+        ece += bin_doc["count"] / count * abs(predicted - observed) if count else 0
+        bins.append({
+            "range": [b * 100 // CALIBRATION_BINS, (b + 1) * 100 // CALIBRATION_BINS],
+            "count": bin_doc["count"],
+            "predicted": round(predicted * 100, 1),
+            "observed": round(observed * 100, 1)
+        })
+
+    return {
+        "count": count,
+        "mean_predicted": round(doc["sum_prob"] / count * 100, 1) if count else None,
+        "observed_win_rate": round(doc["wins"] / count * 100, 1) if count else None,
+        "brier_score": round(doc["brier_sum"] / count, 4) if count else None,
+        "log_loss": round(doc["log_loss_sum"] / count, 4) if count else None,
+        "expected_calibration_error": round(ece * 100, 2) if count else None,
+        "bins": bins
+    }
+
+
+def _split_slice_id(slice_id: str) -> Tuple[str, str]:
+    dimension, _, value = slice_id.partition(":")
+    return dimension, value or dimension
+
+
+async def get_calibration_report(db) -> dict:
+    """All slices grouped by dimension, building the rollups on first access"""
+    overall = await db.calibration_stats.find_one({"_id": "overall"}, {"rebuilt_at": 1})
+    if not overall or not overall.get("rebuilt_at"):
+        await rebuild_calibration(db)
+
+    report = {dimension: {} for dimension in DIMENSIONS if dimension != "overall"}
+    report["overall"] = None
+    rebuilt_at = None
+    async for doc in db.calibration_stats.find({}):
+        dimension, value = _split_slice_id(doc["_id"])
+        if dimension == "overall":
+            rebuilt_at = doc.get("rebuilt_at")
+            report["overall"] = format_calibration(doc)
+        elif dimension in report:
+            report[dimension][value] = format_calibration(doc)
+    report["rebuilt_at"] = rebuilt_at
+    return report
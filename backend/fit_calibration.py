@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Fit the win-probability calibration map from marked outcomes.
+
+Reads every analysis graded won/lost, fits an isotonic (default) or Platt
+map of the LLM's raw win probability to observed win rates, overall and
+per leg-count bucket, and writes the JSON artifact the server loads.
+Running servers pick the new file up within a minute, or immediately via
+POST /api/admin/probability-calibration/reload.
+
+Usage:
+    python fit_calibration.py [--method isotonic|platt] [--output PATH] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from calibration import GRADED_OUTCOMES
+from probability_calibration import CALIBRATION_MAP_PATH, build_calibration_map, save_calibration_map
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def load_samples(db) -> list:
+    """Raw (pre-calibration) probabilities with outcomes and leg counts"""
+    samples = []
+    cursor = db.bet_analyses.find(
+        {"actual_outcome": {"$in": GRADED_OUTCOMES}},
+        {
+            "_id": 0,
+            "actual_outcome": 1,
+            "raw_win_probability": 1,
+            "win_probability": 1,
+            "legs_count": 1,
+            "individual_bets.description": 1
+        }
+    )
+    async for doc in cursor:
+        # Analyses from before calibration only have the raw number in win_probability
+        probability = doc.get('raw_win_probability', doc.get('win_probability'))
+        if probability is None:
+            continue
+        legs = doc.get('legs_count')
+        samples.append({
+            "probability": probability,
+            "won": doc['actual_outcome'] == 'won',
+            "legs": legs if legs is not None else len(doc.get('individual_bets') or [])
+        })
+    return samples
+
+
+async def main(method: str, output: Path, dry_run: bool):
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    samples = await load_samples(db)
+    client.close()
+    print(f"📊 {len(samples)} graded analyses")
+
+    artifact = build_calibration_map(samples, method)
+    for name, fitted in artifact['maps'].items():
+        print(f"  {name}: {fitted['samples']} samples, Brier {fitted['brier_before']} -> {fitted['brier_after']}")
+
+    if dry_run:
+        print("Dry run - artifact not written")
+        return
+    save_calibration_map(artifact, output)
+    print(f"✅ Wrote calibration map {artifact['version']} ({method}) to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    parser.add_argument('--output', type=Path, default=CALIBRATION_MAP_PATH)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(main(args.method, args.output, args.dry_run))
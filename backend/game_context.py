@@ -0,0 +1,269 @@
+"""
+Per-team game context for bet analysis
+- One GameContext per team: record, recent form, key stats, injuries, weather
+- Built once (all sources fetched concurrently) and cached per team with a TTL
+- Renders both the LLM prompt sections (with shorter summaries for tight
+  token budgets) and the API response fields, with the rendered prompt text
+  cached on the object
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from injury_weather_service import InjuryWeatherService
+from prompt_builder import PromptSection
+from sports_data_service import SportsDataService, get_market_context_lines
+
+logger = logging.getLogger(__name__)
+
+GAME_CONTEXT_TTL = timedelta(seconds=int(os.environ.get('GAME_CONTEXT_TTL_SECONDS', '300')))
+MAX_CONTEXT_TEAMS = 2  # home and away
+
+# Injuries kept when the prompt has to be shortened
+SERIOUS_INJURY_STATUSES = ('Out', 'Doubtful', 'Injured Reserve')
+MAX_SUMMARY_INJURIES = 5
+
+DATA_USAGE_NOTE = "\n\n⚠️ Use this data to adjust your probability assessment. Consider recent form, head-to-head history, and market sentiment."
+
+_context_cache: Dict[str, Tuple['GameContext', datetime]] = {}
+_context_locks: Dict[str, asyncio.Lock] = {}
+
+
+@dataclass(slots=True)
+class GameContext:
+    """Everything the analysis knows about one team on the slip"""
+    team: str                                  # name as found on the slip
+    record: Optional[Dict] = None
+    recent_games: List[Dict] = field(default_factory=list)
+    form: Optional[Dict] = None
+    stats: Optional[Dict] = None
+    injuries: List[Dict] = field(default_factory=list)
+    weather: Optional[Dict] = None
+    built_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    _team_text: Optional[List[str]] = field(default=None, repr=False)
+    _injury_text: Optional[str] = field(default=None, repr=False)
+    _weather_text: Optional[str] = field(default=None, repr=False)
+
+    # ----- prompt -----
+
+    def team_lines(self) -> List[str]:
+        """Record, form and key stats lines of the TEAM DATA prompt section"""
+        if self._team_text is None:
+            lines = []
+            record = self.record
+            if record:
+                lines.append(f"\n**{record['team_name']}**")
+                if record.get('overall'):
+                    lines.append(f"  Record: {record['overall']}")
+                if record.get('home'):
+                    lines.append(f"  Home: {record['home']} | Away: {record.get('away', 'N/A')}")
+                if record.get('standing'):
+                    lines.append(f"  Standing: {record['standing']}")
+
+            if self.form:
+                lines.append(f"  Last 5: {self.form['form']} ({self.form['rating']})")
+                lines.append(f"  Recent margin: {'+' if self.form['avg_margin'] > 0 else ''}{self.form['avg_margin']} pts/game")
+                lines.append("  Recent results:")
+                for game in self.recent_games[:3]:
+                    lines.append(f"    {game['result']} vs {game['opponent']} ({game['score']})")
+
+            if self.stats and self.stats.get('key_stats'):
+                lines.append("  Key Stats:")
+                # Limit to 5 most relevant stats
+                for stat_name, value in list(self.stats['key_stats'].items())[:5]:
+                    lines.append(f"    - {stat_name}: {value}")
+            self._team_text = lines
+        return self._team_text
+
+    def summary_line(self) -> str:
+        """One-line stand-in for team_lines() when the prompt is over budget"""
+        name = self.record['team_name'] if self.record else self.team.title()
+        parts = [f"**{name}**"]
+        if self.record and self.record.get('overall'):
+            parts.append(self.record['overall'])
+        if self.form:
+            parts.append(f"last 5 {self.form['form']} ({self.form['rating']})")
+        return " ".join(parts)
+
+    def injury_text(self) -> str:
+        if self._injury_text is None:
+            self._injury_text = InjuryWeatherService.format_injury_report(self.injuries)
+        return self._injury_text
+
+    def injury_summary_text(self) -> str:
+        """Injury report limited to players ruled out or doubtful"""
+        serious = [i for i in self.injuries if i.get('status') in SERIOUS_INJURY_STATUSES]
+        return InjuryWeatherService.format_injury_report(serious[:MAX_SUMMARY_INJURIES])
+
+    def weather_text(self) -> str:
+        if self._weather_text is None:
+            self._weather_text = InjuryWeatherService.format_weather_report(self.weather)
+        return self._weather_text
+
+    def injury_weather_text(self) -> str:
+        """Injury report and venue/weather prompt sections"""
+        return self.injury_text() + self.weather_text()
+
+    # ----- response fields -----
+
+    def injuries_field(self) -> List[Dict]:
+        return [{**injury, 'team': self.team.title()} for injury in self.injuries]
+
+    def weather_field(self) -> Optional[Dict]:
+        """Forecast for an outdoor venue; None for domes and unknown venues"""
+        if self.weather and 'note' not in self.weather:
+            return self.weather
+        return None
+
+    def form_field(self) -> Optional[Dict]:
+        if not self.form:
+            return None
+        return {
+            'team': self.record.get('team_name', self.team.title()) if self.record else self.team.title(),
+            'record': self.record.get('overall', 'N/A') if self.record else 'N/A',
+            'form': self.form.get('form', ''),
+            'rating': self.form.get('rating', 'Unknown'),
+            'avg_margin': self.form.get('avg_margin', 0),
+            'recent': [f"{g['result']} vs {g['opponent']}" for g in self.recent_games[:3]]
+        }
+
+
+# ===== BUILDING =====
+
+def _value(result, default=None):
+    """A gathered result, or the default if it failed or came back empty"""
+    return default if isinstance(result, Exception) or not result else result
+
+
+async def _build_game_context(team_name: str) -> GameContext:
+    record, recent_games, stats, injuries, weather = await asyncio.gather(
+        SportsDataService.get_team_record(team_name),
+        SportsDataService.get_recent_games(team_name, limit=5),
+        SportsDataService.get_team_stats(team_name),
+        InjuryWeatherService.get_injuries_for_team(team_name),
+        InjuryWeatherService.get_weather_for_game(team_name),
+        return_exceptions=True
+    )
+    sources = {'record': record, 'recent games': recent_games, 'stats': stats, 'injuries': injuries, 'weather': weather}
+    for source, value in sources.items():
+        if isinstance(value, Exception):
+            logger.error(f"Error fetching {source} for {team_name}: {str(value)}")
+
+    recent_games = _value(recent_games, [])
+    return GameContext(
+        team=team_name,
+        record=_value(record),
+        recent_games=recent_games,
+        form=SportsDataService.calculate_form_rating(recent_games) if recent_games else None,
+        stats=_value(stats),
+        injuries=_value(injuries, []),
+        weather=_value(weather)
+    )
+
+
+async def get_game_context(team_name: str) -> GameContext:
+    """Cached GameContext for a team (one in-flight build per team)"""
+    key = team_name.lower().strip()
+    cached = _context_cache.get(key)
+    if cached and datetime.now(timezone.utc) - cached[1] < GAME_CONTEXT_TTL:
+        return cached[0]
+
+    lock = _context_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _context_cache.get(key)
+        if cached and datetime.now(timezone.utc) - cached[1] < GAME_CONTEXT_TTL:
+            return cached[0]
+        context = await _build_game_context(team_name)
+        _context_cache[key] = (context, context.built_at)
+        return context
+
+
+async def get_game_contexts(team_names: List[str]) -> List[GameContext]:
+    return list(await asyncio.gather(*(get_game_context(team) for team in team_names[:MAX_CONTEXT_TEAMS])))
+
+
+def prune_context_cache() -> int:
+    """Drop expired contexts, returns number removed"""
+    now = datetime.now(timezone.utc)
+    expired = [key for key, (_, built_at) in _context_cache.items() if now - built_at >= GAME_CONTEXT_TTL]
+    for key in expired:
+        _context_cache.pop(key, None)
+    return len(expired)
+
+
+# ===== RENDERING =====
+
+def render_team_data(contexts: List[GameContext]) -> List[str]:
+    if not contexts:
+        return []
+    lines = ["\n\n📊 TEAM DATA & ANALYSIS:"]
+    for context in contexts:
+        lines.extend(context.team_lines())
+    return lines
+
+
+async def _data_context_lines(contexts: List[GameContext], individual_bets: List[Dict], bet_details: str) -> List[str]:
+    context_parts = render_team_data(contexts)
+    context_parts.extend(await get_market_context_lines(individual_bets, bet_details))
+    if context_parts:
+        context_parts.append(DATA_USAGE_NOTE)
+    return context_parts
+
+
+def render_injury_weather(contexts: List[GameContext]) -> str:
+    return "".join(context.injury_weather_text() for context in contexts)
+
+
+async def analysis_context_sections(contexts: List[GameContext], individual_bets: List[Dict], bet_details: str) -> List[PromptSection]:
+    """
+    Real-time context of the analysis prompt as budgetable sections.
+    Market prices matter most, then team form, injuries and weather.
+    """
+    team_lines = render_team_data(contexts)
+    market_lines = await get_market_context_lines(individual_bets, bet_details)
+    sections = [
+        PromptSection(
+            'team_data', "\n".join(team_lines), priority=2,
+            summary="\n".join(team_lines[:1] + [context.summary_line() for context in contexts])
+        ),
+        PromptSection('market_data', "\n".join(market_lines), priority=1),
+        PromptSection('data_note', DATA_USAGE_NOTE if team_lines or market_lines else "", priority=5),
+        PromptSection(
+            'injuries', "".join(context.injury_text() for context in contexts), priority=3,
+            summary="".join(context.injury_summary_text() for context in contexts)
+        ),
+        PromptSection('weather', "".join(context.weather_text() for context in contexts), priority=4)
+    ]
+    return [section for section in sections if section.text]
+
+
+def game_context_fields(contexts: List[GameContext]) -> Dict:
+    """injuries_data / weather_data / team_form_data for the analysis response"""
+    weather = next((w for w in (c.weather_field() for c in contexts) if w), None)
+    return {
+        'injuries_data': [injury for context in contexts for injury in context.injuries_field()],
+        'weather_data': weather,
+        'team_form_data': [f for f in (c.form_field() for c in contexts) if f]
+    }
+
+
+# ===== COMPATIBILITY WRAPPERS =====
+
+async def get_enhanced_context_for_analysis(individual_bets: List[Dict], bet_details: str) -> str:
+    """
+    Get enhanced context string to add to AI prompt
+    Includes: live odds, team records, recent form, key stats
+    """
+    contexts = await get_game_contexts(SportsDataService.extract_team_names(bet_details))
+    return "\n".join(await _data_context_lines(contexts, individual_bets, bet_details))
+
+
+async def get_enhanced_game_context(team_names: List[str]) -> str:
+    """
+    Get injury and weather context for teams
+    """
+    return render_injury_weather(await get_game_contexts(team_names))
@@ -0,0 +1,87 @@
+"""
+Deterministic pre-ranking of candidate games for daily picks
+- Prices the whole slate at once with the pricing engine
+- Uses moneyline consensus no-vig probabilities, dispersion and best price per outcome
+- Scores every game so only the top-K candidates are sent to the LLM
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+import logging
+
+import numpy as np
+
+from pricing_engine import MARKET_INDEX, MIN_BOOKS, build_market_tensor, price_markets, summarize_game
+
+logger = logging.getLogger(__name__)
+
+H2H = MARKET_INDEX['h2h']
+
+
+def score_games(games: List[Dict], method: str = 'multiplicative') -> List[Dict]:
+    """
+    Price every game against the market consensus.
+    Returns one summary dict per input game (same order).
+    """
+    if not games:
+        return []
+
+    pricing = price_markets(build_market_tensor(games), method)
+    consensus = pricing.fair_prob[:, H2H]                        # (G, 2)
+    best_price = pricing.best_price[:, H2H]                      # (G, 2)
+    dispersion = pricing.dispersion[:, H2H]                      # (G,)
+    book_counts = pricing.book_count[:, H2H]                     # (G,)
+
+    # Edge of the best available price against the consensus fair probability
+    best_edge = consensus * best_price - 1                       # (G, 2)
+    best_side = np.argmax(np.nan_to_num(best_edge, nan=-np.inf), axis=1)
+    side_edge = best_edge[np.arange(len(games)), best_side]
+
+    # More disagreement between books means more room for a mispriced line
+    score = np.nan_to_num(side_edge, nan=-np.inf) + 0.5 * np.nan_to_num(dispersion)
+    score = np.where(book_counts >= MIN_BOOKS, score, -np.inf)
+
+    summaries = []
+    for g, game in enumerate(games):
+        side = int(best_side[g])
+        has_market = book_counts[g] >= MIN_BOOKS
+        summaries.append({
+            'score': float(score[g]),
+            'books': int(book_counts[g]),
+            'home_fair_prob': round(float(consensus[g, 0]) * 100, 1) if has_market else None,
+            'away_fair_prob': round(float(consensus[g, 1]) * 100, 1) if has_market else None,
+            'dispersion': round(float(dispersion[g]) * 100, 2) if has_market else None,
+            'avg_vig': round(float(pricing.avg_vig[g, H2H]) * 100, 2) if has_market else None,
+            'best_team': (game.get('home_team') if side == 0 else game.get('away_team')) if has_market else None,
+            'best_price': round(float(best_price[g, side]), 3) if has_market else None,
+            'best_book': pricing.tensor.book_titles[int(pricing.best_book[g, H2H, side])] if has_market else None,
+            'best_edge': round(float(side_edge[g]) * 100, 2) if has_market else None,
+            'pricing': summarize_game(pricing, g)
+        })
+    return summaries
+
+
+def rank_games(games: List[Dict], top_k: int = 12) -> List[Tuple[Dict, Dict]]:
+    """
+    Return the top-K (game, market_summary) pairs by pre-rank score.
+    Games that already started or lack a market consensus are dropped.
+    """
+    now = datetime.now(timezone.utc)
+    upcoming = []
+    for game in games:
+        commence = game.get('commence_time')
+        try:
+            if commence and datetime.fromisoformat(commence.replace('Z', '+00:00')) <= now:
+                continue
+        except ValueError:
+            pass
+        upcoming.append(game)
+
+    summaries = score_games(upcoming)
+    ranked = [
+        (game, summary) for game, summary in zip(upcoming, summaries)
+        if summary['score'] != float('-inf')
+    ]
+    ranked.sort(key=lambda pair: pair[1]['score'], reverse=True)
+    logger.info(f"Pre-ranked {len(games)} games, {len(ranked)} with a market consensus, keeping {min(top_k, len(ranked))}")
+    return ranked[:top_k]
@@ -2,7 +2,7 @@ import os
 import aiohttp
 import logging
 from typing import Dict, Optional, List
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -16,6 +16,10 @@ logger = logging.getLogger(__name__)
 WEATHERAPI_KEY = os.environ.get('WEATHERAPI_KEY', '')
 WEATHERAPI_BASE = 'http://api.weatherapi.com/v1'
 
+# Injury reports change slowly and cost 1 + 2 requests per player, so cache them longer
+_injury_cache = {}
+INJURY_CACHE_DURATION = timedelta(hours=6)
+
 # Stadium/Venue locations (major NFL stadiums)
 STADIUM_LOCATIONS = {
     # NFL Teams
@@ -44,30 +48,30 @@ STADIUM_LOCATIONS = {
     # Add more as needed
 }
 
+# ESPN Team IDs (NFL) for the injuries endpoint
+INJURY_TEAM_IDS = {
+    'chiefs': '12', 'bills': '2', 'cowboys': '6', 'eagles': '21',
+    'packers': '9', '49ers': '25', 'ravens': '33', 'bengals': '4',
+    'browns': '5', 'steelers': '23', 'patriots': '17', 'dolphins': '15',
+    'jets': '20', 'raiders': '13', 'chargers': '24', 'rams': '14',
+    'seahawks': '26', 'broncos': '7', 'saints': '18', 'falcons': '1',
+    'panthers': '29', 'buccaneers': '27'
+}
+
 
 class InjuryWeatherService:
     """Service for fetching injury reports and weather data"""
     
     @staticmethod
-    async def get_injuries_for_team(team_name: str) -> List[Dict]:
+    async def get_injuries_for_team(team_name: str, force_refresh: bool = False) -> List[Dict]:
         """
         Fetch injury report from ESPN for a team
         Uses ESPN's sports.core API for injuries
         """
         try:
-            # ESPN Team IDs (NFL)
-            team_ids = {
-                'chiefs': '12', 'bills': '2', 'cowboys': '6', 'eagles': '21',
-                'packers': '9', '49ers': '25', 'ravens': '33', 'bengals': '4',
-                'browns': '5', 'steelers': '23', 'patriots': '17', 'dolphins': '15',
-                'jets': '20', 'raiders': '13', 'chargers': '24', 'rams': '14',
-                'seahawks': '26', 'broncos': '7', 'saints': '18', 'falcons': '1',
-                'panthers': '29', 'buccaneers': '27'
-            }
-            
             team_lower = team_name.lower()
             team_id = None
-            for key, tid in team_ids.items():
+            for key, tid in INJURY_TEAM_IDS.items():
                 if key in team_lower or team_lower in key:
                     team_id = tid
                     break
@@ -75,6 +79,12 @@ class InjuryWeatherService:
             if not team_id:
                 return []
             
+            cache_key = f"injuries_{team_id}"
+            if not force_refresh and cache_key in _injury_cache:
+                cached_data, cached_time = _injury_cache[cache_key]
+                if datetime.now(timezone.utc) - cached_time < INJURY_CACHE_DURATION:
+                    return cached_data
+            
             # Try the sports.core.api endpoint for injuries
             url = f'https://sports.core.api.espn.com/v2/sports/football/leagues/nfl/teams/{team_id}/injuries'
             
@@ -125,6 +135,7 @@ class InjuryWeatherService:
                                     logger.debug(f"Error parsing injury: {str(e)}")
                                     continue
                         
+                        _injury_cache[cache_key] = (injuries, datetime.now(timezone.utc))
                         return injuries
                     else:
                         logger.error(f"ESPN injury API error: {response.status}")
@@ -133,6 +144,27 @@ class InjuryWeatherService:
             logger.error(f"Error fetching injuries for {team_name}: {str(e)}")
             return []
     
+    @staticmethod
+    async def refresh_cached_injuries() -> int:
+        """Re-fetch injury reports for every team currently in the cache"""
+        team_ids = [key.split('_', 1)[1] for key in list(_injury_cache.keys())]
+        refreshed = 0
+        for team_id in team_ids:
+            team_key = next((k for k, v in INJURY_TEAM_IDS.items() if v == team_id), None)
+            if team_key:
+                await InjuryWeatherService.get_injuries_for_team(team_key, force_refresh=True)
+                refreshed += 1
+        return refreshed
+    
+    @staticmethod
+    def prune_cache() -> int:
+        """Drop expired injury reports, returns number of entries removed"""
+        now = datetime.now(timezone.utc)
+        expired = [k for k, (_, cached_time) in _injury_cache.items() if now - cached_time >= INJURY_CACHE_DURATION]
+        for key in expired:
+            _injury_cache.pop(key, None)
+        return len(expired)
+    
     @staticmethod
     async def get_weather_for_game(team_name: str, game_time: Optional[datetime] = None) -> Optional[Dict]:
         """
@@ -238,22 +270,3 @@ class InjuryWeatherService:
         
         return report
 
-
-async def get_enhanced_game_context(team_names: List[str]) -> str:
-    """
-    Get injury and weather context for teams
-    """
-    context_parts = []
-    
-    for team in team_names[:2]:  # Max 2 teams (home and away)
-        # Get injuries
-        injuries = await InjuryWeatherService.get_injuries_for_team(team)
-        if injuries:
-            context_parts.append(InjuryWeatherService.format_injury_report(injuries))
-        
-        # Get weather (only for home team typically)
-        weather = await InjuryWeatherService.get_weather_for_game(team)
-        if weather:
-            context_parts.append(InjuryWeatherService.format_weather_report(weather))
-    
-    return "".join(context_parts)
@@ -0,0 +1,266 @@
+"""
+Per-leg market pricing for analyzed bet slips
+- Parses each `individual_bets` entry into team / market / line
+- Matches it to the Odds API outcome for the same game, within the leg's sport
+  when it names one; nicknames shared across leagues without one stay unmatched
+- Market-implied fair probability and the edge of the slip price against it
+- Deterministic parlay EV from market prices only, no LLM involved
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from odds_math import american_to_decimal, decimal_to_american
+from pricing_engine import build_market_tensor, price_outcome
+
+logger = logging.getLogger(__name__)
+
+TOTAL_PATTERN = re.compile(r'\b(over|under|o|u)\s*(\d+(?:\.\d+)?)\b', re.IGNORECASE)
+SPREAD_PATTERN = re.compile(r'(?<![\w.])([+-]\d+(?:\.\d+)?)(?![\d.])')
+PICKEM_PATTERN = re.compile(r'\b(pk|pick\s*\'?em)\b', re.IGNORECASE)
+MONEYLINE_PATTERN = re.compile(r'\b(ml|moneyline|money line|to win)\b', re.IGNORECASE)
+
+# Player and game props are not in the h2h/spreads/totals feed
+PROP_KEYWORDS = (
+    'yards', 'yds', 'touchdown', 'td ', 'receptions', 'rebounds', 'assists', 'points',
+    'pts', 'strikeouts', 'hits', 'home run', 'passing', 'rushing', 'receiving',
+    'first half', '1st half', '1h', 'quarter', '1q', 'inning', 'period', 'anytime'
+)
+
+# Spreads beyond this are treated as prices that leaked into the description
+MAX_SPREAD = 60
+
+# League names in a leg's `sport` field or its description -> Odds API sport key
+SPORT_HINTS = {
+    'nfl': 'americanfootball_nfl',
+    'nba': 'basketball_nba',
+    'mlb': 'baseball_mlb',
+    'nhl': 'icehockey_nhl'
+}
+SPORT_HINT_PATTERN = re.compile(rf"\b({'|'.join(SPORT_HINTS)})\b", re.IGNORECASE)
+
+
+def format_american(decimal_odds: float) -> str:
+    return f"{round(decimal_to_american(decimal_odds)):+d}"
+
+
+def parse_leg(description: str) -> Optional[Dict]:
+    """
+    Work out market and line from a leg description.
+    Returns {'market': 'h2h'|'spreads'|'totals', 'line': float|None, 'side': 'Over'|'Under'|None}
+    or None for props and anything else the odds feed cannot price.
+    """
+    if not description:
+        return None
+    text = description.lower()
+    if any(keyword in f"{text} " for keyword in PROP_KEYWORDS):
+        return None
+
+    total = TOTAL_PATTERN.search(description)
+    if total:
+        side = 'Over' if total.group(1).lower().startswith('o') else 'Under'
+        return {'market': 'totals', 'line': float(total.group(2)), 'side': side}
+
+    if MONEYLINE_PATTERN.search(description):
+        return {'market': 'h2h', 'line': None, 'side': None}
+
+    if PICKEM_PATTERN.search(description):
+        return {'market': 'spreads', 'line': 0.0, 'side': None}
+
+    for match in SPREAD_PATTERN.finditer(description):
+        line = float(match.group(1))
+        if abs(line) < MAX_SPREAD:
+            return {'market': 'spreads', 'line': line, 'side': None}
+
+    # Just a team name: straight moneyline
+    return {'market': 'h2h', 'line': None, 'side': None}
+
+
+def sport_hint(leg: Dict) -> Optional[str]:
+    """Odds API sport key a leg names (its `sport` field, else a league in the description), or None"""
+    sport = str(leg.get('sport') or '').strip().lower()
+    if sport in SPORT_HINTS.values():
+        return sport
+    if sport in SPORT_HINTS:
+        return SPORT_HINTS[sport]
+    match = SPORT_HINT_PATTERN.search(leg.get('description') or '')
+    return SPORT_HINTS[match.group(1).lower()] if match else None
+
+
+def _line_position(description: str) -> Optional[int]:
+    """Where the spread / moneyline / pick'em token sits, None for a bare team name or a total"""
+    positions = [
+        match.start() for match in SPREAD_PATTERN.finditer(description)
+        if abs(float(match.group(1))) < MAX_SPREAD
+    ]
+    positions += [match.start() for pattern in (MONEYLINE_PATTERN, PICKEM_PATTERN) for match in pattern.finditer(description)]
+    return min(positions) if positions else None
+
+
+def _team_aliases(team_name: str) -> List[Tuple[str, int]]:
+    """Full name, two-word nickname (Red Sox, Blue Jays) and nickname, strongest first"""
+    words = team_name.lower().split()
+    aliases = [(team_name.lower(), 3)]
+    if len(words) > 2:
+        aliases.append((' '.join(words[-2:]), 2))
+    if len(words) > 1:
+        aliases.append((words[-1], 1))
+    return aliases
+
+
+def _mention(text: str, team_name: str) -> Optional[Tuple[int, int]]:
+    """(strength, position) of the best mention of a team in the text, or None"""
+    for alias, strength in _team_aliases(team_name):
+        match = re.search(rf'\b{re.escape(alias)}\b', text)
+        if match:
+            return strength, match.start()
+    return None
+
+
+def _pick_side(home: Tuple[int, int], away: Tuple[int, int], anchor: Optional[int]) -> int:
+    """
+    Side of a leg naming both teams: the team named right before the line or
+    "ML" ("Raiders @ Chiefs -3.5" is the Chiefs), else the first team named
+    """
+    if anchor is not None:
+        before = [(position, side) for side, (_, position) in enumerate((home, away)) if position < anchor]
+        if before:
+            return max(before)[1]
+    return 0 if home[1] < away[1] else 1
+
+
+def match_game(description: str, games: List[Dict], sport: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    Find the game a leg refers to, among `sport`'s games when given.
+    Returns (game index, 0 for home / 1 for away) or None,
+    also None when the best match is a name shared by games of different sports
+    (Giants, Panthers, Kings, Jets, Rangers, Cardinals) and no sport says which.
+    """
+    text = description.lower()
+    anchor = _line_position(description)
+    best = None
+    best_sports = set()
+    for g, game in enumerate(games):
+        if sport and game.get('sport_key') != sport:
+            continue
+        home = _mention(text, game.get('home_team', ''))
+        away = _mention(text, game.get('away_team', ''))
+        if not home and not away:
+            continue
+        strength = max(home[0] if home else 0, away[0] if away else 0)
+        if home and away:
+            side = _pick_side(home, away, anchor)
+        else:
+            side = 0 if home else 1
+        if best is None or strength > best[0]:
+            best = (strength, g, side)
+            best_sports = {game.get('sport_key')}
+        elif strength == best[0]:
+            best_sports.add(game.get('sport_key'))
+    if best is None or len(best_sports) > 1:
+        return None
+    _, g, side = best
+    return g, side
+
+
+def price_leg(leg: Dict, games: List[Dict], tensor=None, method: str = 'multiplicative') -> Dict:
+    """Market pricing for one leg. Always returns a dict; `matched` says whether it priced."""
+    description = leg.get('description', '')
+    result = {'description': description, 'matched': False}
+
+    parsed = parse_leg(description)
+    if not parsed:
+        result['reason'] = 'Market not available (prop or unrecognized bet type)'
+        return result
+
+    match = match_game(description, games, sport_hint(leg))
+    if not match:
+        result['reason'] = 'No matching game in the odds feed'
+        return result
+    g, side = match
+    game = games[g]
+
+    if parsed['market'] == 'totals':
+        outcome = 0 if parsed['side'] == 'Over' else 1
+        selection = parsed['side']
+    else:
+        outcome = side
+        selection = game.get('home_team') if side == 0 else game.get('away_team')
+
+    tensor = tensor or build_market_tensor(games)
+    consensus = price_outcome(tensor, g, parsed['market'], outcome, parsed['line'], method)
+    result.update({
+        'game': f"{game.get('away_team')} @ {game.get('home_team')}",
+        'sport': game.get('sport_key'),
+        'commence_time': game.get('commence_time'),
+        'market': parsed['market'],
+        'selection': selection,
+        'line': parsed['line']
+    })
+    if not consensus:
+        result['reason'] = 'Not enough books quoting this line'
+        return result
+
+    try:
+        taken = american_to_decimal(leg.get('odds'))
+    except ValueError:
+        taken = None
+    result.update({
+        'matched': True,
+        'books': consensus['books'],
+        'fair_probability': round(consensus['fair_prob'] * 100, 2),
+        'fair_odds': format_american(consensus['fair_decimal']),
+        'best_price': format_american(consensus['best_price']),
+        'best_book': consensus['best_book'],
+        'fair_prob_raw': consensus['fair_prob'],
+        'decimal_odds': round(taken, 3) if taken else None
+    })
+    if taken:
+        # Edge of the slip price against the no-vig market, the closing-line-value view
+        result['edge'] = round((consensus['fair_prob'] * taken - 1) * 100, 2)
+        result['vs_best_price'] = round((taken / consensus['best_price'] - 1) * 100, 2)
+    return result
+
+
+def price_legs(individual_bets: List[Dict], games: List[Dict], method: str = 'multiplicative') -> Dict:
+    """
+    Price every leg of a slip against the market.
+    The parlay fair probability assumes independent legs, so same-game parlays read optimistic.
+    """
+    tensor = build_market_tensor(games) if games else None
+    legs = [price_leg(leg, games, tensor, method) for leg in individual_bets] if tensor else [
+        {'description': leg.get('description', ''), 'matched': False, 'reason': 'No live odds available'}
+        for leg in individual_bets
+    ]
+
+    priced = [leg for leg in legs if leg['matched']]
+    summary = {
+        'legs': legs,
+        'legs_total': len(legs),
+        'legs_priced': len(priced),
+        'fair_probability': None,
+        'decimal_odds': None,
+        'expected_value': None,
+        'method': method,
+        'priced_at': datetime.now(timezone.utc)
+    }
+
+    if legs and len(priced) == len(legs) and all(leg.get('decimal_odds') for leg in priced):
+        fair_prob = 1.0
+        decimal_odds = 1.0
+        for leg in priced:
+            fair_prob *= leg['fair_prob_raw']
+            decimal_odds *= leg['decimal_odds']
+        summary.update({
+            'fair_probability': round(fair_prob * 100, 2),
+            'decimal_odds': round(decimal_odds, 3),
+            'expected_value': round((fair_prob * decimal_odds - 1) * 100, 2)
+        })
+
+    for leg in legs:
+        leg.pop('fair_prob_raw', None)
+
+    logger.info(f"Market-priced {len(priced)}/{len(legs)} legs")
+    return summary
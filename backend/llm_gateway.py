@@ -0,0 +1,445 @@
+"""
+Shared LLM gateway for BetrSlip
+- Global and per-user concurrency limits, so bursts queue here instead of upstream
+- Per-call deadline covering queueing, the upstream call and retries
+- Jittered exponential retries on transient errors (rate limits, timeouts, 5xx)
+- Circuit breaker: fail fast while the provider is down, probe after a cooldown
+- Streaming: on_text sees the answer grow when the client can stream (litellm)
+- Pluggable client factory (LLM_CLIENT=emergent|litellm, emergent by default);
+  LLM_FAKE_MODEL=true swaps in a local fake model
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_CONCURRENCY_PER_USER = int(os.environ.get('LLM_MAX_CONCURRENCY_PER_USER', '2'))
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get('LLM_CALL_TIMEOUT_SECONDS', '90'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_RETRY_BASE_SECONDS = 1.0
+LLM_RETRY_MAX_SECONDS = 8.0
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+LLM_FAKE_MODEL = os.environ.get('LLM_FAKE_MODEL', 'false').lower() == 'true'
+# emergent: emergentintegrations LlmChat (no streaming);
+# litellm: opt-in streaming client, talks to LLM_API_BASE (or the provider's default endpoint)
+LLM_CLIENT = os.environ.get('LLM_CLIENT', 'emergent')
+LLM_API_BASE = os.environ.get('LLM_API_BASE') or None
+
+# Exception class names (litellm / openai / aiohttp) worth retrying
+TRANSIENT_ERROR_NAMES = {
+    'RateLimitError', 'APIConnectionError', 'APITimeoutError', 'Timeout', 'TimeoutError',
+    'ServiceUnavailableError', 'InternalServerError', 'BadGatewayError',
+    'ClientConnectionError', 'ServerDisconnectedError', 'ClientOSError'
+}
+TRANSIENT_ERROR_MARKERS = ('rate limit', '429', '500', '502', '503', '504', 'overloaded', 'timed out', 'connection reset')
+
+
+class LLMGatewayError(Exception):
+    """Raised by the gateway itself (not the provider); maps to a 5xx for the client"""
+
+
+class LLMUnavailableError(LLMGatewayError):
+    """Circuit breaker is open"""
+
+
+class LLMTimeoutError(LLMGatewayError):
+    """The call did not finish (including queueing and retries) before its deadline"""
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
+
+
+# ===== CIRCUIT BREAKER =====
+
+class CircuitBreaker:
+    """closed -> open after N consecutive transient failures -> half_open after cooldown -> one probe"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def before_call(self):
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise LLMUnavailableError("AI service temporarily unavailable, please try again shortly")
+            self.state = 'half_open'
+            self._probe_in_flight = False
+        if self.state == 'half_open':
+            if self._probe_in_flight:
+                raise LLMUnavailableError("AI service is recovering, please try again shortly")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        if self.state != 'closed':
+            logger.info("LLM circuit breaker closed")
+        self.state = 'closed'
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.error(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """A half-open probe ended without telling us anything about the provider"""
+        self._probe_in_flight = False
+
+
+# ===== CLIENTS =====
+
+def image_media_type(image_bytes: bytes) -> str:
+    """Guess the media type of an uploaded image from its magic bytes"""
+    if image_bytes.startswith(b'\x89PNG'):
+        return "image/png"
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return "image/webp"
+    if image_bytes.startswith(b'GIF8'):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def _base64_media_type(image_base64: str) -> str:
+    # 16 base64 characters decode to the 12 bytes the magic-byte checks need
+    try:
+        return image_media_type(base64.b64decode(image_base64[:16]))
+    except (binascii.Error, ValueError):
+        return "image/jpeg"
+
+
+def emergent_client_factory(session_id: str, system_message: str, provider: Optional[str], model: Optional[str]):
+    from emergentintegrations.llm.chat import LlmChat
+
+    chat = LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY', ''),
+        session_id=session_id,
+        system_message=system_message
+    )
+    if provider and model:
+        chat.with_model(provider, model)
+    return chat
+
+
+class LiteLLMStreamingClient:
+    """
+    Chat session over litellm.acompletion with stream=True. Same interface as
+    LlmChat (send_message keeps the conversation history) plus stream_message,
+    which yields the answer as it is generated.
+    """
+
+    def __init__(self, session_id: str, system_message: str, provider: Optional[str] = None, model: Optional[str] = None):
+        self.session_id = session_id
+        self.model = f"{provider or 'openai'}/{model or 'gpt-4o'}"
+        self.api_key = os.environ.get('LLM_API_KEY') or os.environ.get('EMERGENT_LLM_KEY', '')
+        self.api_base = LLM_API_BASE
+        self.messages = [{"role": "system", "content": system_message}]
+
+    @staticmethod
+    def _content(message):
+        text = getattr(message, 'text', str(message))
+        images = getattr(message, 'file_contents', None) or []
+        if not images:
+            return text
+        return [{"type": "text", "text": text}] + [
+            {"type": "image_url", "image_url": {"url": f"data:{_base64_media_type(image.image_base64)};base64,{image.image_base64}"}}
+            for image in images
+        ]
+
+    async def stream_message(self, message) -> AsyncIterator[str]:
+        import litellm
+
+        messages = self.messages + [{"role": "user", "content": self._content(message)}]
+        response = await litellm.acompletion(
+            model=self.model,
+            messages=messages,
+            api_key=self.api_key or None,
+            api_base=self.api_base,
+            stream=True
+        )
+        parts = []
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        # History only grows once the whole answer is in, so a retried stream starts clean
+        self.messages = messages + [{"role": "assistant", "content": "".join(parts)}]
+
+    async def send_message(self, message) -> str:
+        return "".join([chunk async for chunk in self.stream_message(message)])
+
+
+CLIENT_FACTORIES = {'emergent': emergent_client_factory, 'litellm': LiteLLMStreamingClient}
+
+
+FAKE_EXTRACTION = (
+    "SPORTSBOOK: DraftKings\nBET_TYPE: Parlay\nTOTAL_STAKE: $10\nPOTENTIAL_PAYOUT: $26.40\nTOTAL_ODDS: +164\n\n"
+    "INDIVIDUAL SELECTIONS:\n1. Team/Player: Kansas City Chiefs\n   Bet Type: Spread\n   Line: -2.5\n   Odds: -110\n"
+    "2. Team/Player: Buffalo Bills vs Kansas City Chiefs\n   Bet Type: Over/Under\n   Line: Over 47.5\n   Odds: -110\n"
+)
+FAKE_STREAM_CHUNK = 16
+
+
+class FakeLLMClient:
+    """
+    Local stand-in for LlmChat: canned, well-formed answers for the prompts this
+    app sends, with optional latency and failure injection for load tests.
+    """
+
+    def __init__(self, session_id: str, system_message: str, provider: Optional[str] = None, model: Optional[str] = None):
+        self.session_id = session_id
+        self.latency = float(os.environ.get('LLM_FAKE_LATENCY_SECONDS', '0.05'))
+        self.failure_rate = float(os.environ.get('LLM_FAKE_FAILURE_RATE', '0'))
+
+    async def send_message(self, message) -> str:
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise ConnectionError("fake model: 503 service unavailable")
+        return self._reply(getattr(message, 'text', str(message)))
+
+    async def stream_message(self, message) -> AsyncIterator[str]:
+        """The same answer in small chunks, the latency spread across them"""
+        reply = self._reply(getattr(message, 'text', str(message)))
+        chunks = [reply[i:i + FAKE_STREAM_CHUNK] for i in range(0, len(reply), FAKE_STREAM_CHUNK)]
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(self.latency / len(chunks))
+            if i == len(chunks) // 2 and random.random() < self.failure_rate:
+                raise ConnectionError("fake model: connection reset mid-stream")
+            yield chunk
+
+    @staticmethod
+    def _reply(text: str) -> str:
+        if 'EXTRACT ALL TEXT' in text:
+            return FAKE_EXTRACTION
+        if 'List every team' in text:
+            return "Kansas City Chiefs\nBuffalo Bills"
+        if '"picks"' in text:
+            return json.dumps({"picks": [{
+                "sport": "NFL", "title": "Kansas City Chiefs -2.5 vs Buffalo Bills",
+                "description": "Fake pick", "win_probability": 58, "odds": "-110", "confidence": 6,
+                "reasoning": ["Fake reason"], "risk_factors": ["Fake risk"], "game_time": "Today 8:20 PM ET",
+                "home_team": "Kansas City Chiefs", "away_team": "Buffalo Bills"
+            }]})
+        extraction = {"extraction": FAKE_EXTRACTION} if '"extraction"' in text else {}
+        return json.dumps({
+            **extraction,
+            "win_probability": 27.5, "confidence_score": 6, "bet_type": "parlay",
+            "total_stake": "$10", "total_odds": "+164", "potential_payout": "$26.40",
+            "individual_bets": [
+                {"description": "Kansas City Chiefs -2.5", "odds": "-110", "individual_probability": 52, "reasoning": "Fake"},
+                {"description": "Over 47.5 Chiefs vs Bills", "odds": "-110", "individual_probability": 50, "reasoning": "Fake"}
+            ],
+            "risk_factors": ["Fake risk"], "positive_factors": ["Fake strength"],
+            "analysis": "Fake analysis for local testing.",
+            "bet_details": "$10 two-leg parlay at +164", "sharp_analysis": "n/a"
+        })
+
+
+# ===== GATEWAY =====
+
+class LLMSession:
+    """One conversation (keeps the client's message history) routed through the gateway"""
+
+    def __init__(self, gateway: 'LLMGateway', client, user_id: Optional[str]):
+        self.gateway = gateway
+        self.client = client
+        self.user_id = user_id
+
+    async def send(self, message, timeout: Optional[float] = None, on_text: Optional[Callable[[str], None]] = None) -> str:
+        return await self.gateway.call(self.client, message, self.user_id, timeout, on_text)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        client_factory: Optional[Callable[..., Any]] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_per_user: int = LLM_MAX_CONCURRENCY_PER_USER,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.client_factory = client_factory or (FakeLLMClient if LLM_FAKE_MODEL else CLIENT_FACTORIES.get(LLM_CLIENT, emergent_client_factory))
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._users: Dict[str, asyncio.Semaphore] = {}
+        self._user_waiters: Dict[str, int] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.stats = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "rejected": 0, "streamed": 0}
+
+    def session(
+        self,
+        session_prefix: str,
+        system_message: str,
+        user_id: Optional[str] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> LLMSession:
+        client = self.client_factory(f"{session_prefix}_{uuid.uuid4()}", system_message, provider, model)
+        return LLMSession(self, client, user_id)
+
+    @asynccontextmanager
+    async def _slot(self, user_id: Optional[str], deadline: float):
+        """Hold a per-user slot and a global slot; waiting counts against the deadline"""
+        loop = asyncio.get_running_loop()
+        user_semaphore = None
+        if user_id:
+            user_semaphore = self._users.setdefault(user_id, asyncio.Semaphore(self.max_per_user))
+            self._user_waiters[user_id] = self._user_waiters.get(user_id, 0) + 1
+
+        acquired = []
+        try:
+            self.queued += 1
+            try:
+                for semaphore in (user_semaphore, self._global):
+                    if semaphore is not None:
+                        await asyncio.wait_for(semaphore.acquire(), max(deadline - loop.time(), 0))
+                        acquired.append(semaphore)
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError("AI service is busy, please try again shortly")
+            finally:
+                self.queued -= 1
+
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+            if user_id:
+                self._user_waiters[user_id] -= 1
+                if not self._user_waiters[user_id]:
+                    # Nobody holds or waits for this user's semaphore: drop it
+                    del self._user_waiters[user_id]
+                    self._users.pop(user_id, None)
+
+    async def _complete(self, client, message, on_text: Optional[Callable[[str], None]]) -> str:
+        """
+        One upstream attempt. With on_text, streams when the client has
+        stream_message and calls on_text with the text so far after every chunk;
+        clients that can't stream call it once with the whole answer.
+        """
+        stream = getattr(client, 'stream_message', None) if on_text else None
+        if stream is None:
+            text = await client.send_message(message)
+            if on_text:
+                on_text(text)
+            return text
+
+        self.stats["streamed"] += 1
+        text = ""
+        async for chunk in stream(message):
+            text += chunk
+            on_text(text)
+        return text
+
+    async def call(
+        self,
+        client,
+        message,
+        user_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_text: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        send_message through the limits, with deadline, retries and circuit breaker.
+        A retried stream starts over, so on_text may see the same text again.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or LLM_CALL_TIMEOUT_SECONDS)
+        self.stats["calls"] += 1
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except LLMUnavailableError:
+                self.stats["rejected"] += 1
+                raise
+
+            try:
+                async with self._slot(user_id, deadline):
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    result = await asyncio.wait_for(self._complete(client, message, on_text), remaining)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except LLMGatewayError:
+                # Deadline spent queueing here: says nothing about the provider
+                self.breaker.release_probe()
+                self.stats["failed"] += 1
+                self.stats["timeouts"] += 1
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_probe()
+
+                delay = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if not transient or attempt >= self.max_retries or loop.time() + delay >= deadline:
+                    self.stats["failed"] += 1
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.stats["timeouts"] += 1
+                        raise LLMTimeoutError("AI analysis timed out, please try again") from e
+                    raise
+
+                logger.warning(f"Transient LLM error (attempt {attempt + 1}), retrying in {delay:.1f}s: {str(e) or type(e).__name__}")
+                self.stats["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.stats["succeeded"] += 1
+            return result
+
+    def describe(self) -> dict:
+        """Gateway state for the admin API"""
+        return {
+            "client": getattr(self.client_factory, '__name__', type(self.client_factory).__name__),
+            "max_concurrency": self.max_concurrency,
+            "max_per_user": self.max_per_user,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "active_users": len(self._users),
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.failures},
+            "stats": dict(self.stats)
+        }
+
+
+gateway = LLMGateway()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+One-time migration: convert ISO-8601 string timestamps to native BSON dates.
+
+Older documents stored `created_at` and similar fields as `.isoformat()`
+strings. Range queries, sorts and TTL indexes need real dates, so this
+rewrites every string-typed timestamp field in place. Safe to re-run:
+only fields that are still strings are touched.
+
+Usage:
+    python migrate_datetimes.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BATCH_SIZE = 500
+
+# collection -> timestamp fields written by server.py / admin_subscription.py
+DATETIME_FIELDS = {
+    'users': ['created_at', 'banned_at', 'last_login'],
+    'user_usage': ['created_at', 'last_analysis_at'],
+    'subscriptions': ['subscription_start', 'updated_at', 'revoked_at'],
+    'bet_analyses': ['created_at', 'outcome_marked_at'],
+    'top_bets': ['created_at'],
+    'daily_picks': ['created_at', 'updated_at'],
+    'payment_transactions': ['created_at', 'paid_at'],
+}
+
+
+def parse_timestamp(value: str):
+    """Parse an ISO string, treating naive values as UTC. Returns None if unparseable."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_collection(db, collection_name: str, fields: list, dry_run: bool) -> int:
+    """Convert string timestamps in one collection, returns number of documents updated"""
+    collection = db[collection_name]
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+
+    updated = 0
+    skipped = 0
+    operations = []
+
+    async for doc in collection.find(query, projection):
+        changes = {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str):
+                parsed = parse_timestamp(value)
+                if parsed:
+                    changes[field] = parsed
+                else:
+                    skipped += 1
+        if changes:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+        if len(operations) >= BATCH_SIZE:
+            if not dry_run:
+                await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+
+    if operations:
+        if not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+
+    print(f"  {collection_name}: {updated} documents {'would be ' if dry_run else ''}updated"
+          + (f", {skipped} unparseable values left as-is" if skipped else ""))
+    return updated
+
+
+async def main(dry_run: bool = False):
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    print(f"🕒 Migrating string timestamps to BSON dates{' (dry run)' if dry_run else ''}")
+    total = 0
+    for collection_name, fields in DATETIME_FIELDS.items():
+        total += await migrate_collection(db, collection_name, fields, dry_run)
+    print(f"✅ Done - {total} documents {'would be ' if dry_run else ''}updated")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(dry_run='--dry-run' in sys.argv))
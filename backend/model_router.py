@@ -0,0 +1,261 @@
+"""
+Per-stage model routing for BetrSlip's LLM calls
+- Each stage (extraction, first_look, analysis, single_pass, picks) has an
+  ordered list of models, cheapest first, plus fallback models
+- A stage starts on its first model and escalates to the next one when the
+  caller rejects the answer (e.g. low extraction confidence) or the call fails;
+  fallback models are only tried on errors
+- MODEL_ROUTES (JSON) overrides any stage, e.g.
+  {"extraction": {"models": ["openai/gpt-4o"], "fallback": ["anthropic/claude-3-5-sonnet-20241022"]}}
+- One deadline per stage call (LLM_CALL_TIMEOUT_SECONDS by default) covers
+  every model it tries, escalations and fallbacks included
+- Per stage and model: calls, errors, escalations, latency, estimated tokens
+  and cost, extraction confidence - the numbers the routes are tuned from
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from llm_gateway import LLM_CALL_TIMEOUT_SECONDS, LLMTimeoutError, LLMUnavailableError, gateway as llm_gateway
+from prompt_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('extraction', 'first_look', 'analysis', 'single_pass', 'picks')
+
+DEFAULT_ROUTES = {
+    # Most slips are simple: a small vision model reads them, hard ones escalate
+    'extraction': {'models': ['openai/gpt-4o-mini', 'openai/gpt-4o'], 'fallback': []},
+    # Only has to read team names (single-pass mode)
+    'first_look': {'models': [f"openai/{os.environ.get('FIRST_LOOK_MODEL', 'gpt-4o-mini')}"], 'fallback': []},
+    # The probability itself: calibration is tracked per analysis model
+    'analysis': {'models': ['openai/gpt-4o'], 'fallback': ['openai/gpt-4o-mini']},
+    'single_pass': {'models': ['openai/gpt-4o'], 'fallback': []},
+    'picks': {'models': ['openai/gpt-4o'], 'fallback': ['openai/gpt-4o-mini']},
+}
+
+# USD per million input / output tokens, for cost estimates only
+MODEL_PRICES = {
+    'openai/gpt-4o': (2.50, 10.00),
+    'openai/gpt-4o-mini': (0.15, 0.60),
+}
+# Rough input tokens of one slip screenshot (high detail)
+IMAGE_TOKEN_ESTIMATE = 765
+
+
+@dataclass(slots=True, frozen=True)
+class ModelChoice:
+    provider: str
+    model: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+    @classmethod
+    def parse(cls, label: str) -> 'ModelChoice':
+        provider, _, model = label.partition('/')
+        if not provider or not model:
+            raise ValueError(f"Model must be 'provider/model', got {label!r}")
+        return cls(provider, model)
+
+
+@dataclass(slots=True)
+class StageRoute:
+    models: List[ModelChoice]
+    fallback: List[ModelChoice] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class RoutedReply:
+    text: str
+    model: ModelChoice
+    attempts: List[Tuple[str, str]]     # (model label, ok / escalated / error)
+
+    @property
+    def escalated(self) -> bool:
+        return any(outcome == 'escalated' for _, outcome in self.attempts)
+
+
+@dataclass(slots=True)
+class ModelStats:
+    calls: int = 0
+    errors: int = 0
+    escalations: int = 0
+    latency_ms: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    confidence_sum: float = 0.0
+    confidence_count: int = 0
+
+    def describe(self) -> dict:
+        succeeded = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "escalations": self.escalations,
+            "avg_latency_ms": round(self.latency_ms / succeeded) if succeeded else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 4),
+            "avg_confidence": round(self.confidence_sum / self.confidence_count, 3) if self.confidence_count else None
+        }
+
+
+def _build_routes(config: Dict[str, dict]) -> Dict[str, StageRoute]:
+    return {
+        stage: StageRoute(
+            models=[ModelChoice.parse(label) for label in route['models']],
+            fallback=[ModelChoice.parse(label) for label in route.get('fallback', [])]
+        )
+        for stage, route in config.items()
+    }
+
+
+def load_routes(overrides: Optional[str] = None) -> Dict[str, StageRoute]:
+    """Default routes with MODEL_ROUTES applied; a bad override is logged and ignored"""
+    overrides = overrides if overrides is not None else os.environ.get('MODEL_ROUTES', '')
+    if overrides:
+        try:
+            config = {stage: dict(route) for stage, route in DEFAULT_ROUTES.items()}
+            for stage, route in json.loads(overrides).items():
+                if stage not in config:
+                    raise ValueError(f"unknown stage {stage!r}")
+                config[stage].update(route)
+            routes = _build_routes(config)
+            if any(not route.models for route in routes.values()):
+                raise ValueError("every stage needs at least one model")
+            return routes
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Invalid MODEL_ROUTES, using defaults: {str(e)}")
+    return _build_routes(DEFAULT_ROUTES)
+
+
+def estimate_cost(label: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(label, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def message_tokens(message) -> int:
+    tokens = estimate_tokens(getattr(message, 'text', '') or '')
+    return tokens + IMAGE_TOKEN_ESTIMATE * len(getattr(message, 'file_contents', None) or [])
+
+
+class ModelRouter:
+    def __init__(self, routes: Optional[Dict[str, StageRoute]] = None, llm=llm_gateway):
+        self.routes = routes or load_routes()
+        self.llm = llm
+        self.stats: Dict[Tuple[str, str], ModelStats] = {}
+
+    def primary(self, stage: str) -> ModelChoice:
+        return self.routes[stage].models[0]
+
+    def _stats(self, stage: str, label: str) -> ModelStats:
+        return self.stats.setdefault((stage, label), ModelStats())
+
+    def record_confidence(self, stage: str, model: ModelChoice, confidence: float):
+        stats = self._stats(stage, model.label)
+        stats.confidence_sum += confidence
+        stats.confidence_count += 1
+
+    async def call(
+        self,
+        stage: str,
+        message,
+        system_message: str,
+        session_prefix: str,
+        user_id: Optional[str] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        accept: Optional[Callable[[str], bool]] = None,
+        timeout: Optional[float] = None
+    ) -> RoutedReply:
+        """
+        Send one message for a stage. Tries the stage's models in order: moves on
+        when accept(text) is False (escalation) or the call fails; fallback models
+        are only used after errors. Each attempt is a fresh session, and all of
+        them share one deadline of timeout seconds.
+        """
+        deadline = time.monotonic() + (timeout or LLM_CALL_TIMEOUT_SECONDS)
+        route = self.routes[stage]
+        candidates = [(model, True) for model in route.models] + [(model, False) for model in route.fallback]
+        attempts: List[Tuple[str, str]] = []
+        input_tokens = message_tokens(message)
+        last_error: Optional[Exception] = None
+        rejected: Optional[Tuple[str, ModelChoice]] = None
+
+        for index, (model, escalates) in enumerate(candidates):
+            if rejected is not None and not escalates:
+                # Out of stronger models: keep the answer we have rather than a fallback's
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if rejected is not None:
+                    break
+                raise LLMTimeoutError(f"{stage} ran out of time after {len(attempts)} attempts") from last_error
+            stats = self._stats(stage, model.label)
+            stats.calls += 1
+            session = self.llm.session(
+                session_prefix,
+                user_id=user_id,
+                provider=model.provider,
+                model=model.model,
+                system_message=system_message
+            )
+            started = time.perf_counter()
+            try:
+                text = await session.send(message, timeout=remaining, on_text=on_text)
+            except LLMUnavailableError:
+                # The breaker covers the whole gateway: other models would fail the same way
+                stats.errors += 1
+                raise
+            except Exception as e:
+                stats.errors += 1
+                attempts.append((model.label, 'error'))
+                last_error = e
+                logger.error(f"{stage} call to {model.label} failed: {str(e)}")
+                continue
+
+            output_tokens = estimate_tokens(text)
+            stats.latency_ms += int((time.perf_counter() - started) * 1000)
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost_usd += estimate_cost(model.label, input_tokens, output_tokens)
+
+            has_stronger = any(escalates for _, escalates in candidates[index + 1:])
+            if accept is not None and escalates and has_stronger and not accept(text):
+                stats.escalations += 1
+                attempts.append((model.label, 'escalated'))
+                rejected = (text, model)
+                logger.info(f"{stage}: escalating from {model.label}")
+                continue
+
+            attempts.append((model.label, 'ok'))
+            return RoutedReply(text, model, attempts)
+
+        if rejected is not None:
+            return RoutedReply(rejected[0], rejected[1], attempts)
+        raise last_error
+
+    def describe(self) -> dict:
+        """Routes and per-model metrics for the admin API"""
+        return {
+            "routes": {
+                stage: {
+                    "models": [model.label for model in route.models],
+                    "fallback": [model.label for model in route.fallback]
+                }
+                for stage, route in self.routes.items()
+            },
+            "stats": {
+                f"{stage}:{label}": stats.describe()
+                for (stage, label), stats in sorted(self.stats.items())
+            }
+        }
+
+
+model_router = ModelRouter()
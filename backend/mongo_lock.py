@@ -0,0 +1,90 @@
+"""
+Distributed locks / leases backed by MongoDB for BetrSlip
+- One document per lock in the `locks` collection, keyed by lock name
+- Every acquisition gets its own token: two tasks in the same worker are
+  two different holders, and only the token's holder can release or extend
+- Locks expire on their own so a crashed worker never holds one forever
+"""
+
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process in lock documents (for humans; ownership is the token)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lock(db, name: str, ttl: timedelta) -> Optional[str]:
+    """
+    Try to take the lock `name` for `ttl`.
+    Returns the holder's token, or None if the lock is held (by anyone, this worker included).
+    """
+    now = datetime.now(timezone.utc)
+    token = uuid.uuid4().hex
+    try:
+        await db.locks.update_one(
+            {"_id": name, "expires_at": {"$lte": now}},
+            {"$set": {
+                "token": token,
+                "worker": WORKER_ID,
+                "acquired_at": now,
+                "expires_at": now + ttl
+            }},
+            upsert=True
+        )
+        return token
+    except DuplicateKeyError:
+        # Someone else holds an unexpired lock, so the upsert collided on _id
+        return None
+    except Exception as e:
+        logger.error(f"Error acquiring lock {name}: {str(e)}")
+        return None
+
+
+async def extend_lock(db, name: str, token: str, ttl: timedelta) -> bool:
+    """Push the expiry of a held lock out to now + ttl; False if `token` no longer holds it"""
+    now = datetime.now(timezone.utc)
+    try:
+        result = await db.locks.update_one(
+            {"_id": name, "token": token, "expires_at": {"$gt": now}},
+            {"$set": {"expires_at": now + ttl}}
+        )
+        return result.matched_count == 1
+    except Exception as e:
+        logger.error(f"Error extending lock {name}: {str(e)}")
+        return False
+
+
+async def release_lock(db, name: str, token: str):
+    """Release the lock if `token` still holds it"""
+    try:
+        await db.locks.delete_one({"_id": name, "token": token})
+    except Exception as e:
+        logger.error(f"Error releasing lock {name}: {str(e)}")
+
+
+@asynccontextmanager
+async def mongo_lock(db, name: str, ttl: timedelta):
+    """
+    Context manager around acquire/release. Yields whether the lock was acquired;
+    callers skip their work when it yields False.
+    """
+    token = await acquire_lock(db, name, ttl)
+    try:
+        yield token is not None
+    finally:
+        if token is not None:
+            await release_lock(db, name, token)
+
+
+async def ensure_lock_indexes(db):
+    """Let MongoDB clean up expired locks on its own"""
+    await db.locks.create_index("expires_at", expireAfterSeconds=0)
@@ -0,0 +1,267 @@
+"""
+Odds and bet math for BetrSlip
+- Strict parsing of American odds (ValueError instead of silent defaults)
+- Scalar functions used by the analysis path
+- NumPy array variants of each function for batch conversion
+- Probabilities are percentages (0-100) throughout, matching the API
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Kelly stakes are capped for safety (fractional Kelly)
+KELLY_CAP = 25.0
+
+OddsValue = Union[str, int, float]
+
+
+# ===== PARSING =====
+
+def parse_american(value: OddsValue) -> float:
+    """
+    Parse American odds ("+150", "-110", "EVEN", 150) into a signed number.
+    Raises ValueError for anything that is not a valid American price.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid American odds: {value!r}")
+    if isinstance(value, (int, float)):
+        odds = float(value)
+    elif isinstance(value, str):
+        text = value.strip().upper().replace(' ', '')
+        if text in ('EVEN', 'EV', 'EVS'):
+            return 100.0
+        try:
+            odds = float(text)
+        except ValueError:
+            raise ValueError(f"Invalid American odds: {value!r}") from None
+    else:
+        raise ValueError(f"Invalid American odds: {value!r}")
+
+    if not np.isfinite(odds) or abs(odds) < 100:
+        raise ValueError(f"American odds must be <= -100 or >= +100: {value!r}")
+    return odds
+
+
+def parse_american_array(values: Iterable[OddsValue]) -> Tuple[np.ndarray, List[Tuple[int, str]]]:
+    """
+    Parse a batch of American prices.
+    Returns (signed odds with NaN for invalid entries, [(index, error message), ...]).
+    """
+    values = list(values)
+    try:
+        # Fast path: already numeric
+        odds = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        odds = None
+
+    if odds is not None and odds.ndim == 1:
+        invalid = ~np.isfinite(odds) | (np.abs(odds) < 100)
+        errors = [(int(i), f"American odds must be <= -100 or >= +100: {values[i]!r}") for i in np.flatnonzero(invalid)]
+        return np.where(invalid, np.nan, odds), errors
+
+    odds = np.full(len(values), np.nan)
+    errors = []
+    for i, value in enumerate(values):
+        try:
+            odds[i] = parse_american(value)
+        except ValueError as e:
+            errors.append((i, str(e)))
+    return odds, errors
+
+
+def parse_numeric_array(values: Iterable, low: float, high: float, label: str) -> Tuple[np.ndarray, List[Tuple[int, str]]]:
+    """Parse decimal odds or probabilities; entries outside (low, high) become NaN with an error"""
+    values = list(values)
+    parsed = np.full(len(values), np.nan)
+    errors = []
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+        except (TypeError, ValueError):
+            errors.append((i, f"Invalid {label}: {value!r}"))
+    invalid = ~np.isnan(parsed) & ~((parsed > low) & (parsed < high))
+    errors.extend((int(i), f"{label.capitalize()} out of range: {values[i]!r}") for i in np.flatnonzero(invalid))
+    parsed[invalid] = np.nan
+    errors.sort()
+    return parsed, errors
+
+
+# ===== SCALAR =====
+
+def american_to_decimal(american_odds: OddsValue) -> float:
+    """Convert American odds to decimal odds. Raises ValueError on bad input."""
+    odds = parse_american(american_odds)
+    return 1 + odds / 100 if odds > 0 else 1 + 100 / abs(odds)
+
+
+def decimal_to_american(decimal_odds: float) -> float:
+    """Convert decimal odds to (signed) American odds"""
+    if decimal_odds <= 1:
+        raise ValueError(f"Decimal odds must be greater than 1: {decimal_odds}")
+    if decimal_odds >= 2:
+        return (decimal_odds - 1) * 100
+    return -100 / (decimal_odds - 1)
+
+
+def decimal_to_implied_prob(decimal_odds: float) -> float:
+    """Convert decimal odds to implied probability"""
+    if decimal_odds <= 1:
+        raise ValueError(f"Decimal odds must be greater than 1: {decimal_odds}")
+    return (1 / decimal_odds) * 100
+
+
+def calculate_kelly_criterion(win_prob: float, decimal_odds: float) -> float:
+    """
+    Calculate Kelly Criterion percentage
+    Kelly % = (bp - q) / b
+    where b = decimal_odds - 1, p = win probability, q = 1 - p
+    """
+    if decimal_odds <= 1:
+        raise ValueError(f"Decimal odds must be greater than 1: {decimal_odds}")
+    b = decimal_odds - 1
+    p = win_prob / 100
+    q = 1 - p
+    kelly = (b * p - q) / b
+    # Cap at 25% max for safety (fractional Kelly)
+    return max(0, min(kelly * 100, KELLY_CAP))
+
+
+def calculate_expected_value(win_prob: float, decimal_odds: float, stake: float = 100) -> float:
+    """
+    Calculate Expected Value
+    EV = (win_prob * profit) - (loss_prob * stake)
+    """
+    p = win_prob / 100
+    profit = stake * (decimal_odds - 1)
+    ev = (p * profit) - ((1 - p) * stake)
+    return (ev / stake) * 100  # Return as percentage
+
+
+def probability_to_american_odds(prob: float) -> str:
+    """Convert probability to American odds format"""
+    if not 0 < prob < 100:
+        raise ValueError(f"Probability must be between 0 and 100 (exclusive): {prob}")
+    if prob >= 50:
+        odds = -(prob / (100 - prob)) * 100
+        return f"{int(odds)}"
+    else:
+        odds = ((100 - prob) / prob) * 100
+        return f"+{int(odds)}"
+
+
+def parlay_decimal(decimal_odds: Iterable[float]) -> float:
+    """Combined decimal price of a parlay"""
+    return float(np.prod(np.asarray(list(decimal_odds), dtype=float)))
+
+
+# ===== ARRAY VARIANTS =====
+# Invalid inputs come back as NaN rather than raising, so one bad price
+# doesn't sink a batch of thousands.
+
+def american_to_decimal_array(american) -> np.ndarray:
+    """Vectorized American -> decimal conversion (NaN stays NaN)"""
+    american = np.asarray(american, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(american > 0, 1 + american / 100, 1 + 100 / np.abs(american))
+
+
+def decimal_to_american_array(decimal_odds) -> np.ndarray:
+    decimal_odds = np.asarray(decimal_odds, dtype=float)
+    decimal_odds = np.where(decimal_odds > 1, decimal_odds, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(decimal_odds >= 2, (decimal_odds - 1) * 100, -100 / (decimal_odds - 1))
+
+
+def decimal_to_implied_prob_array(decimal_odds) -> np.ndarray:
+    decimal_odds = np.asarray(decimal_odds, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(decimal_odds > 1, 100 / decimal_odds, np.nan)
+
+
+def probability_to_decimal_array(prob) -> np.ndarray:
+    prob = np.asarray(prob, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((prob > 0) & (prob < 100), 100 / prob, np.nan)
+
+
+def probability_to_american_array(prob) -> np.ndarray:
+    """Signed American odds (not truncated to int like the scalar string version)"""
+    return decimal_to_american_array(probability_to_decimal_array(prob))
+
+
+def kelly_criterion_array(win_prob, decimal_odds, cap: float = KELLY_CAP) -> np.ndarray:
+    win_prob = np.asarray(win_prob, dtype=float)
+    decimal_odds = np.asarray(decimal_odds, dtype=float)
+    b = np.where(decimal_odds > 1, decimal_odds - 1, np.nan)
+    p = win_prob / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kelly = (b * p - (1 - p)) / b * 100
+    return np.clip(kelly, 0, cap)
+
+
+def expected_value_array(win_prob, decimal_odds) -> np.ndarray:
+    """EV as a percentage of stake"""
+    p = np.asarray(win_prob, dtype=float) / 100
+    decimal_odds = np.asarray(decimal_odds, dtype=float)
+    return (p * decimal_odds - 1) * 100
+
+
+def parlay_decimal_array(leg_decimal_odds, axis: int = -1) -> np.ndarray:
+    """Combined decimal price for many parlays at once (legs along `axis`, NaN legs ignored)"""
+    return np.nanprod(np.asarray(leg_decimal_odds, dtype=float), axis=axis)
+
+
+def to_json_list(values: np.ndarray, digits: int = 4) -> list:
+    """Rounded list with NaN turned into None (JSON has no NaN)"""
+    values = np.round(np.asarray(values, dtype=float), digits)
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+# ===== BATCH CONVERSION =====
+INPUT_FORMATS = ('american', 'decimal', 'probability')
+
+
+def convert_odds_batch(
+    values: List[OddsValue],
+    input_format: str = 'american',
+    win_probabilities: Optional[List[float]] = None
+) -> Dict:
+    """
+    Convert a batch of prices to every format at once.
+    With `win_probabilities` (one per price, 0-100) EV and Kelly are included too.
+    """
+    if input_format == 'american':
+        american, errors = parse_american_array(values)
+        decimal_odds = american_to_decimal_array(american)
+    elif input_format == 'decimal':
+        decimal_odds, errors = parse_numeric_array(values, 1, np.inf, 'decimal odds')
+    elif input_format == 'probability':
+        prob, errors = parse_numeric_array(values, 0, 100, 'probability')
+        decimal_odds = probability_to_decimal_array(prob)
+    else:
+        raise ValueError(f"Unknown input format: {input_format}. Use one of {', '.join(INPUT_FORMATS)}")
+
+    result = {
+        'count': len(decimal_odds),
+        'decimal': to_json_list(decimal_odds),
+        'american': to_json_list(decimal_to_american_array(decimal_odds), 0),
+        'implied_probability': to_json_list(decimal_to_implied_prob_array(decimal_odds), 2),
+        'errors': [{'index': i, 'error': message} for i, message in errors]
+    }
+
+    if win_probabilities is not None:
+        if len(win_probabilities) != len(decimal_odds):
+            raise ValueError("win_probabilities must have one entry per price")
+        win_prob = np.asarray(win_probabilities, dtype=float)
+        if not np.all((win_prob >= 0) & (win_prob <= 100)):
+            raise ValueError("win_probabilities must be between 0 and 100")
+        result['expected_value'] = to_json_list(expected_value_array(win_prob, decimal_odds), 2)
+        result['kelly_percentage'] = to_json_list(kelly_criterion_array(win_prob, decimal_odds), 2)
+
+    return result
@@ -0,0 +1,358 @@
+"""
+Exact parlay, teaser and round-robin pricing for BetrSlip
+- Works on vectors of leg win/push probabilities and decimal odds
+- Exact win / push / loss distributions by dynamic programming over legs
+  (polynomial generating functions, never enumerating combinations)
+- Optional same-game correlation: legs sharing a group are mixed with a
+  comonotone (move-together) component of weight `correlation`
+- Best k-subset of legs by EV or win probability
+- Probabilities are percentages (0-100) at the API boundary, like odds_math
+"""
+
+from dataclasses import dataclass
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from odds_math import american_to_decimal
+
+logger = logging.getLogger(__name__)
+
+# Outcome codes along the per-leg outcome axis
+LOSS, PUSH, WIN = 0, 1, 2
+
+# Standard 6-point football teaser payouts (American odds by number of legs)
+TEASER_PAYOUTS = {2: -120, 3: 160, 4: 260, 5: 400, 6: 600, 7: 900, 8: 1200}
+
+# Teasers reduced below this many winning legs by pushes are refunded
+TEASER_MIN_LEGS = 2
+
+# Correlated groups larger than this fall back to a greedy subset search
+MAX_GROUP_ENUMERATION = 10
+
+
+@dataclass
+class LegSet:
+    """Legs of a slip as parallel arrays (probabilities as fractions internally)"""
+    win_prob: np.ndarray
+    push_prob: np.ndarray
+    decimal_odds: np.ndarray
+    groups: List[np.ndarray]      # index arrays; correlated blocks and singletons
+    correlation: float = 0.0
+    descriptions: Optional[List[Optional[str]]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.win_prob)
+
+    @property
+    def loss_prob(self) -> np.ndarray:
+        return 1 - self.win_prob - self.push_prob
+
+    @classmethod
+    def from_arrays(
+        cls,
+        win_probabilities: Sequence[float],
+        decimal_odds: Sequence[float],
+        push_probabilities: Optional[Sequence[float]] = None,
+        groups: Optional[Sequence[Optional[str]]] = None,
+        correlation: float = 0.0,
+        descriptions: Optional[List[Optional[str]]] = None
+    ) -> 'LegSet':
+        """Build from percentages (0-100). Raises ValueError on inconsistent input."""
+        win = np.asarray(win_probabilities, dtype=float) / 100
+        odds = np.asarray(decimal_odds, dtype=float)
+        push = np.zeros_like(win) if push_probabilities is None else np.asarray(push_probabilities, dtype=float) / 100
+
+        if not (win.shape == odds.shape == push.shape) or win.ndim != 1:
+            raise ValueError("win_probabilities, decimal_odds and push_probabilities must have the same length")
+        if np.any(win < 0) or np.any(push < 0) or np.any(win + push > 1 + 1e-9):
+            raise ValueError("Leg probabilities must be between 0 and 100 and win + push <= 100")
+        if np.any(odds <= 1):
+            raise ValueError("Decimal odds must be greater than 1")
+        if not 0 <= correlation <= 1:
+            raise ValueError("correlation must be between 0 and 1")
+
+        blocks: Dict[str, List[int]] = {}
+        singletons = []
+        for i in range(len(win)):
+            group = groups[i] if groups is not None and i < len(groups) else None
+            if group is None or correlation == 0:
+                singletons.append(np.array([i]))
+            else:
+                blocks.setdefault(group, []).append(i)
+        grouped = [np.array(idx) for idx in blocks.values() if len(idx) > 1]
+        singletons.extend(np.array(idx) for idx in blocks.values() if len(idx) == 1)
+
+        return cls(
+            win_prob=win,
+            push_prob=push,
+            decimal_odds=odds,
+            groups=grouped + singletons,
+            correlation=correlation,
+            descriptions=descriptions
+        )
+
+    @classmethod
+    def from_bets(cls, individual_bets: List[dict], **kwargs) -> 'LegSet':
+        """
+        From analysis `individual_bets` (individual_probability, American odds).
+        Legs with unreadable odds get NaN odds, which only matters for EV results.
+        """
+        win, odds = [], []
+        for bet in individual_bets:
+            probability = bet.get('individual_probability')
+            win.append(50.0 if probability is None else float(probability))
+            try:
+                odds.append(american_to_decimal(bet.get('odds')))
+            except ValueError:
+                odds.append(np.nan)
+        return cls.from_arrays(win, odds, descriptions=[bet.get('description') for bet in individual_bets], **kwargs)
+
+
+# ===== GENERATING-FUNCTION DP =====
+
+def _comonotone_scenarios(win: np.ndarray, push: np.ndarray):
+    """
+    Joint outcomes when legs share one uniform draw U: leg i wins if U < win_i,
+    pushes if U < win_i + push_i. Returns (probabilities (S,), outcomes (S, k)).
+    """
+    cuts = np.unique(np.clip(np.concatenate([[0.0, 1.0], win, win + push]), 0, 1))
+    lo, hi = cuts[:-1], cuts[1:]
+    keep = hi > lo
+    lo, hi = lo[keep], hi[keep]
+    u = ((lo + hi) / 2)[:, None]
+    outcomes = np.where(u < win, WIN, np.where(u < win + push, PUSH, LOSS))
+    return hi - lo, outcomes
+
+
+def _expected_product(legs: LegSet, leg_polys: np.ndarray, degree: int, members: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    E[prod_i P_i(outcome_i)] for per-leg polynomials P_i, truncated to `degree`.
+    leg_polys has shape (n, 3, degree + 1): coefficients for loss, push and win.
+    Blocks are independent of each other, so the DP multiplies one block at a time.
+    """
+    outcome_probs = np.stack([legs.loss_prob, legs.push_prob, legs.win_prob], axis=1)   # (n, 3)
+    expected_leg = np.einsum('no,nod->nd', outcome_probs, leg_polys)                  # (n, D)
+    member_set = None if members is None else set(int(i) for i in members)
+
+    result = np.zeros(degree + 1)
+    result[0] = 1.0
+    for block in legs.groups:
+        if member_set is not None:
+            block = np.array([i for i in block if int(i) in member_set], dtype=int)
+            if len(block) == 0:
+                continue
+        independent = _poly_product(expected_leg[block], degree)
+        if len(block) > 1 and legs.correlation > 0:
+            probs, outcomes = _comonotone_scenarios(legs.win_prob[block], legs.push_prob[block])
+            comonotone = np.zeros(degree + 1)
+            for prob, scenario in zip(probs, outcomes):
+                comonotone += prob * _poly_product(leg_polys[block, scenario], degree)
+            block_poly = (1 - legs.correlation) * independent + legs.correlation * comonotone
+        else:
+            block_poly = independent
+        result = np.convolve(result, block_poly)[:degree + 1]
+    return result
+
+
+def _poly_product(polys: np.ndarray, degree: int) -> np.ndarray:
+    result = np.zeros(degree + 1)
+    result[0] = 1.0
+    for poly in polys:
+        result = np.convolve(result, poly)[:degree + 1]
+    return result
+
+
+def _constant_polys(legs: LegSet, loss: float, push: float, win) -> np.ndarray:
+    """Degree-0 polynomials: one value per outcome (win may be an array)"""
+    polys = np.zeros((legs.size, 3, 1))
+    polys[:, LOSS, 0] = loss
+    polys[:, PUSH, 0] = push
+    polys[:, WIN, 0] = win
+    return polys
+
+
+def _pct(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value) * 100, digits)
+
+
+# ===== PARLAYS =====
+
+def parlay_distribution(legs: LegSet, members: Optional[np.ndarray] = None) -> Dict:
+    """
+    Exact outcome distribution of a single parlay (pushed legs drop out, all pushes refund).
+    `members` restricts the parlay to a subset of leg indices.
+    """
+    no_loss = _expected_product(legs, _constant_polys(legs, 0, 1, 1), 0, members)[0]
+    all_push = _expected_product(legs, _constant_polys(legs, 0, 1, 0), 0, members)[0]
+    expected_return = _expected_product(legs, _constant_polys(legs, 0, 1, legs.decimal_odds), 0, members)[0]
+    idx = np.arange(legs.size) if members is None else np.asarray(members)
+    decimal_odds = float(np.prod(legs.decimal_odds[idx]))
+
+    return {
+        'legs': int(len(idx)),
+        'win_probability': _pct(no_loss - all_push),
+        'push_probability': _pct(all_push),
+        'loss_probability': _pct(1 - no_loss),
+        'decimal_odds': None if np.isnan(decimal_odds) else round(decimal_odds, 3),
+        'expected_value': _pct(expected_return - 1),
+        'independent_win_probability': _pct(float(np.prod(legs.win_prob[idx])))
+    }
+
+
+def teaser_distribution(legs: LegSet, payouts: Optional[Dict[int, float]] = None) -> Dict:
+    """
+    Exact teaser distribution. Leg probabilities must already reflect the teased lines.
+    Pushes reduce the teaser to the remaining legs; fewer than TEASER_MIN_LEGS winners refunds.
+    `payouts` maps number of legs to American odds.
+    """
+    payouts = payouts or TEASER_PAYOUTS
+    n = legs.size
+    polys = np.zeros((n, 3, n + 1))
+    polys[:, PUSH, 0] = 1
+    polys[:, WIN, 1] = 1
+    wins = _expected_product(legs, polys, n)            # P(no loss and exactly j wins)
+
+    payout = np.ones(n + 1)
+    for j in range(TEASER_MIN_LEGS, n + 1):
+        if j not in payouts:
+            raise ValueError(f"No teaser payout configured for {j} legs")
+        payout[j] = american_to_decimal(payouts[j])
+
+    win_prob = wins[TEASER_MIN_LEGS:].sum()
+    push_prob = wins[:TEASER_MIN_LEGS].sum()
+    return {
+        'legs': n,
+        'win_probability': _pct(win_prob),
+        'push_probability': _pct(push_prob),
+        'loss_probability': _pct(1 - wins.sum()),
+        'decimal_odds': round(float(payout[n]), 3),
+        'expected_value': _pct(float(wins @ payout) - 1),
+        'winning_legs_distribution': {j: _pct(p, 3) for j, p in enumerate(wins) if p > 0}
+    }
+
+
+def round_robin_distribution(legs: LegSet, sizes: Sequence[int]) -> Dict:
+    """
+    Round robin of every k-leg parlay for each k in `sizes`, one unit per parlay.
+    Expected return is the k-th elementary symmetric polynomial of the legs'
+    random payouts, read off one generating function for all sizes at once.
+    """
+    n = legs.size
+    sizes = sorted(set(int(k) for k in sizes))
+    if not sizes or sizes[0] < 1 or sizes[-1] > n:
+        raise ValueError(f"Round robin sizes must be between 1 and {n}")
+
+    # (1 + t * payout_i): coefficient of t^k is the total return of all k-parlays
+    polys = np.zeros((n, 3, n + 1))
+    polys[:, :, 0] = 1
+    polys[:, PUSH, 1] = 1
+    polys[:, WIN, 1] = legs.decimal_odds
+    total_return = _expected_product(legs, polys, n)
+
+    # z^(number of legs that did not lose)
+    polys = np.zeros((n, 3, n + 1))
+    polys[:, LOSS, 0] = 1
+    polys[:, PUSH, 1] = 1
+    polys[:, WIN, 1] = 1
+    surviving = _expected_product(legs, polys, n)
+
+    results = []
+    for k in sizes:
+        parlays = comb(n, k)
+        expected_return = total_return[k] / parlays
+        results.append({
+            'size': k,
+            'parlays': parlays,
+            'stake_units': parlays,
+            'expected_return_units': round(float(total_return[k]), 4),
+            'expected_value': _pct(expected_return - 1),
+            'any_parlay_survives_probability': _pct(surviving[k:].sum()),
+            # Number of k-parlays with no losing leg, given s surviving legs: C(s, k)
+            'surviving_parlays_distribution': {
+                comb(s, k): _pct(surviving[s], 3)
+                for s in range(k, n + 1) if surviving[s] > 0
+            }
+        })
+
+    return {
+        'legs': n,
+        'surviving_legs_distribution': {s: _pct(p, 3) for s, p in enumerate(surviving) if p > 0},
+        'sizes': results
+    }
+
+
+# ===== BEST SUBSET =====
+
+def _leg_values(legs: LegSet, objective: str) -> np.ndarray:
+    if objective == 'ev':
+        return legs.decimal_odds
+    if objective == 'probability':
+        return np.ones(legs.size)
+    raise ValueError(f"Unknown objective: {objective}")
+
+
+def best_subset(legs: LegSet, k: int, objective: str = 'ev') -> Dict:
+    """
+    The k legs whose parlay has the highest EV (or win probability).
+    Independent legs: top-k by expected payout. Correlated groups: exact DP over
+    groups, enumerating subsets inside each (small) group.
+    """
+    if not 1 <= k <= legs.size:
+        raise ValueError(f"k must be between 1 and {legs.size}")
+    win_value = _leg_values(legs, objective)
+    polys = _constant_polys(legs, 0, 1 if objective == 'ev' else 0, win_value)
+    expected = legs.push_prob * polys[:, PUSH, 0] + legs.win_prob * win_value
+
+    if all(len(block) == 1 for block in legs.groups) or legs.correlation == 0:
+        values = np.nan_to_num(expected, nan=-np.inf)
+        chosen = np.sort(np.argpartition(-values, k - 1)[:k])
+    else:
+        chosen = _best_subset_grouped(legs, polys, expected, k)
+
+    result = parlay_distribution(legs, chosen)
+    result.update({
+        'objective': objective,
+        'indices': [int(i) for i in chosen],
+        'descriptions': [legs.descriptions[i] for i in chosen] if legs.descriptions else None
+    })
+    return result
+
+
+def _best_subset_grouped(legs: LegSet, polys: np.ndarray, expected: np.ndarray, k: int) -> np.ndarray:
+    """Knapsack-style DP over independent groups, maximizing the log of the expected product"""
+    # dp[c] = (log value, chosen indices) using exactly c legs so far
+    dp = {0: (0.0, [])}
+    for block in legs.groups:
+        options = {0: (0.0, [])}
+        if len(block) <= MAX_GROUP_ENUMERATION:
+            for c in range(1, min(k, len(block)) + 1):
+                for subset in combinations(block, c):
+                    value = _expected_product(legs, polys, 0, np.array(subset))[0]
+                    log_value = np.log(value) if value > 0 else -np.inf
+                    if c not in options or log_value > options[c][0]:
+                        options[c] = (log_value, list(subset))
+        else:
+            # Large group: greedily take its legs in order of expected payout
+            order = block[np.argsort(-np.nan_to_num(expected[block], nan=-np.inf))]
+            for c in range(1, min(k, len(block)) + 1):
+                subset = order[:c]
+                value = _expected_product(legs, polys, 0, subset)[0]
+                options[c] = (np.log(value) if value > 0 else -np.inf, list(subset))
+
+        merged = {}
+        for count, (log_value, chosen) in dp.items():
+            for c, (option_log, option_chosen) in options.items():
+                total = count + c
+                if total > k:
+                    continue
+                candidate = log_value + option_log
+                if total not in merged or candidate > merged[total][0]:
+                    merged[total] = (candidate, chosen + option_chosen)
+        dp = merged
+
+    return np.sort(np.array(dp[k][1], dtype=int))
@@ -0,0 +1,328 @@
+"""
+Vectorized no-vig pricing engine over all bookmakers
+- Turns an Odds API payload into NumPy arrays shaped (game x book x market x outcome)
+- Implied probabilities, vig removal (multiplicative or Shin) and consensus fair odds
+- Best available price and the book offering it, for every game in one pass
+- Spreads/totals priced at the line most books quote
+"""
+
+import warnings
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from odds_math import american_to_decimal_array
+
+logger = logging.getLogger(__name__)
+
+MARKETS = ('h2h', 'spreads', 'totals')
+MARKET_INDEX = {market: m for m, market in enumerate(MARKETS)}
+
+# Two-way markets only: home/away for h2h and spreads, over/under for totals
+OUTCOMES = 2
+TOTALS_OUTCOMES = ('Over', 'Under')
+
+# Minimum number of books quoting a market for its consensus to be trusted
+MIN_BOOKS = 2
+
+
+@dataclass
+class MarketTensor:
+    """Prices for a slate of games. Missing quotes are NaN."""
+    games: List[Dict]
+    book_keys: List[str]
+    book_titles: List[str]
+    decimal_odds: np.ndarray   # (G, B, M, O)
+    points: np.ndarray         # (G, B, M, O) spread/total line, NaN for h2h
+
+
+@dataclass
+class MarketPricing:
+    """Consensus pricing per game, market and outcome"""
+    tensor: MarketTensor
+    fair_prob: np.ndarray      # (G, M, O) consensus no-vig probability
+    fair_decimal: np.ndarray   # (G, M, O)
+    line: np.ndarray           # (G, M, O) consensus line the probabilities refer to
+    best_price: np.ndarray     # (G, M, O) best decimal price at the consensus line
+    best_book: np.ndarray      # (G, M, O) index into tensor.book_titles
+    book_count: np.ndarray     # (G, M) books quoting both sides at the consensus line
+    dispersion: np.ndarray     # (G, M) std of the first outcome's no-vig probability across books
+    avg_vig: np.ndarray        # (G, M) mean overround - 1
+
+
+def _outcome_slot(market_key: str, outcome_name: str, home: str, away: str) -> Optional[int]:
+    if market_key == 'totals':
+        return TOTALS_OUTCOMES.index(outcome_name) if outcome_name in TOTALS_OUTCOMES else None
+    if outcome_name == home:
+        return 0
+    if outcome_name == away:
+        return 1
+    return None
+
+
+def build_market_tensor(games: List[Dict]) -> MarketTensor:
+    """Flatten the nested Odds API payload (American prices) into dense arrays"""
+    book_index: Dict[str, int] = {}
+    book_titles: List[str] = []
+    for game in games:
+        for bookmaker in game.get('bookmakers', []):
+            key = bookmaker.get('key') or bookmaker.get('title')
+            if key and key not in book_index:
+                book_index[key] = len(book_index)
+                book_titles.append(bookmaker.get('title', key))
+
+    shape = (len(games), max(len(book_index), 1), len(MARKETS), OUTCOMES)
+    american = np.full(shape, np.nan)
+    points = np.full(shape, np.nan)
+
+    for g, game in enumerate(games):
+        home = game.get('home_team')
+        away = game.get('away_team')
+        for bookmaker in game.get('bookmakers', []):
+            b = book_index.get(bookmaker.get('key') or bookmaker.get('title'))
+            if b is None:
+                continue
+            for market in bookmaker.get('markets', []):
+                m = MARKET_INDEX.get(market.get('key'))
+                if m is None:
+                    continue
+                for outcome in market.get('outcomes', []):
+                    o = _outcome_slot(market['key'], outcome.get('name'), home, away)
+                    price = outcome.get('price')
+                    if o is None or price is None:
+                        continue
+                    american[g, b, m, o] = price
+                    if outcome.get('point') is not None:
+                        points[g, b, m, o] = outcome['point']
+
+    return MarketTensor(
+        games=games,
+        book_keys=list(book_index.keys()),
+        book_titles=book_titles,
+        decimal_odds=american_to_decimal_array(american),
+        points=points
+    )
+
+
+def implied_probabilities(decimal_odds: np.ndarray) -> np.ndarray:
+    """Raw implied probabilities (still containing the bookmaker margin)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 / decimal_odds
+
+
+def remove_vig(implied: np.ndarray, method: str = 'multiplicative') -> np.ndarray:
+    """
+    Remove the bookmaker margin along the last axis (outcomes).
+    - multiplicative: scale each side by the overround
+    - shin: Shin's insider-trading model, which shades favourites less than longshots
+    """
+    if method == 'multiplicative':
+        with np.errstate(invalid='ignore'):
+            return implied / implied.sum(axis=-1, keepdims=True)
+    if method == 'shin':
+        return _shin(implied)
+    raise ValueError(f"Unknown vig removal method: {method}")
+
+
+def _shin(implied: np.ndarray, iterations: int = 60) -> np.ndarray:
+    """Solve Shin's z for every market at once by bisection on sum(p) = 1"""
+    booksum = implied.sum(axis=-1, keepdims=True)
+
+    def shin_probs(z):
+        with np.errstate(invalid='ignore'):
+            return (np.sqrt(z ** 2 + 4 * (1 - z) * implied ** 2 / booksum) - z) / (2 * (1 - z))
+
+    low = np.zeros_like(booksum)
+    high = np.full_like(booksum, 0.5)
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        total = shin_probs(mid).sum(axis=-1, keepdims=True)
+        # sum(p) decreases in z: too high a total means z must grow
+        too_high = total > 1
+        low = np.where(too_high, mid, low)
+        high = np.where(too_high, high, mid)
+    return shin_probs((low + high) / 2)
+
+
+def modal_line(points: np.ndarray, axis: int) -> np.ndarray:
+    """
+    The line most books quote along `axis` (NaN where nobody quotes). Ties go to
+    the tied line nearest the median, so the result is always a quoted line -
+    a median over an even number of books can land between two (-3.25).
+    """
+    p = np.moveaxis(points, axis, -1)                                          # (..., B)
+    quoted = ~np.isnan(p)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        median = np.nanmedian(p, axis=-1, keepdims=True)
+        counts = np.isclose(p[..., :, None], p[..., None, :]).sum(axis=-1)   # books per line
+        distance = np.abs(p - median)
+        # Distance only breaks ties: scaled to [0, 1) it never outweighs one more book
+        tiebreak = distance / (np.nanmax(np.where(quoted, distance, np.nan), axis=-1, keepdims=True) + 1)
+    score = np.where(quoted, counts - np.nan_to_num(tiebreak), -np.inf)
+    best = np.argmax(score, axis=-1)[..., None]
+    return np.take_along_axis(p, best, axis=-1)[..., 0]
+
+
+def price_markets(tensor: MarketTensor, method: str = 'multiplicative') -> MarketPricing:
+    """Consensus fair probabilities and best prices for every game/market/outcome"""
+    decimal_odds = tensor.decimal_odds
+    points = tensor.points
+
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # All-NaN slices (markets nobody quotes) are expected and masked by book_count
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+
+        # Spreads/totals are only comparable at the same line: keep books at the modal line
+        line = np.expand_dims(modal_line(points, axis=1), 1)                  # (G, 1, M, O)
+        same_line = np.isnan(line) | np.isclose(points, line)
+        odds = np.where(same_line, decimal_odds, np.nan)
+
+        implied = implied_probabilities(odds)
+        no_vig = remove_vig(implied, method)                                  # (G, B, M, O)
+        two_sided = ~np.isnan(no_vig).any(axis=-1)                            # (G, B, M)
+        no_vig = np.where(two_sided[..., None], no_vig, np.nan)
+
+        book_count = two_sided.sum(axis=1)                                    # (G, M)
+        fair_prob = np.nanmean(no_vig, axis=1)                                # (G, M, O)
+        fair_prob = fair_prob / np.nansum(fair_prob, axis=-1, keepdims=True)
+        dispersion = np.nanstd(no_vig[..., 0], axis=1)                        # (G, M)
+        avg_vig = np.nanmean(np.where(two_sided, implied.sum(axis=-1), np.nan), axis=1) - 1
+
+        masked_odds = np.where(np.isnan(odds), -np.inf, odds)
+        best_price = masked_odds.max(axis=1)                                  # (G, M, O)
+        best_book = masked_odds.argmax(axis=1)
+
+    insufficient = book_count < MIN_BOOKS
+    fair_prob = np.where(insufficient[..., None], np.nan, fair_prob)
+    best_price = np.where(np.isinf(best_price), np.nan, best_price)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fair_decimal = 1 / fair_prob
+
+    return MarketPricing(
+        tensor=tensor,
+        fair_prob=fair_prob,
+        fair_decimal=fair_decimal,
+        line=line[:, 0],
+        best_price=best_price,
+        best_book=best_book,
+        book_count=book_count,
+        dispersion=np.where(insufficient, np.nan, dispersion),
+        avg_vig=np.where(insufficient, np.nan, avg_vig)
+    )
+
+
+def price_outcome(
+    tensor: MarketTensor,
+    g: int,
+    market: str,
+    outcome: int,
+    line: Optional[float] = None,
+    method: str = 'multiplicative'
+) -> Optional[Dict]:
+    """
+    Consensus pricing for a single outcome at a specific line (e.g. a bet slip leg).
+    Only books quoting both sides at that line count. Returns None without a consensus.
+    """
+    m = MARKET_INDEX[market]
+    odds = tensor.decimal_odds[g, :, m, :]                                    # (B, O)
+    points = tensor.points[g, :, m, :]
+
+    if line is not None and market != 'h2h':
+        # Spreads mirror the line on the other side, totals share it
+        other_line = -line if market == 'spreads' else line
+        target = np.array([line, other_line]) if outcome == 0 else np.array([other_line, line])
+        odds = np.where(np.isclose(points, target), odds, np.nan)
+    elif market != 'h2h':
+        consensus = modal_line(points, axis=0)                                 # (O,)
+        odds = np.where(np.isnan(consensus) | np.isclose(points, consensus), odds, np.nan)
+        line = None if np.isnan(consensus[outcome]) else float(consensus[outcome])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        no_vig = remove_vig(implied_probabilities(odds), method)
+    two_sided = ~np.isnan(no_vig).any(axis=-1)
+    books = int(two_sided.sum())
+    if books < MIN_BOOKS:
+        return None
+
+    fair_prob = float(no_vig[two_sided, outcome].mean())
+    side_odds = np.where(two_sided, odds[:, outcome], -np.inf)
+    best = int(side_odds.argmax())
+    return {
+        'line': line,
+        'books': books,
+        'fair_prob': fair_prob,
+        'fair_decimal': 1 / fair_prob,
+        'best_price': float(side_odds[best]),
+        'best_book': tensor.book_titles[best]
+    }
+
+
+def _round(value, digits: int):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def outcome_label(game: Dict, market: str, outcome: int) -> str:
+    if market == 'totals':
+        return TOTALS_OUTCOMES[outcome]
+    return game.get('home_team') if outcome == 0 else game.get('away_team')
+
+
+def summarize_game(pricing: MarketPricing, g: int) -> Dict:
+    """Plain-dict pricing summary for one game (LLM context / API responses)"""
+    game = pricing.tensor.games[g]
+    markets = {}
+    for market, m in MARKET_INDEX.items():
+        if pricing.book_count[g, m] < MIN_BOOKS:
+            continue
+        outcomes = []
+        for o in range(OUTCOMES):
+            best_book = pricing.tensor.book_titles[int(pricing.best_book[g, m, o])] if pricing.tensor.book_titles else None
+            outcomes.append({
+                'name': outcome_label(game, market, o),
+                'line': _round(pricing.line[g, m, o], 1),
+                'fair_prob': _round(pricing.fair_prob[g, m, o] * 100, 1),
+                'fair_decimal': _round(pricing.fair_decimal[g, m, o], 3),
+                'best_price': _round(pricing.best_price[g, m, o], 3),
+                'best_book': best_book
+            })
+        markets[market] = {
+            'books': int(pricing.book_count[g, m]),
+            'avg_vig': _round(pricing.avg_vig[g, m] * 100, 2),
+            'dispersion': _round(pricing.dispersion[g, m] * 100, 2),
+            'outcomes': outcomes
+        }
+    return {
+        'home_team': game.get('home_team'),
+        'away_team': game.get('away_team'),
+        'commence_time': game.get('commence_time'),
+        'markets': markets
+    }
+
+
+def price_games(games: List[Dict], method: str = 'multiplicative') -> List[Dict]:
+    """Convenience wrapper: full payload in, one pricing summary per game out"""
+    if not games:
+        return []
+    pricing = price_markets(build_market_tensor(games), method)
+    return [summarize_game(pricing, g) for g in range(len(games))]
+
+
+def format_pricing_context(summary: Dict) -> List[str]:
+    """Prompt lines describing one game's consensus pricing"""
+    lines = []
+    for market, data in summary['markets'].items():
+        sides = []
+        for outcome in data['outcomes']:
+            line = f" {outcome['line']:+g}" if market == 'spreads' and outcome['line'] is not None else (
+                f" {outcome['line']:g}" if market == 'totals' and outcome['line'] is not None else "")
+            sides.append(
+                f"{outcome['name']}{line} fair {outcome['fair_prob']}% "
+                f"(best {outcome['best_price']} @ {outcome['best_book']})"
+            )
+        lines.append(f"  {market.upper()} [{data['books']} books, vig {data['avg_vig']}%]: " + " | ".join(sides))
+    return lines
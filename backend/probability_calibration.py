@@ -0,0 +1,217 @@
+"""
+Post-hoc calibration of LLM win probabilities for BetrSlip
+- Isotonic (PAV) or Platt maps fitted offline from marked outcomes
+- Persisted as a small JSON artifact: a lookup table on a 0.1% grid
+- O(1) table lookup at inference, per leg-count bucket when fitted
+- Hot reload when the artifact file changes, no restart needed
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from calibration import legs_bucket
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+CALIBRATION_MAP_PATH = Path(os.environ.get('CALIBRATION_MAP_PATH', ROOT_DIR / 'calibration_map.json'))
+
+# Lookup grid: index i is probability i / GRID_SIZE
+GRID_SIZE = 1000
+
+# Calibrated probabilities are kept away from 0/100 so EV and odds stay finite
+MIN_PROBABILITY = 0.01
+MAX_PROBABILITY = 0.99
+
+# How often (seconds) inference checks the artifact's mtime
+RELOAD_CHECK_INTERVAL = 30
+
+MIN_SAMPLES_DEFAULT = 200
+MIN_SAMPLES_PER_BUCKET = 100
+
+
+# ===== FITTING (offline) =====
+
+def fit_isotonic(p: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pool-adjacent-violators fit, returned as a monotone table on the grid"""
+    order = np.argsort(p)
+    p, y = p[order], y[order].astype(float)
+
+    # Blocks of (sum of outcomes, weight, mean predicted)
+    sums: List[float] = []
+    weights: List[float] = []
+    centers: List[float] = []
+    for pi, yi in zip(p, y):
+        sums.append(yi)
+        weights.append(1.0)
+        centers.append(pi)
+        while len(sums) > 1 and sums[-2] / weights[-2] > sums[-1] / weights[-1]:
+            s, w, c = sums.pop(), weights.pop(), centers.pop()
+            centers[-1] = (centers[-1] * weights[-1] + c * w) / (weights[-1] + w)
+            sums[-1] += s
+            weights[-1] += w
+
+    values = np.array(sums) / np.array(weights)
+    grid = np.arange(GRID_SIZE + 1) / GRID_SIZE
+    return np.interp(grid, np.array(centers), values)
+
+
+def fit_platt(p: np.ndarray, y: np.ndarray, iterations: int = 50, l2: float = 1e-3) -> np.ndarray:
+    """Logistic regression on logit(p) by Newton's method, as a grid table"""
+    p = np.clip(p, 1e-4, 1 - 1e-4)
+    x = np.log(p / (1 - p))
+    X = np.stack([x, np.ones_like(x)], axis=1)
+    w = np.array([1.0, 0.0])
+    for _ in range(iterations):
+        q = 1 / (1 + np.exp(-X @ w))
+        gradient = X.T @ (q - y) + l2 * w
+        hessian = (X * (q * (1 - q))[:, None]).T @ X + l2 * np.eye(2)
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.abs(step).max() < 1e-8:
+            break
+
+    grid = np.clip(np.arange(GRID_SIZE + 1) / GRID_SIZE, 1e-4, 1 - 1e-4)
+    return 1 / (1 + np.exp(-(w[0] * np.log(grid / (1 - grid)) + w[1])))
+
+
+FITTERS = {'isotonic': fit_isotonic, 'platt': fit_platt}
+
+
+def brier(p: np.ndarray, y: np.ndarray) -> float:
+    return float(np.mean((p - y) ** 2))
+
+
+def build_calibration_map(samples: List[dict], method: str = 'isotonic') -> Dict:
+    """
+    Fit maps from samples of {'probability': 0-100, 'won': bool, 'legs': int}.
+    Returns the JSON-ready artifact; raises ValueError with too little data.
+    """
+    if method not in FITTERS:
+        raise ValueError(f"Unknown calibration method: {method}")
+    if len(samples) < MIN_SAMPLES_DEFAULT:
+        raise ValueError(f"Need at least {MIN_SAMPLES_DEFAULT} graded analyses, have {len(samples)}")
+
+    p = np.array([s['probability'] for s in samples], dtype=float) / 100
+    y = np.array([1.0 if s['won'] else 0.0 for s in samples])
+    buckets = np.array([legs_bucket(s.get('legs') or 0) for s in samples])
+
+    def fit(mask):
+        table = np.clip(FITTERS[method](p[mask], y[mask]), MIN_PROBABILITY, MAX_PROBABILITY)
+        fitted = table[np.rint(p[mask] * GRID_SIZE).astype(int)]
+        return {
+            'samples': int(mask.sum()),
+            'brier_before': round(brier(p[mask], y[mask]), 4),
+            'brier_after': round(brier(fitted, y[mask]), 4),
+            'table': [round(float(v), 4) for v in table]
+        }
+
+    maps = {'default': fit(np.ones(len(p), dtype=bool))}
+    for bucket in sorted(set(buckets)):
+        mask = buckets == bucket
+        if mask.sum() >= MIN_SAMPLES_PER_BUCKET and bucket != 'unknown':
+            maps[f"legs:{bucket}"] = fit(mask)
+
+    return {
+        'version': datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S'),
+        'method': method,
+        'fitted_at': datetime.now(timezone.utc).isoformat(),
+        'grid_size': GRID_SIZE,
+        'maps': maps
+    }
+
+
+def save_calibration_map(artifact: Dict, path: Path = CALIBRATION_MAP_PATH):
+    """Write atomically so a running server never reads a half-written file"""
+    tmp_path = Path(f"{path}.tmp")
+    tmp_path.write_text(json.dumps(artifact))
+    os.replace(tmp_path, path)
+
+
+# ===== INFERENCE =====
+
+class ProbabilityCalibrator:
+    """Applies the current calibration artifact; identity when none is deployed"""
+
+    def __init__(self, path: Path = CALIBRATION_MAP_PATH):
+        self.path = Path(path)
+        self.version: Optional[str] = None
+        self.method: Optional[str] = None
+        self._tables: Dict[str, List[float]] = {}
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self.reload()
+
+    def reload(self) -> bool:
+        """(Re)load the artifact from disk. Returns True if a map is active."""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            if self._tables:
+                logger.info("Calibration map removed, using raw probabilities")
+            self._tables, self.version, self.method, self._mtime = {}, None, None, None
+            return False
+
+        try:
+            artifact = json.loads(self.path.read_text())
+            if artifact.get('grid_size') != GRID_SIZE:
+                raise ValueError(f"grid_size {artifact.get('grid_size')} != {GRID_SIZE}")
+            tables = {name: m['table'] for name, m in artifact['maps'].items()}
+            if any(len(table) != GRID_SIZE + 1 for table in tables.values()):
+                raise ValueError("calibration table has the wrong length")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep serving the previous map rather than falling over on a bad file
+            logger.error(f"Error loading calibration map {self.path}: {str(e)}")
+            self._mtime = mtime
+            return bool(self._tables)
+
+        self._tables = tables
+        self.version = artifact.get('version')
+        self.method = artifact.get('method')
+        self._mtime = mtime
+        logger.info(f"Loaded calibration map {self.version} ({self.method}, {len(tables)} tables)")
+        return True
+
+    def reload_if_changed(self):
+        """Cheap mtime check, at most every RELOAD_CHECK_INTERVAL seconds"""
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def calibrate(self, probability: float, legs: int = 0) -> float:
+        """Calibrated win probability (0-100) for a raw LLM probability (0-100)"""
+        self.reload_if_changed()
+        if not self._tables or probability is None or math.isnan(probability):
+            return probability
+        table = self._tables.get(f"legs:{legs_bucket(legs)}") or self._tables.get('default')
+        if table is None:
+            return probability
+        index = min(max(int(round(probability / 100 * GRID_SIZE)), 0), GRID_SIZE)
+        return round(table[index] * 100, 1)
+
+    def describe(self) -> dict:
+        return {
+            "active": bool(self._tables),
+            "version": self.version,
+            "method": self.method,
+            "path": str(self.path),
+            "tables": sorted(self._tables.keys())
+        }
+
+
+calibrator = ProbabilityCalibrator()
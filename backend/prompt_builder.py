@@ -0,0 +1,163 @@
+"""
+Token-budgeted prompt assembly for BetrSlip
+- Token estimates with tiktoken (the model's encoding), len/4 when unavailable;
+  the encoding is loaded once at startup from TIKTOKEN_CACHE_DIR, never on a request
+- A prompt is an ordered list of sections, each with a priority
+- Over budget: the least important sections are summarized, then cut by
+  whole lines, then dropped; priority 0 sections are never touched
+- Reports the final token count and what was trimmed, for per-request metrics
+"""
+
+import asyncio
+import math
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+ANALYSIS_PROMPT_TOKEN_BUDGET = int(os.environ.get('ANALYSIS_PROMPT_TOKEN_BUDGET', '6000'))
+TOKENIZER_MODEL = os.environ.get('PROMPT_TOKENIZER_MODEL', 'gpt-4o')
+# tiktoken reads its BPE files from here instead of downloading them (see tiktoken_cache/README.md)
+os.environ.setdefault('TIKTOKEN_CACHE_DIR', str(ROOT_DIR / 'tiktoken_cache'))
+TOKENIZER_LOAD_TIMEOUT_SECONDS = float(os.environ.get('TOKENIZER_LOAD_TIMEOUT_SECONDS', '10'))
+
+REQUIRED = 0
+SECTION_SEPARATOR = "\n"
+TRUNCATION_MARKER = "  [...trimmed]"
+
+
+# model -> tiktoken encoding, filled by load_tokenizer
+_encodings: Dict[str, object] = {}
+
+
+def _load_encoding(model: str):
+    """tiktoken encoding for a model, None if tiktoken or its data isn't available"""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {str(e)}")
+        return None
+
+
+async def load_tokenizer(model: str = TOKENIZER_MODEL) -> bool:
+    """
+    Load a model's encoding in a thread (it may have to be downloaded). On a
+    failure or timeout estimates stay at len/4 for the life of the process.
+    """
+    try:
+        encoding = await asyncio.wait_for(asyncio.to_thread(_load_encoding, model), TOKENIZER_LOAD_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"tiktoken encoding for {model} not loaded within {TOKENIZER_LOAD_TIMEOUT_SECONDS}s, estimating tokens from length")
+        return False
+    if encoding is None:
+        return False
+    _encodings[model] = encoding
+    return True
+
+
+def _encoding(model: str):
+    return _encodings.get(model)
+
+
+def estimate_tokens(text: str, model: str = TOKENIZER_MODEL) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def token_estimator(model: str = TOKENIZER_MODEL) -> str:
+    return 'tiktoken' if _encoding(model) is not None else 'chars/4'
+
+
+@dataclass(slots=True)
+class PromptSection:
+    name: str
+    text: str
+    priority: int = REQUIRED          # 0 = required, higher = dropped sooner
+    summary: Optional[str] = None     # shorter stand-in used before cutting
+    state: str = field(default='full', init=False)
+
+
+@dataclass(slots=True)
+class BuiltPrompt:
+    text: str
+    tokens: int
+    budget: int
+    estimator: str
+    sections: Dict[str, str]          # section name -> full / summarized / truncated / dropped
+
+    @property
+    def trimmed(self) -> List[str]:
+        return [name for name, state in self.sections.items() if state != 'full']
+
+
+def _truncate_lines(text: str, max_tokens: int, model: str) -> str:
+    """Longest prefix of whole lines (plus a marker) within max_tokens, '' if none fits"""
+    lines = text.split("\n")
+    kept: List[str] = []
+    used = estimate_tokens(TRUNCATION_MARKER, model)
+    for line in lines:
+        cost = estimate_tokens(line + "\n", model)
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not any(line.strip() for line in kept):
+        return ""
+    return "\n".join(kept + [TRUNCATION_MARKER])
+
+
+def build_prompt(sections: List[PromptSection], budget: int = ANALYSIS_PROMPT_TOKEN_BUDGET, model: str = TOKENIZER_MODEL) -> BuiltPrompt:
+    """Join sections in order, trimming optional ones until the estimate fits the budget"""
+    sections = [s for s in sections if s.text]
+    sizes = {id(s): estimate_tokens(s.text, model) for s in sections}
+    separator = estimate_tokens(SECTION_SEPARATOR, model)
+
+    def total() -> int:
+        present = [s for s in sections if s.text]
+        return sum(sizes[id(s)] for s in present) + separator * max(len(present) - 1, 0)
+
+    optional = sorted((s for s in sections if s.priority != REQUIRED), key=lambda s: -s.priority)
+
+    # 1. Summaries, least important first
+    for section in optional:
+        if total() <= budget:
+            break
+        if section.summary is not None:
+            summary_size = estimate_tokens(section.summary, model)
+            if summary_size < sizes[id(section)]:
+                section.text, section.state = section.summary, 'summarized'
+                sizes[id(section)] = summary_size
+
+    # 2. Cut by lines, then drop
+    for section in optional:
+        over = total() - budget
+        if over <= 0:
+            break
+        keep = sizes[id(section)] - over
+        section.text = _truncate_lines(section.text, keep, model) if keep > 0 else ""
+        section.state = 'truncated' if section.text else 'dropped'
+        sizes[id(section)] = estimate_tokens(section.text, model)
+
+    text = SECTION_SEPARATOR.join(s.text for s in sections if s.text)
+    built = BuiltPrompt(
+        text=text,
+        tokens=estimate_tokens(text, model),
+        budget=budget,
+        estimator=token_estimator(model),
+        sections={s.name: s.state for s in sections}
+    )
+    if built.tokens > budget:
+        logger.warning(f"Prompt is {built.tokens} tokens after trimming, over the {budget} budget (required sections)")
+    return built
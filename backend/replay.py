@@ -0,0 +1,295 @@
+"""
+Record / replay of upstream calls for offline runs of BetrSlip
+- HTTP: every aiohttp request (ESPN, The Odds API, WeatherAPI) is saved to, or
+  served from, a JSON fixture keyed by method, URL and params (API keys dropped)
+- LLM: gateway clients are wrapped; replies are saved to, or served from,
+  fixtures keyed by model, system message, prompt text and image hash
+- A request whose exact key was not recorded (a date in the params, a prompt
+  that changed) falls back to the latest recording for the same URL, or for
+  LLM calls the same session kind and slip image, and is counted as a loose hit;
+  the fallback never depends on how many calls came before
+- REPLAY_MODE=record|replay, fixtures under REPLAY_FIXTURES_DIR; replay never
+  touches the network - anything unrecorded raises ReplayMissError
+"""
+
+import base64
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+REPLAY_MODES = ('off', 'record', 'replay')
+REPLAY_MODE = os.environ.get('REPLAY_MODE', 'off')
+REPLAY_FIXTURES_DIR = Path(os.environ.get('REPLAY_FIXTURES_DIR', str(ROOT_DIR / 'fixtures' / 'replay')))
+
+# Query params never written to fixtures or used in keys
+SECRET_PARAMS = {'apikey', 'api_key', 'key', 'appid', 'token', 'access_token'}
+
+
+class ReplayMissError(Exception):
+    """Replay mode got a request that has no recording"""
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def _public_params(params) -> Dict[str, str]:
+    if not params:
+        return {}
+    items = params.items() if hasattr(params, 'items') else params
+    return {str(k): str(v) for k, v in items if str(k).lower() not in SECRET_PARAMS}
+
+
+def _base_url(url) -> str:
+    """URL without its query string (secrets can live there too)"""
+    return str(url).split('?', 1)[0]
+
+
+def http_key(method: str, url, params) -> Tuple[str, str]:
+    """(exact key, loose key) of an HTTP request"""
+    method, url = method.upper(), _base_url(url)
+    return _digest(method, url, _public_params(params)), _digest(method, url)
+
+
+def llm_key(prefix: str, provider: Optional[str], model: Optional[str], system_message: str, message) -> Tuple[str, str]:
+    """(exact key, loose key) of an LLM message; the loose key is the session kind plus image hash"""
+    images = [
+        hashlib.sha1((getattr(content, 'image_base64', '') or '').encode()).hexdigest()
+        for content in getattr(message, 'file_contents', None) or []
+    ]
+    text = getattr(message, 'text', str(message))
+    return _digest(provider, model, system_message, text, images), _digest(prefix, images)
+
+
+# ===== FIXTURE STORE =====
+
+class FixtureStore:
+    """One JSON file per recorded call under <root>/<kind>/<key>.json"""
+
+    def __init__(self, root: Path = REPLAY_FIXTURES_DIR):
+        self.root = Path(root)
+        self.stats = {"recorded": 0, "hits": 0, "loose_hits": 0, "misses": 0}
+        self.missed: List[str] = []
+        self._exact: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        self._loose: Dict[Tuple[str, str], dict] = {}
+        self._load()
+
+    def _load(self):
+        for path in sorted(self.root.glob('*/*.json')):
+            try:
+                fixture = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading replay fixture {path}: {str(e)}")
+                continue
+            kind = path.parent.name
+            self._exact[kind][fixture['key']] = fixture
+            # A loose key always resolves to its latest recording (ties by key), whatever the call order
+            loose = (kind, fixture['loose_key'])
+            current = self._loose.get(loose)
+            if current is None or (fixture.get('recorded_at', ''), fixture['key']) > (current.get('recorded_at', ''), current['key']):
+                self._loose[loose] = fixture
+
+    def save(self, kind: str, key: str, loose_key: str, fixture: dict):
+        fixture = {"key": key, "loose_key": loose_key, "recorded_at": datetime.now(timezone.utc).isoformat(), **fixture}
+        path = self.root / kind / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(fixture, indent=2, sort_keys=True))
+        self.stats["recorded"] += 1
+
+    def find(self, kind: str, key: str, loose_key: str, description: str) -> dict:
+        fixture = self._exact[kind].get(key)
+        if fixture is not None:
+            self.stats["hits"] += 1
+            return fixture
+        fixture = self._loose.get((kind, loose_key))
+        if fixture is not None:
+            self.stats["loose_hits"] += 1
+            logger.info(f"Replay: loose match for {description}")
+            return fixture
+        self.stats["misses"] += 1
+        self.missed.append(description)
+        raise ReplayMissError(f"No recording for {description}")
+
+
+# ===== HTTP =====
+
+class ReplayResponse:
+    """Just enough of aiohttp.ClientResponse for this app's callers"""
+
+    def __init__(self, fixture: dict):
+        self.status = fixture['status']
+        self.reason = fixture.get('reason', '')
+        self.url = fixture['url']
+        self.headers = {'Content-Type': fixture.get('content_type', 'application/json')}
+        if 'body_base64' in fixture:
+            self._body = base64.b64decode(fixture['body_base64'])
+        else:
+            self._body = fixture.get('body', '').encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_for_close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status, message=self.reason)
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self._body.decode(encoding)
+
+    async def json(self, *args, **kwargs):
+        return json.loads(self._body.decode('utf-8'))
+
+
+def _http_recorder(original, store: FixtureStore):
+    async def _request(session, method, str_or_url, **kwargs):
+        response = await original(session, method, str_or_url, **kwargs)
+        body = await response.read()   # cached on the response, callers can still read it
+        key, loose_key = http_key(method, str_or_url, kwargs.get('params'))
+        fixture = {
+            "method": method.upper(),
+            "url": _base_url(str_or_url),
+            "params": _public_params(kwargs.get('params')),
+            "status": response.status,
+            "reason": response.reason or '',
+            "content_type": response.headers.get('Content-Type', 'application/json')
+        }
+        try:
+            fixture["body"] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            fixture["body_base64"] = base64.b64encode(body).decode('ascii')
+        store.save('http', key, loose_key, fixture)
+        return response
+    return _request
+
+
+def _http_replayer(store: FixtureStore):
+    async def _request(session, method, str_or_url, **kwargs):
+        key, loose_key = http_key(method, str_or_url, kwargs.get('params'))
+        return ReplayResponse(store.find('http', key, loose_key, f"{method.upper()} {_base_url(str_or_url)}"))
+    return _request
+
+
+# ===== LLM =====
+
+class RecordingLLMClient:
+    """Wraps a real client and saves every reply (streaming is not passed through)"""
+
+    def __init__(self, client, store: FixtureStore, prefix: str, provider, model, system_message: str):
+        self.client = client
+        self.store = store
+        self.prefix = prefix
+        self.provider = provider
+        self.model = model
+        self.system_message = system_message
+
+    async def send_message(self, message) -> str:
+        reply = await self.client.send_message(message)
+        key, loose_key = llm_key(self.prefix, self.provider, self.model, self.system_message, message)
+        self.store.save('llm', key, loose_key, {
+            "prefix": self.prefix,
+            "model": f"{self.provider}/{self.model}",
+            "system_message": self.system_message,
+            "prompt": getattr(message, 'text', str(message)),
+            "reply": reply
+        })
+        return reply
+
+
+class ReplayLLMClient:
+    def __init__(self, store: FixtureStore, prefix: str, provider, model, system_message: str):
+        self.store = store
+        self.prefix = prefix
+        self.provider = provider
+        self.model = model
+        self.system_message = system_message
+
+    async def send_message(self, message) -> str:
+        key, loose_key = llm_key(self.prefix, self.provider, self.model, self.system_message, message)
+        fixture = self.store.find('llm', key, loose_key, f"{self.prefix} call to {self.provider}/{self.model}")
+        return fixture['reply']
+
+
+def _session_prefix(session_id: str) -> str:
+    # Gateway session ids are "<prefix>_<uuid4>"
+    return session_id.rsplit('_', 1)[0]
+
+
+def _llm_factory(original, store: FixtureStore, mode: str):
+    def factory(session_id: str, system_message: str, provider=None, model=None):
+        prefix = _session_prefix(session_id)
+        if mode == 'replay':
+            return ReplayLLMClient(store, prefix, provider, model, system_message)
+        return RecordingLLMClient(original(session_id, system_message, provider, model), store, prefix, provider, model, system_message)
+    factory.__name__ = f"{mode}:{getattr(original, '__name__', type(original).__name__)}"
+    return factory
+
+
+# ===== INSTALL =====
+
+_installed: Optional[dict] = None
+
+
+def install(mode: Optional[str] = None, root: Optional[Path] = None, gateway=None) -> Optional[FixtureStore]:
+    """
+    Patch aiohttp and the LLM gateway for record or replay; returns the store,
+    None when the mode is off. Idempotent: a second call returns the same store.
+    """
+    global _installed
+    mode = mode or REPLAY_MODE
+    if mode not in REPLAY_MODES:
+        logger.error(f"Unknown REPLAY_MODE {mode!r}, replay disabled")
+        return None
+    if mode == 'off':
+        return None
+    if _installed is not None:
+        return _installed['store']
+
+    if gateway is None:
+        from llm_gateway import gateway
+
+    store = FixtureStore(root or REPLAY_FIXTURES_DIR)
+    original_request = aiohttp.ClientSession._request
+    original_factory = gateway.client_factory
+    if mode == 'record':
+        aiohttp.ClientSession._request = _http_recorder(original_request, store)
+    else:
+        aiohttp.ClientSession._request = _http_replayer(store)
+    gateway.client_factory = _llm_factory(original_factory, store, mode)
+
+    _installed = {"store": store, "request": original_request, "gateway": gateway, "factory": original_factory, "mode": mode}
+    logger.warning(f"Replay {mode} installed, fixtures in {store.root}")
+    return store
+
+
+def uninstall():
+    global _installed
+    if _installed is None:
+        return
+    aiohttp.ClientSession._request = _installed['request']
+    _installed['gateway'].client_factory = _installed['factory']
+    _installed = None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Run the full /api/analyze pipeline offline against recorded upstream fixtures.
+
+The app is driven in-process (httpx ASGI transport, no server or startup jobs)
+with an in-memory Mongo (mongomock-motor) and replay.py patching aiohttp and
+the LLM gateway, so it needs no network and no database.
+
+  record:  python replay_harness.py --record slips/*.png
+           (live ESPN / Odds / WeatherAPI / LLM calls, saved under --fixtures)
+  replay:  python replay_harness.py slips/*.png --runs 5 --output run.jsonl
+  compare: python replay_harness.py slips/*.png --baseline run.jsonl
+
+Replay exits non-zero when a call has no recording or results drift from
+the baseline. Needs mongomock-motor, listed in requirements.txt.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import replay
+
+# Fields compared against a baseline; everything else (ids, timestamps, timings) varies run to run
+STABLE_FIELDS = [
+    'win_probability', 'raw_win_probability', 'confidence_score', 'recommendation',
+    'expected_value', 'kelly_percentage', 'true_odds', 'risk_level', 'legs'
+]
+
+
+async def setup_app():
+    """Import the app with its database swapped for an in-memory one and a signed-in user"""
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    server.db = AsyncMongoMockClient(tz_aware=True)['replay_harness']
+    user = server.User(email='replay-harness@example.com', password_hash='-')
+    await server.db.users.insert_one(user.model_dump())
+    # Subscribed, so repeated runs never hit the free-analysis limit
+    await server.db.subscriptions.insert_one({
+        "user_id": user.id,
+        "subscription_status": "active",
+        "created_at": datetime.now(timezone.utc)
+    })
+    return server.app, server.create_jwt_token(user.id, user.email)
+
+
+async def analyze(client, token: str, image: Path) -> dict:
+    started = time.perf_counter()
+    response = await client.post(
+        '/api/analyze',
+        files={'file': (image.name, image.read_bytes(), 'image/png')},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    body = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
+    body['legs'] = len(body.get('individual_bets') or [])
+    return {
+        "image": image.name,
+        "status": response.status_code,
+        "elapsed_ms": elapsed_ms,
+        **{name: body.get(name) for name in STABLE_FIELDS}
+    }
+
+
+def compare(results: list, baseline_path: Path) -> list:
+    baseline = {}
+    with open(baseline_path) as f:
+        for line in f:
+            row = json.loads(line)
+            baseline.setdefault(row['image'], row)
+    drift = []
+    for row in results:
+        expected = baseline.get(row['image'])
+        if expected is None:
+            drift.append(f"{row['image']}: not in baseline")
+            continue
+        for name in ['status'] + STABLE_FIELDS:
+            if row.get(name) != expected.get(name):
+                drift.append(f"{row['image']}: {name} {expected.get(name)!r} -> {row.get(name)!r}")
+    return drift
+
+
+async def main(args) -> int:
+    mode = 'record' if args.record else 'replay'
+    store = replay.install(mode, args.fixtures)
+    app, token = await setup_app()
+
+    import httpx
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://replay', timeout=None) as client:
+        for run in range(args.runs if mode == 'replay' else 1):
+            for image in args.images:
+                row = await analyze(client, token, image)
+                results.append(row)
+                print(f"  [{run + 1}] {image.name}: HTTP {row['status']} in {row['elapsed_ms']}ms, "
+                      f"win_probability={row['win_probability']} ({row['recommendation']})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for row in results:
+                f.write(json.dumps(row, default=str) + "\n")
+        print(f"Wrote results to {args.output}")
+
+    latencies = [row['elapsed_ms'] for row in results]
+    print(f"\n{mode}: {len(results)} analyses, median {statistics.median(latencies)}ms, max {max(latencies)}ms")
+    print(f"fixtures ({store.root}): {store.stats}")
+
+    failed = False
+    if store.missed:
+        failed = True
+        print("Unrecorded calls:")
+        for description in sorted(set(store.missed)):
+            print(f"  - {description}")
+    if args.baseline:
+        drift = compare(results, args.baseline)
+        if drift:
+            failed = True
+            print("Drift from baseline:")
+            for line in drift:
+                print(f"  - {line}")
+        else:
+            print(f"No drift from {args.baseline}")
+    return 1 if failed and mode == 'replay' else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', type=Path, nargs='+', help='bet slip screenshots')
+    parser.add_argument('--record', action='store_true', help='call the real upstreams and save fixtures')
+    parser.add_argument('--fixtures', type=Path, default=replay.REPLAY_FIXTURES_DIR)
+    parser.add_argument('--runs', type=int, default=1, help='replay each image this many times')
+    parser.add_argument('--output', type=Path, default=None)
+    parser.add_argument('--baseline', type=Path, default=None, help='results file of an earlier replay to compare with')
+    sys.exit(asyncio.run(main(parser.parse_args())))
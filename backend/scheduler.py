@@ -0,0 +1,250 @@
+"""
+In-process job scheduler for BetrSlip
+- Cron-style schedules ("minute hour day month weekday")
+- Random jitter so workers don't hit upstream APIs at the same instant
+- Leader election through a Mongo lease: only the leader runs shared jobs;
+  jobs that only touch process-local state (leader_only=False) run everywhere
+- Run history in the `scheduler_runs` collection
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+from mongo_lock import acquire_lock, extend_lock, release_lock, WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_NAME = "scheduler_leader"
+LEADER_LEASE_TTL = timedelta(seconds=60)
+RUN_HISTORY_TTL = timedelta(days=30)
+
+
+# ===== CRON PARSING =====
+
+def _parse_cron_field(spec: str, low: int, high: int) -> Set[int]:
+    """Parse one cron field: '*', '*/n', 'a', 'a-b', 'a-b/n' and comma lists"""
+    values = set()
+    for part in spec.split(','):
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = int(step_str)
+            if step <= 0:
+                raise ValueError(f"Invalid cron step: {spec}")
+
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range: {spec}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A standard 5-field cron expression, evaluated in UTC"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # Cron weekdays: 0 = Sunday (7 also accepted)
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        # Unrestricted when the field covers its whole range ('*', '*/1', '1-31', ...)
+        self._any_day = self.days == set(range(1, 32))
+        self._any_weekday = self.weekdays == set(range(7))
+
+    def _day_matches(self, dt: datetime) -> bool:
+        cron_weekday = (dt.weekday() + 1) % 7
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+        # Classic cron: when both are restricted, either may match
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`"""
+        dt = after.astimezone(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+# ===== SCHEDULER =====
+
+@dataclass
+class ScheduledJob:
+    name: str
+    schedule: CronSchedule
+    func: Callable[[], Awaitable[Optional[dict]]]
+    jitter_seconds: float = 30
+    timeout_seconds: float = 600
+    leader_only: bool = True
+    next_run: Optional[datetime] = field(default=None, repr=False)
+
+
+class Scheduler:
+    """Runs registered jobs on their cron schedule in the current event loop"""
+
+    def __init__(self, db):
+        self.db = db
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.is_leader = False
+        self._leader_token: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        cron: str,
+        func: Callable[[], Awaitable[Optional[dict]]],
+        jitter_seconds: float = 30,
+        timeout_seconds: float = 600,
+        leader_only: bool = True
+    ):
+        """
+        Register an async job. `cron` is a 5-field UTC cron expression.
+        leader_only=False runs the job on every worker, for jobs that only touch
+        the process's own caches.
+        """
+        self.jobs[name] = ScheduledJob(
+            name=name,
+            schedule=CronSchedule(cron),
+            func=func,
+            jitter_seconds=jitter_seconds,
+            timeout_seconds=timeout_seconds,
+            leader_only=leader_only
+        )
+
+    def start(self):
+        """Start the leader-election loop and one loop per job"""
+        self._tasks.append(asyncio.create_task(self._leader_loop()))
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job)))
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs on worker {WORKER_ID}")
+
+    async def stop(self):
+        """Cancel all loops and give up leadership"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._leader_token is not None:
+            await release_lock(self.db, LEADER_LOCK_NAME, self._leader_token)
+            self._leader_token = None
+            self.is_leader = False
+
+    async def _leader_loop(self):
+        """Acquire or renew the leader lease well before it expires"""
+        while True:
+            was_leader = self.is_leader
+            if self._leader_token is not None and not await extend_lock(self.db, LEADER_LOCK_NAME, self._leader_token, LEADER_LEASE_TTL):
+                self._leader_token = None
+            if self._leader_token is None:
+                self._leader_token = await acquire_lock(self.db, LEADER_LOCK_NAME, LEADER_LEASE_TTL)
+            self.is_leader = self._leader_token is not None
+            if self.is_leader != was_leader:
+                logger.info(f"Scheduler leadership {'acquired' if self.is_leader else 'lost'} by {WORKER_ID}")
+            await asyncio.sleep(LEADER_LEASE_TTL.total_seconds() / 3)
+
+    async def _job_loop(self, job: ScheduledJob):
+        while True:
+            now = datetime.now(timezone.utc)
+            job.next_run = job.schedule.next_after(now)
+            delay = (job.next_run - now).total_seconds() + random.uniform(0, job.jitter_seconds)
+            await asyncio.sleep(delay)
+
+            if self.is_leader or not job.leader_only:
+                await self.run_job(job.name)
+
+    async def run_job(self, name: str) -> dict:
+        """Run a job now and record the run. Also used for manual triggers."""
+        job = self.jobs[name]
+        started_at = datetime.now(timezone.utc)
+        run = {
+            "job": name,
+            "worker": WORKER_ID,
+            "scheduled_for": job.next_run,
+            "started_at": started_at,
+            "status": "running"
+        }
+        inserted = await self._record(run)
+
+        try:
+            result = await asyncio.wait_for(job.func(), timeout=job.timeout_seconds)
+            update = {"status": "success", "result": result}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {name} failed: {str(e)}")
+            update = {"status": "error", "error": str(e)}
+
+        finished_at = datetime.now(timezone.utc)
+        update.update({
+            "finished_at": finished_at,
+            "duration_ms": int((finished_at - started_at).total_seconds() * 1000)
+        })
+        if inserted is not None:
+            try:
+                await self.db.scheduler_runs.update_one({"_id": inserted}, {"$set": update})
+            except Exception as e:
+                logger.error(f"Error recording scheduler run for {name}: {str(e)}")
+        return {**run, **update}
+
+    async def _record(self, run: dict):
+        try:
+            result = await self.db.scheduler_runs.insert_one(dict(run))
+            return result.inserted_id
+        except Exception as e:
+            logger.error(f"Error recording scheduler run: {str(e)}")
+            return None
+
+    def describe(self) -> List[dict]:
+        """Job list for the admin API"""
+        return [
+            {
+                "name": job.name,
+                "cron": job.schedule.expression,
+                "next_run": job.next_run,
+                "jitter_seconds": job.jitter_seconds,
+                "leader_only": job.leader_only
+            }
+            for job in self.jobs.values()
+        ]
+
+
+async def ensure_scheduler_indexes(db):
+    """Index run history for the admin view and expire old records"""
+    await db.scheduler_runs.create_index([("job", 1), ("started_at", -1)])
+    await db.scheduler_runs.create_index("started_at", expireAfterSeconds=int(RUN_HISTORY_TTL.total_seconds()))
@@ -0,0 +1,164 @@
+"""
+Live game status feed for BetrSlip
+- Polls ESPN's league-wide scoreboard: one request per league per cycle
+- Keeps an in-memory map of game id -> ScheduleEvent (pre / in / post, scores)
+- Adaptive interval: fast while games are live or about to start, slow otherwise
+- Request paths read the map with no network call; runs in every worker process
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+import logging
+
+import aiohttp
+
+from sports_data_service import ESPN_API_BASE, ScheduleEvent, SportsDataService, parse_espn_event
+
+logger = logging.getLogger(__name__)
+
+SCOREBOARD_LEAGUES = {'nfl': 'football', 'nba': 'basketball'}
+
+# Games from this far back / ahead are kept on the board
+SCOREBOARD_WINDOW_BACK = timedelta(days=7)
+SCOREBOARD_WINDOW_AHEAD = timedelta(days=7)
+
+POLL_LIVE_SECONDS = float(os.environ.get('SCOREBOARD_POLL_LIVE_SECONDS', '30'))
+POLL_IDLE_SECONDS = float(os.environ.get('SCOREBOARD_POLL_IDLE_SECONDS', '900'))
+# Switch to the fast interval this long before a scheduled start
+PREGAME_LEAD = timedelta(minutes=15)
+# A board older than this is not trusted; callers fall back to team schedules
+MAX_BOARD_AGE = timedelta(seconds=POLL_IDLE_SECONDS * 2 + 60)
+
+
+class LeagueBoard:
+    """Latest scoreboard for one league"""
+
+    def __init__(self, league: str, sport: str):
+        self.league = league
+        self.sport = sport
+        self.events: Dict[str, ScheduleEvent] = {}
+        self.updated_at: Optional[datetime] = None
+        self.next_poll: Optional[datetime] = None
+        self.errors = 0
+
+    def is_fresh(self, now: datetime) -> bool:
+        return self.updated_at is not None and now - self.updated_at < MAX_BOARD_AGE
+
+    def replace(self, events: List[ScheduleEvent], now: datetime):
+        # Swap the whole map at once so readers never see a half-updated board
+        self.events = {event.id: event for event in events}
+        self.updated_at = now
+        self.errors = 0
+
+    def poll_interval(self, now: datetime) -> float:
+        """Seconds until the next poll, based on what is on the board"""
+        if self.errors:
+            return min(POLL_LIVE_SECONDS * 2 ** self.errors, POLL_IDLE_SECONDS)
+
+        next_start = None
+        for event in self.events.values():
+            if event.live:
+                return POLL_LIVE_SECONDS
+            if event.state == 'pre':
+                if event.date - now <= PREGAME_LEAD:
+                    # About to start, or past its start time and not flipped yet
+                    return POLL_LIVE_SECONDS
+                if next_start is None or event.date < next_start:
+                    next_start = event.date
+
+        if next_start is None:
+            return POLL_IDLE_SECONDS
+        # Sleep until the lead-in of the next game, but never longer than the idle interval
+        return max(POLL_LIVE_SECONDS, min(POLL_IDLE_SECONDS, (next_start - PREGAME_LEAD - now).total_seconds()))
+
+
+class ScoreboardPoller:
+    """Background polling loop per league plus lookups for request handlers"""
+
+    def __init__(self, leagues: Dict[str, str] = SCOREBOARD_LEAGUES):
+        self.boards = {league: LeagueBoard(league, sport) for league, sport in leagues.items()}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        for board in self.boards.values():
+            self._tasks.append(asyncio.create_task(self._poll_loop(board)))
+        logger.info(f"Scoreboard poller started for {', '.join(self.boards)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _poll_loop(self, board: LeagueBoard):
+        # Spread the first polls of several workers / leagues apart
+        await asyncio.sleep(random.uniform(0, 5))
+        while True:
+            await self.poll(board)
+            now = datetime.now(timezone.utc)
+            delay = board.poll_interval(now) * random.uniform(0.9, 1.1)
+            board.next_poll = now + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+
+    async def poll(self, board: LeagueBoard) -> int:
+        """Fetch the league scoreboard for the whole window, returns games on the board"""
+        now = datetime.now(timezone.utc)
+        dates = f"{(now - SCOREBOARD_WINDOW_BACK):%Y%m%d}-{(now + SCOREBOARD_WINDOW_AHEAD):%Y%m%d}"
+        url = f"{ESPN_API_BASE}/{board.sport}/{board.league}/scoreboard"
+        try:
+            async with self._session.get(url, params={'dates': dates, 'limit': '500'}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                data = await response.json()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            board.errors += 1
+            logger.error(f"Error polling {board.league} scoreboard: {str(e)}")
+            return len(board.events)
+
+        events = [event for event in map(parse_espn_event, data.get('events', [])) if event and event.id]
+        board.replace(events, now)
+        return len(events)
+
+    def events_for_teams(self, team_names: List[str]) -> Optional[List[ScheduleEvent]]:
+        """
+        Board games involving any of the teams, or None if a team's league board
+        isn't fresh (the caller should then fall back to team schedules).
+        """
+        now = datetime.now(timezone.utc)
+        events = []
+        for team_name in team_names:
+            team_info = SportsDataService.get_team_info(team_name)
+            if not team_info:
+                continue
+            board = self.boards.get(team_info['league'])
+            if board is None or not board.is_fresh(now):
+                return None
+            events.extend(e for e in board.events.values() if e.involves(team_info['name']))
+        return events
+
+    def describe(self) -> List[dict]:
+        """Board state for the admin API"""
+        return [
+            {
+                "league": board.league,
+                "games": len(board.events),
+                "live": sum(1 for event in board.events.values() if event.live),
+                "updated_at": board.updated_at,
+                "next_poll": board.next_poll,
+                "errors": board.errors
+            }
+            for board in self.boards.values()
+        ]
+
+
+scoreboard = ScoreboardPoller()
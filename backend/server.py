@@ -1,37 +1,76 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import JSONResponse, Response
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import functools
+import hashlib
 import logging
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
 import base64
-import aiohttp
+import io
 import json
 import re
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+from PIL import Image
+from emergentintegrations.llm.chat import UserMessage
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 
 
 # Import sports data service
 import sys
 sys.path.append(os.path.dirname(__file__))
-from sports_data_service import get_enhanced_context_for_analysis, SportsDataService
-from injury_weather_service import get_enhanced_game_context
+from sports_data_service import SportsDataService
+from injury_weather_service import InjuryWeatherService
+from game_context import prune_context_cache
+from llm_gateway import gateway as llm_gateway, LLMGatewayError, image_media_type
+from analysis_pipeline import run_analysis_pipeline, extract_analysis_json
+from model_router import model_router
+from prompt_builder import load_tokenizer
+from replay import install as install_replay
 from admin_subscription import (
-    is_admin, get_all_users, get_admin_stats, ban_user, unban_user,
+    is_admin, get_all_users, get_admin_stats, ban_user, unban_user, rebuild_admin_stats,
     check_usage_limit, increment_usage, update_device_fingerprint,
     generate_device_fingerprint, get_client_ip, get_user_subscription,
     create_subscription_record, update_subscription_status,
+    increment_admin_stats, top_bet_counter_deltas, subscription_counter_delta,
+    get_top_bets_stats, ADMIN_STATS_ID,
     FREE_ANALYSIS_LIMIT, SUBSCRIPTION_PRICE, ADMIN_EMAIL
 )
+from game_ranker import rank_games
+from pricing_engine import format_pricing_context
+from leg_pricing import price_legs
+from odds_math import (
+    american_to_decimal, calculate_kelly_criterion, calculate_expected_value,
+    probability_to_american_odds, parlay_decimal, convert_odds_batch
+)
+from bankroll_simulator import MAX_KELLY_FRACTIONS, run_simulation, bet_mix_from_analyses
+from parlay_engine import (
+    LegSet, parlay_distribution, teaser_distribution, round_robin_distribution, best_subset
+)
+from mongo_lock import mongo_lock, ensure_lock_indexes
+from scheduler import Scheduler, ensure_scheduler_indexes
+from calibration import (
+    CALIBRATION_PROJECTION, calibration_delta, apply_calibration_delta,
+    rebuild_calibration, get_calibration_report
+)
+from probability_calibration import calibrator
+from settlement import settle_pending_outcomes, ensure_settlement_indexes
+from scoreboard_poller import scoreboard
+from user_stats import (
+    ROLLUP_PROJECTION, user_stats_delta, apply_user_stats_delta,
+    get_user_rollup, format_user_stats
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -39,7 +78,7 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ.get('DB_NAME', 'test_database')]
 
 # JWT and password hashing
@@ -48,12 +87,18 @@ JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24 * 7  # 1 week
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# LLM Configuration
-EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+# LLM Configuration (EMERGENT_LLM_KEY and the concurrency/retry limits are read by llm_gateway)
+# Recorded on every analysis so calibration can be compared across models/prompts;
+# defaults to the model that produced the probability (see model_router for routes)
+ANALYSIS_MODEL_VERSION = os.environ.get('ANALYSIS_MODEL_VERSION')
 
 # Stripe Configuration
 STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY', '')
 
+# Retention for ephemeral collections (TTL indexes)
+TOP_BETS_TTL_DAYS = int(os.environ.get('TOP_BETS_TTL_DAYS', '30'))
+PENDING_PAYMENT_TTL_DAYS = int(os.environ.get('PENDING_PAYMENT_TTL_DAYS', '7'))
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -64,52 +109,19 @@ security = HTTPBearer()
 
 
 # ===== UTILITY FUNCTIONS =====
-def american_to_decimal(american_odds: str) -> float:
-    """Convert American odds to decimal odds"""
+def make_thumbnail(image_bytes: bytes, max_size: int = 320) -> Optional[str]:
+    """Downscale an uploaded bet slip to a small base64 JPEG for list views"""
     try:
-        odds = float(american_odds.replace('+', '').replace('-', ''))
-        if american_odds.startswith('-'):
-            return 1 + (100 / odds)
-        else:
-            return 1 + (odds / 100)
-    except:
-        return 2.0  # Default to even odds
-
-def decimal_to_implied_prob(decimal_odds: float) -> float:
-    """Convert decimal odds to implied probability"""
-    return (1 / decimal_odds) * 100
-
-def calculate_kelly_criterion(win_prob: float, decimal_odds: float) -> float:
-    """
-    Calculate Kelly Criterion percentage
-    Kelly % = (bp - q) / b
-    where b = decimal_odds - 1, p = win probability, q = 1 - p
-    """
-    b = decimal_odds - 1
-    p = win_prob / 100
-    q = 1 - p
-    kelly = (b * p - q) / b
-    # Cap at 25% max for safety (fractional Kelly)
-    return max(0, min(kelly * 100, 25))
-
-def calculate_expected_value(win_prob: float, decimal_odds: float, stake: float = 100) -> float:
-    """
-    Calculate Expected Value
-    EV = (win_prob * profit) - (loss_prob * stake)
-    """
-    p = win_prob / 100
-    profit = stake * (decimal_odds - 1)
-    ev = (p * profit) - ((1 - p) * stake)
-    return (ev / stake) * 100  # Return as percentage
-
-def probability_to_american_odds(prob: float) -> str:
-    """Convert probability to American odds format"""
-    if prob >= 50:
-        odds = -(prob / (100 - prob)) * 100
-        return f"{int(odds)}"
-    else:
-        odds = ((100 - prob) / prob) * 100
-        return f"+{int(odds)}"
+        image = Image.open(io.BytesIO(image_bytes))
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=70, optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    except Exception as e:
+        logging.error(f"Error creating thumbnail: {str(e)}")
+        return None
 
 def get_bet_recommendation(ev: float, kelly: float, confidence: int) -> str:
     """Determine bet recommendation based on metrics"""
@@ -155,7 +167,10 @@ class BetAnalysis(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     image_data: str  # base64 encoded
-    win_probability: float
+    thumbnail_data: Optional[str] = None  # small base64 JPEG for history lists
+    win_probability: float  # calibrated
+    raw_win_probability: Optional[float] = None  # as returned by the LLM
+    calibration_version: Optional[str] = None
     analysis_text: str
     bet_details: Optional[str] = None
     individual_bets: Optional[List[dict]] = None
@@ -173,6 +188,18 @@ class BetAnalysis(BaseModel):
     injuries_data: Optional[List[dict]] = None
     weather_data: Optional[dict] = None
     team_form_data: Optional[List[dict]] = None
+    # Market pricing (per-leg no-vig fair odds and deterministic EV)
+    market_pricing: Optional[dict] = None
+    # Calibration slices
+    sport: Optional[str] = None
+    legs_count: Optional[int] = None
+    model_version: Optional[str] = None
+    prompt_tokens: Optional[int] = None  # analysis prompt size after budgeting
+    prompt_trimmed: Optional[List[str]] = None  # context sections summarized/cut/dropped to fit
+    pipeline_mode: Optional[str] = None  # "two_pass" / "single_pass"
+    pipeline_timings: Optional[dict] = None  # per-stage milliseconds
+    pipeline_models: Optional[dict] = None  # stage -> "provider/model" used
+    extraction_confidence: Optional[float] = None  # 0-1, drives model escalation
     # Game Status
     games_status: Optional[dict] = None  # {"has_expired": bool, "expired_games": [], "upcoming_games": []}
     # Historical Tracking
@@ -193,6 +220,7 @@ class BetImprovementSuggestion(BaseModel):
 class BetAnalysisResponse(BaseModel):
     id: str
     win_probability: float
+    raw_win_probability: Optional[float] = None
     analysis_text: str
     bet_details: Optional[str]
     individual_bets: Optional[List[dict]] = None
@@ -210,6 +238,7 @@ class BetAnalysisResponse(BaseModel):
     injuries_data: Optional[List[dict]] = None  # Injury reports
     weather_data: Optional[dict] = None  # Weather conditions
     team_form_data: Optional[List[dict]] = None  # Team recent form
+    market_pricing: Optional[dict] = None  # Per-leg market fair odds, market EV
     # Game Status
     games_status: Optional[dict] = None  # Expired/upcoming game info
     # Improvement Suggestions (for low probability bets)
@@ -218,22 +247,6 @@ class BetAnalysisResponse(BaseModel):
     educational_tips: Optional[List[str]] = None  # Educational content
     created_at: datetime
 
-class BetHistoryResponse(BaseModel):
-    id: str
-    win_probability: float
-    analysis_text: str
-    bet_details: Optional[str]
-    individual_bets: Optional[List[dict]] = None
-    risk_factors: Optional[List[str]] = None
-    positive_factors: Optional[List[str]] = None
-    expected_value: Optional[float] = None
-    kelly_percentage: Optional[float] = None
-    recommendation: Optional[str] = None
-    confidence_score: Optional[int] = None
-    image_data: str
-    created_at: datetime
-
-
 # ===== AUTH UTILITIES =====
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -278,8 +291,8 @@ async def signup(user_data: UserCreate):
     
     # Save to database
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
     await db.users.insert_one(user_dict)
+    await increment_admin_stats(db, total_users=1)
     
     # Create token
     token = create_jwt_token(user.id, user.email)
@@ -309,7 +322,7 @@ async def login(user_data: UserLogin):
     user_response = UserResponse(
         id=user_doc['id'],
         email=user_doc['email'],
-        created_at=datetime.fromisoformat(user_doc['created_at']) if isinstance(user_doc['created_at'], str) else user_doc['created_at']
+        created_at=user_doc['created_at']
     )
     
     return TokenResponse(token=token, user=user_response)
@@ -343,8 +356,8 @@ async def admin_password_reset(reset_data: AdminPasswordReset):
         password_hash = hash_password(reset_data.new_password)
         user = User(email=reset_data.email.lower(), password_hash=password_hash, is_admin=True)
         user_dict = user.model_dump()
-        user_dict['created_at'] = user_dict['created_at'].isoformat()
         await db.users.insert_one(user_dict)
+        await increment_admin_stats(db, total_users=1)
         return {"message": "Admin account created successfully", "success": True}
     
     # Update password
@@ -391,7 +404,7 @@ async def initialize_sample_picks(init_data: InitializeRequest):
             "risk_factors": ["Raiders covered in 2 of last 3 vs Chiefs", "Weather could be a factor"],
             "game_time": "Sunday 4:25 PM ET",
             "created_by": ADMIN_EMAIL,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": datetime.now(timezone.utc),
             "is_active": True
         },
         {
@@ -406,7 +419,7 @@ async def initialize_sample_picks(init_data: InitializeRequest):
             "risk_factors": ["Large spread could be trap"],
             "game_time": "Tonight 7:30 PM ET",
             "created_by": ADMIN_EMAIL,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": datetime.now(timezone.utc),
             "is_active": True
         },
         {
@@ -421,12 +434,13 @@ async def initialize_sample_picks(init_data: InitializeRequest):
             "risk_factors": ["Heavy favorite, reduced value", "Padres have talented lineup"],
             "game_time": "Tomorrow 10:10 PM ET",
             "created_by": ADMIN_EMAIL,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": datetime.now(timezone.utc),
             "is_active": True
         }
     ]
     
     await db.daily_picks.insert_many(sample_picks)
+    invalidate_daily_picks_snapshot()
     
     return {"message": f"Initialized {len(sample_picks)} sample picks", "initialized": True, "picks_count": len(sample_picks)}
 
@@ -513,28 +527,21 @@ def generate_improvement_suggestions(
     
     # 3. Find best 2-leg combo if 3+ legs
     if num_legs >= 3 and individual_bets:
-        best_combo_prob = 0
-        best_combo = None
-        
-        for i, bet1 in enumerate(individual_bets):
-            for j, bet2 in enumerate(individual_bets):
-                if i < j:
-                    p1 = bet1.get('individual_probability', 50) / 100
-                    p2 = bet2.get('individual_probability', 50) / 100
-                    combo_prob = p1 * p2 * 100
-                    
-                    if combo_prob > best_combo_prob:
-                        best_combo_prob = combo_prob
-                        best_combo = (bet1, bet2)
+        try:
+            best_combo = best_subset(LegSet.from_bets(individual_bets), 2, objective="probability")
+        except ValueError as e:
+            logger.warning(f"Skipping best combo suggestion: {str(e)}")
+            best_combo = None
         
-        if best_combo and best_combo_prob > win_probability * 1.5:
+        if best_combo and best_combo['win_probability'] > win_probability * 1.5:
+            best_combo_prob = best_combo['win_probability']
             suggestions.append({
                 "type": "alternative",
                 "title": "💡 Try this 2-leg combo instead",
                 "description": f"Combine your two strongest picks for better odds",
                 "impact": f"Win probability: {best_combo_prob:.1f}% (vs {win_probability:.1f}%)",
                 "new_probability": round(best_combo_prob, 1),
-                "recommended_legs": [best_combo[0].get('description'), best_combo[1].get('description')]
+                "recommended_legs": best_combo['descriptions']
             })
     
     # 4. Kelly Criterion suggestion
@@ -597,6 +604,250 @@ def generate_improvement_suggestions(
     }
 
 
+# ===== MARKET PRICING =====
+def analysis_sport(market_pricing: Optional[dict]) -> Optional[str]:
+    """Sport of a slip from its market-matched legs ("mixed" if more than one)"""
+    if not market_pricing:
+        return None
+    sports = {leg['sport'] for leg in market_pricing.get('legs', []) if leg.get('sport')}
+    if not sports:
+        return None
+    return sports.pop() if len(sports) == 1 else "mixed"
+
+
+async def price_bet_legs(individual_bets: List[dict]) -> Optional[dict]:
+    """
+    Price slip legs against current market odds (cached feeds, no LLM call).
+    Returns None when the slip has no legs or pricing fails.
+    """
+    if not individual_bets:
+        return None
+    try:
+        # Same feeds the picks use (PICK_SPORTS), so their caches serve both
+        games = await SportsDataService.get_odds_for_sports(PICK_SPORTS)
+        market_pricing = price_legs(individual_bets, games)
+        if market_pricing['fair_probability'] is not None:
+            market_pricing['kelly_percentage'] = round(calculate_kelly_criterion(
+                market_pricing['fair_probability'], market_pricing['decimal_odds']
+            ), 2)
+        return market_pricing
+    except Exception as e:
+        logger.error(f"Error pricing bet legs: {str(e)}")
+        return None
+
+
+def slip_decimal_odds(total_odds, individual_bets: List[dict]) -> float:
+    """
+    Decimal price of the whole slip: the slip's total odds if readable,
+    otherwise the product of the legs' odds, otherwise even money.
+    """
+    if total_odds:
+        try:
+            return american_to_decimal(total_odds)
+        except ValueError:
+            logger.warning(f"Unreadable total odds {total_odds!r}, falling back to leg odds")
+    
+    leg_odds = []
+    for bet in individual_bets or []:
+        if bet.get('odds'):
+            try:
+                leg_odds.append(american_to_decimal(bet['odds']))
+            except ValueError:
+                logger.warning(f"Skipping unreadable leg odds {bet['odds']!r}")
+    return parlay_decimal(leg_odds) if leg_odds else 2.0
+
+
+# ===== ODDS TOOLS =====
+MAX_ODDS_BATCH = 50000
+
+
+class OddsConvertRequest(BaseModel):
+    odds: List[Union[float, str]]
+    input_format: str = "american"  # "american", "decimal" or "probability" (0-100)
+    win_probabilities: Optional[List[float]] = None  # 0-100, adds EV and Kelly per price
+
+
+@api_router.post("/odds/convert")
+def convert_odds(request: OddsConvertRequest):
+    """
+    Batch odds conversion: decimal, American and implied probability for every price.
+    Up to MAX_ODDS_BATCH (50,000) prices per request; larger batches get a 413.
+    Plain def: FastAPI runs the parsing in its threadpool, off the event loop.
+    """
+    if len(request.odds) > MAX_ODDS_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ODDS_BATCH} prices per request")
+    try:
+        return convert_odds_batch(request.odds, request.input_format, request.win_probabilities)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ===== PARLAY CALCULATOR =====
+MAX_PARLAY_LEGS = 200
+
+
+class ParlayLegInput(BaseModel):
+    win_probability: float  # 0-100
+    odds: Optional[Union[float, str]] = None  # American odds
+    decimal_odds: Optional[float] = None  # used when American odds are not given
+    push_probability: float = 0.0  # 0-100
+    group: Optional[str] = None  # legs sharing a group (same game) are correlated
+    description: Optional[str] = None
+
+
+class ParlayPriceRequest(BaseModel):
+    legs: List[ParlayLegInput]
+    bet_type: str = "parlay"  # "parlay", "teaser" or "round_robin"
+    round_robin_sizes: Optional[List[int]] = None  # e.g. [2, 3] for "by 2s and 3s"
+    teaser_payouts: Optional[Dict[int, Union[float, str]]] = None  # legs -> American odds
+    correlation: float = 0.0  # 0-1, same-game correlation strength
+    best_subset_size: Optional[int] = None
+    objective: str = "ev"  # best subset by "ev" or "probability"
+
+
+@api_router.post("/parlay/price")
+def price_parlay(request: ParlayPriceRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Exact win/push/loss distribution and EV for a parlay, teaser or round robin.
+    Plain def: the numpy work (up to 200 legs, subset search) runs in FastAPI's threadpool.
+    """
+    if not request.legs:
+        raise HTTPException(status_code=400, detail="At least one leg is required")
+    if len(request.legs) > MAX_PARLAY_LEGS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_PARLAY_LEGS} legs per request")
+    
+    try:
+        decimal_odds = [
+            american_to_decimal(leg.odds) if leg.odds is not None else leg.decimal_odds
+            for leg in request.legs
+        ]
+        if any(odds is None for odds in decimal_odds):
+            raise ValueError("Every leg needs odds or decimal_odds")
+        legs = LegSet.from_arrays(
+            [leg.win_probability for leg in request.legs],
+            decimal_odds,
+            [leg.push_probability for leg in request.legs],
+            groups=[leg.group for leg in request.legs],
+            correlation=request.correlation,
+            descriptions=[leg.description for leg in request.legs]
+        )
+        
+        if request.bet_type == "parlay":
+            result = {"parlay": parlay_distribution(legs)}
+        elif request.bet_type == "teaser":
+            result = {"teaser": teaser_distribution(legs, request.teaser_payouts)}
+        elif request.bet_type == "round_robin":
+            sizes = request.round_robin_sizes or [2]
+            result = {"round_robin": round_robin_distribution(legs, sizes)}
+        else:
+            raise ValueError(f"Unknown bet type: {request.bet_type}")
+        
+        if request.best_subset_size:
+            result["best_subset"] = best_subset(legs, request.best_subset_size, request.objective)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result["bet_type"] = request.bet_type
+    result["correlation"] = request.correlation
+    return result
+
+
+# ===== BANKROLL SIMULATION =====
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', '2'))
+MAX_SIMULATION_PATHS = 1000000
+MAX_SIMULATION_BETS = 1000
+MAX_SIMULATION_STEPS = 100000000  # paths x bets, bounds CPU time per request
+SIMULATION_HISTORY_LIMIT = 500
+
+_simulation_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_simulation_pool() -> ProcessPoolExecutor:
+    """Simulations are CPU-bound; run them in worker processes, not on the event loop"""
+    global _simulation_pool
+    if _simulation_pool is None:
+        _simulation_pool = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS)
+    return _simulation_pool
+
+
+class SimulationBet(BaseModel):
+    win_probability: float  # 0-100
+    odds: Optional[Union[float, str]] = None  # American odds
+    decimal_odds: Optional[float] = None
+
+
+class SimulationRequest(BaseModel):
+    source: str = "slip"  # "slip" (bets below) or "history" (the user's analyzed bets)
+    bets: Optional[List[SimulationBet]] = None
+    starting_bankroll: float = 1000
+    num_bets: int = 100
+    paths: int = 100000
+    flat_stake: Optional[float] = None  # defaults to 1% of the starting bankroll
+    kelly_fractions: List[float] = [1.0, 0.5, 0.25]  # up to MAX_KELLY_FRACTIONS, each in (0, 1]
+    ruin_fraction: float = 0.05  # ruined below this share of the starting bankroll
+    seed: Optional[int] = None
+
+
+@api_router.post("/simulate")
+async def simulate_bankroll(request: SimulationRequest, current_user: dict = Depends(get_current_user)):
+    """Monte Carlo bankroll paths for flat staking vs. fractional Kelly"""
+    if not 1 <= request.paths <= MAX_SIMULATION_PATHS:
+        raise HTTPException(status_code=400, detail=f"paths must be between 1 and {MAX_SIMULATION_PATHS}")
+    if not 1 <= request.num_bets <= MAX_SIMULATION_BETS:
+        raise HTTPException(status_code=400, detail=f"num_bets must be between 1 and {MAX_SIMULATION_BETS}")
+    if request.paths * request.num_bets > MAX_SIMULATION_STEPS:
+        raise HTTPException(status_code=400, detail="paths x num_bets is too large")
+    if request.starting_bankroll <= 0:
+        raise HTTPException(status_code=400, detail="starting_bankroll must be positive")
+    if len(request.kelly_fractions) > MAX_KELLY_FRACTIONS or any(not 0 < f <= 1 for f in request.kelly_fractions):
+        raise HTTPException(status_code=400, detail=f"kelly_fractions: up to {MAX_KELLY_FRACTIONS} values, each above 0 and at most 1")
+    
+    if request.source == "history":
+        analyses = await db.bet_analyses.find(
+            {"user_id": current_user['user_id']},
+            {"_id": 0, "win_probability": 1, "expected_value": 1}
+        ).sort("created_at", -1).limit(SIMULATION_HISTORY_LIMIT).to_list(SIMULATION_HISTORY_LIMIT)
+        bet_mix = bet_mix_from_analyses(analyses)
+    elif request.source == "slip":
+        try:
+            bet_mix = {
+                "win_probabilities": [bet.win_probability for bet in request.bets or []],
+                "decimal_odds": [
+                    american_to_decimal(bet.odds) if bet.odds is not None else bet.decimal_odds
+                    for bet in request.bets or []
+                ]
+            }
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if any(odds is None for odds in bet_mix["decimal_odds"]):
+            raise HTTPException(status_code=400, detail="Every bet needs odds or decimal_odds")
+    else:
+        raise HTTPException(status_code=400, detail="source must be 'slip' or 'history'")
+    
+    if not bet_mix["win_probabilities"]:
+        raise HTTPException(status_code=400, detail="No bets to simulate")
+    
+    job = functools.partial(
+        run_simulation,
+        bet_mix["win_probabilities"],
+        bet_mix["decimal_odds"],
+        starting_bankroll=request.starting_bankroll,
+        num_bets=request.num_bets,
+        paths=request.paths,
+        flat_stake=request.flat_stake,
+        kelly_fractions=request.kelly_fractions,
+        ruin_fraction=request.ruin_fraction,
+        seed=request.seed
+    )
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(get_simulation_pool(), job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result["source"] = request.source
+    return result
+
+
 # ===== BET ANALYSIS ROUTES =====
 @api_router.post("/analyze", response_model=BetAnalysisResponse)
 async def analyze_bet_slip(
@@ -625,198 +876,20 @@ async def analyze_bet_slip(
         image_bytes = await file.read()
         image_base64 = base64.b64encode(image_bytes).decode('utf-8')
         
-        # Create AI chat instance
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"bet_analysis_{uuid.uuid4()}",
-            system_message="""You are an elite sports betting analyst with OCR expertise and access to real-time market data. 
-            
-Your analysis must be:
-1. PRECISE: Extract ALL text from bet slips accurately - odds, teams, amounts, bet types
-2. DATA-DRIVEN: Use real-time odds, line movements, and market indicators provided
-3. REALISTIC: Most bets have negative EV - don't be overly optimistic
-4. SHARP: Consider sharp money indicators, line movement, and market efficiency
-
-When real-time data is provided, heavily weight it in your analysis."""
-        )
-        chat.with_model("openai", "gpt-4o")
-        
-        # STEP 1: Dedicated OCR/Extraction Pass
-        # This improves accuracy by focusing solely on text extraction first
-        image_content = ImageContent(image_base64=image_base64)
-        
-        extraction_prompt = """STEP 1: EXTRACT ALL TEXT FROM THIS BET SLIP IMAGE
-
-Focus on extracting EVERY piece of text visible. Be meticulous and accurate.
-
-Return a structured extraction:
-```
-SPORTSBOOK: [App name - DraftKings, FanDuel, Hard Rock, BetMGM, etc.]
-BET_TYPE: [Single, Parlay, Same Game Parlay, Teaser, Round Robin, etc.]
-TOTAL_STAKE: [Amount wagered with $ symbol]
-POTENTIAL_PAYOUT: [Potential win amount]
-TOTAL_ODDS: [Combined odds if shown]
-
-INDIVIDUAL SELECTIONS:
-1. Team/Player: [exact name]
-   Bet Type: [Moneyline, Spread, Over/Under, Player Prop, etc.]
-   Line: [spread or total if applicable]
-   Odds: [American format odds]
-   
-2. Team/Player: [exact name]
-   Bet Type: [...]
-   Line: [...]
-   Odds: [...]
-
-[Continue for all selections...]
-
-OTHER VISIBLE TEXT:
-- [Any other relevant text like game dates, times, leagues]
-```
-
-Be EXACT with names, numbers and odds. If something is unclear, note it as [unclear]."""
-
-        extraction_msg = UserMessage(
-            text=extraction_prompt,
-            file_contents=[image_content]
-        )
-        
-        extracted_data = await chat.send_message(extraction_msg)
-        logger.info(f"Extracted bet slip data: {extracted_data[:500]}...")
-        
-        # STEP 2: Get Enhanced Context with Real-Time Data
-        enhanced_context = ""
-        injuries_data = []
-        weather_data = None
-        team_form_data = []
-        
-        try:
-            # Extract team names from the extracted text
-            team_names = SportsDataService.extract_team_names(extracted_data)
-            logger.info(f"Extracted teams: {team_names}")
-            
-            # Fetch real-time data for each team
-            from injury_weather_service import InjuryWeatherService
-            
-            for team in team_names[:2]:  # Max 2 teams
-                # Get injuries
-                team_injuries = await InjuryWeatherService.get_injuries_for_team(team)
-                if team_injuries:
-                    injuries_data.extend([{**inj, 'team': team.title()} for inj in team_injuries])
-                
-                # Get weather (usually just need one location)
-                if not weather_data:
-                    team_weather = await InjuryWeatherService.get_weather_for_game(team)
-                    if team_weather and 'note' not in team_weather:
-                        weather_data = team_weather
-                
-                # Get team form
-                recent_games = await SportsDataService.get_recent_games(team, limit=5)
-                if recent_games:
-                    form = SportsDataService.calculate_form_rating(recent_games)
-                    record = await SportsDataService.get_team_record(team)
-                    team_form_data.append({
-                        'team': record.get('team_name', team.title()) if record else team.title(),
-                        'record': record.get('overall', 'N/A') if record else 'N/A',
-                        'form': form.get('form', ''),
-                        'rating': form.get('rating', 'Unknown'),
-                        'avg_margin': form.get('avg_margin', 0),
-                        'recent': [f"{g['result']} vs {g['opponent']}" for g in recent_games[:3]]
-                    })
-            
-            # Get real-time sports odds data context
-            odds_context = await get_enhanced_context_for_analysis([], extracted_data)
-            
-            # Get injury and weather context
-            injury_weather_context = await get_enhanced_game_context(team_names)
-            
-            # Combine all contexts
-            enhanced_context = odds_context + injury_weather_context
-            
-            logger.info(f"Enhanced context length: {len(enhanced_context)}")
-            logger.info(f"Injuries found: {len(injuries_data)}, Weather: {weather_data is not None}, Team forms: {len(team_form_data)}")
-        except Exception as e:
-            logger.error(f"Error getting enhanced context: {str(e)}")
-            enhanced_context = ""
-        
-        # STEP 2.5: Check if games have already ended
-        games_status = None
-        try:
-            team_names_for_status = SportsDataService.extract_team_names(extracted_data)
-            games_status = await SportsDataService.check_games_status(team_names_for_status)
-            if games_status.get('warning_message'):
-                logger.info(f"Game status warning: {games_status['warning_message']}")
-        except Exception as e:
-            logger.error(f"Error checking games status: {str(e)}")
-        
-        # STEP 3: Full Analysis with Extracted Data + Context
-        analysis_prompt = f"""STEP 2: ANALYZE THIS BET SLIP
-
-EXTRACTED BET SLIP DATA:
-{extracted_data}
-
-{enhanced_context}
-
-Now provide your COMPREHENSIVE analysis in JSON format:
-
-{{
-    "win_probability": <realistic number 0-100>,
-    "confidence_score": <1-10, how confident in this probability>,
-    "bet_type": "<single/parlay/teaser etc>",
-    "total_stake": "<stake amount if visible>",
-    "total_odds": "<combined odds>",
-    "potential_payout": "<payout if visible>",
-    "individual_bets": [
-        {{
-            "description": "<team/player and bet type>",
-            "odds": "<American odds format e.g. -140, +200>",
-            "individual_probability": <win chance 0-100>,
-            "reasoning": "<brief analysis citing specific data if available>"
-        }}
-    ],
-    "risk_factors": [
-        "<specific concern with data support>",
-        "<another concern>",
-        "<another concern>"
-    ],
-    "positive_factors": [
-        "<strength with reasoning>",
-        "<another strength>"
-    ],
-    "analysis": "<2-3 sentences overall assessment>",
-    "bet_details": "<concise summary: stakes, odds, potential payout>",
-    "sharp_analysis": "<based on line movement, book count, and market data - is this sharp or public money>"
-}}
-
-IMPORTANT ANALYSIS GUIDELINES:
-- Use the EXTRACTED DATA above for accurate bet details
-- If real-time market data is provided, USE IT to adjust probabilities  
-- Compare user's odds to current market odds - identify value or no-value
-- Consider team form, injuries, and weather if provided
-- Single bets: 30-70% probability range (be critical)
-- 2-leg parlays: 20-50% range  
-- 3-leg parlays: 10-35% range
-- 4+ leg parlays: 5-20% range
-- Confidence score: 8-10 = market data supports analysis, 5-7 = moderate data, 1-4 = limited data
-- Always include odds in American format (e.g., -140, +200)
-- Be realistic and critical - most bets have negative EV"""
-        
-        analysis_msg = UserMessage(text=analysis_prompt)
-        
-        # Get AI response
-        response = await chat.send_message(analysis_msg)
+        # Extraction, real-time context and analysis (two-pass or single-pass, see analysis_pipeline)
+        run = await run_analysis_pipeline(image_base64, current_user['user_id'])
+        response = run.response
+        prompt = run.prompt
+        injuries_data = run.context_fields['injuries_data']
+        weather_data = run.context_fields['weather_data']
+        team_form_data = run.context_fields['team_form_data']
+        games_status = run.games_status
         
         # Parse response and calculate advanced analytics
-        import json
-        import re
         try:
-            # Try to extract JSON from response
-            json_match = re.search(r'\{[^{}]*"win_probability"[^{}]*"analysis"[^{}]*\}', response, re.DOTALL)
-            if not json_match:
-                json_match = re.search(r'\{(?:[^{}]|{[^{}]*})*\}', response, re.DOTALL)
+            result = extract_analysis_json(response)
             
-            if json_match:
-                result = json.loads(json_match.group())
+            if result is not None:
                 win_probability = float(result.get('win_probability', 50.0))
                 confidence_score = int(result.get('confidence_score', 5))
                 analysis_text = result.get('analysis', 'Analysis completed')
@@ -826,17 +899,12 @@ IMPORTANT ANALYSIS GUIDELINES:
                 positive_factors = result.get('positive_factors', [])
                 total_odds = result.get('total_odds', None)
                 
+                # Post-hoc calibration of the LLM's number (identity until a map is fitted)
+                raw_win_probability = win_probability
+                win_probability = calibrator.calibrate(raw_win_probability, len(individual_bets or []))
+                
                 # Calculate advanced analytics
-                decimal_odds = 2.0  # Default
-                if total_odds:
-                    decimal_odds = american_to_decimal(total_odds)
-                elif individual_bets and len(individual_bets) > 0:
-                    # Calculate parlay odds from individual bets
-                    combined_decimal = 1.0
-                    for bet in individual_bets:
-                        if bet.get('odds'):
-                            combined_decimal *= american_to_decimal(bet['odds'])
-                    decimal_odds = combined_decimal
+                decimal_odds = slip_decimal_odds(total_odds, individual_bets)
                 
                 # Calculate Expected Value
                 expected_value = calculate_expected_value(win_probability, decimal_odds)
@@ -862,7 +930,10 @@ IMPORTANT ANALYSIS GUIDELINES:
                     
                     for bet in individual_bets:
                         if bet.get('individual_probability') and bet.get('odds'):
-                            bet_decimal_odds = american_to_decimal(bet['odds'])
+                            try:
+                                bet_decimal_odds = american_to_decimal(bet['odds'])
+                            except ValueError:
+                                continue
                             bet_ev = calculate_expected_value(bet['individual_probability'], bet_decimal_odds, 100)
                             straight_ev_total += bet_ev
                     
@@ -877,6 +948,7 @@ IMPORTANT ANALYSIS GUIDELINES:
                 # Fallback parsing
                 prob_match = re.search(r'(\d+(?:\.\d+)?)\s*%', response)
                 win_probability = float(prob_match.group(1)) if prob_match else 50.0
+                raw_win_probability = win_probability
                 confidence_score = 5
                 analysis_text = response.replace('```json', '').replace('```', '').strip()
                 bet_details = None
@@ -893,6 +965,7 @@ IMPORTANT ANALYSIS GUIDELINES:
         except Exception as e:
             logging.error(f"Error parsing AI response: {str(e)}")
             win_probability = 50.0
+            raw_win_probability = win_probability
             confidence_score = 5
             analysis_text = response.replace('```json', '').replace('```', '').strip()
             bet_details = None
@@ -906,11 +979,21 @@ IMPORTANT ANALYSIS GUIDELINES:
             estimated_roi = 0.0
             parlay_vs_straight = None
         
+        # Market-implied pricing per leg, independent of the LLM's probabilities;
+        # the thumbnail is resized in a thread meanwhile (PIL would block the loop)
+        market_pricing, thumbnail_data = await asyncio.gather(
+            price_bet_legs(individual_bets),
+            asyncio.to_thread(make_thumbnail, image_bytes)
+        )
+        
         # Save analysis
         bet_analysis = BetAnalysis(
             user_id=current_user['user_id'],
             image_data=image_base64,
+            thumbnail_data=thumbnail_data,
             win_probability=win_probability,
+            raw_win_probability=raw_win_probability,
+            calibration_version=calibrator.version,
             analysis_text=analysis_text,
             bet_details=bet_details,
             individual_bets=individual_bets,
@@ -926,12 +1009,23 @@ IMPORTANT ANALYSIS GUIDELINES:
             injuries_data=injuries_data if injuries_data else None,
             weather_data=weather_data,
             team_form_data=team_form_data if team_form_data else None,
+            market_pricing=market_pricing,
+            sport=analysis_sport(market_pricing),
+            legs_count=len(individual_bets or []),
+            model_version=ANALYSIS_MODEL_VERSION or run.models.get('analysis') or run.models.get('single_pass'),
+            prompt_tokens=prompt.tokens,
+            prompt_trimmed=prompt.trimmed or None,
+            pipeline_mode=run.mode,
+            pipeline_timings=run.timings,
+            pipeline_models=run.models,
+            extraction_confidence=run.extraction_confidence,
             games_status=games_status
         )
         
         analysis_dict = bet_analysis.model_dump()
-        analysis_dict['created_at'] = analysis_dict['created_at'].isoformat()
         await db.bet_analyses.insert_one(analysis_dict)
+        await increment_admin_stats(db, total_analyses=1)
+        await apply_user_stats_delta(db, current_user['user_id'], {"total_analyzed": 1})
         
         # Generate improvement suggestions for low probability bets
         improvement_data = generate_improvement_suggestions(
@@ -945,6 +1039,7 @@ IMPORTANT ANALYSIS GUIDELINES:
         response = BetAnalysisResponse(
             id=bet_analysis.id,
             win_probability=win_probability,
+            raw_win_probability=raw_win_probability,
             analysis_text=analysis_text,
             bet_details=bet_details,
             individual_bets=individual_bets,
@@ -960,6 +1055,7 @@ IMPORTANT ANALYSIS GUIDELINES:
             injuries_data=injuries_data if injuries_data else None,
             weather_data=weather_data,
             team_form_data=team_form_data if team_form_data else None,
+            market_pricing=market_pricing,
             games_status=games_status,
             improvement_suggestions=improvement_data["suggestions"] if improvement_data["suggestions"] else None,
             risk_level=improvement_data["risk_level"],
@@ -988,51 +1084,175 @@ IMPORTANT ANALYSIS GUIDELINES:
                 "risk_factors": risk_factors,
                 "positive_factors": positive_factors,
                 "team_form_data": team_form_data,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc)
             }
             await db.top_bets.insert_one(top_bet)
+            await increment_admin_stats(db, **top_bet_counter_deltas(top_bet))
             logger.info(f"Stored high-percentage bet: {win_probability}% for user {current_user['email']}")
         
         return response
         
     except HTTPException:
         raise
+    except LLMGatewayError as e:
+        logger.error(f"AI gateway error analyzing bet slip: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error analyzing bet slip: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing bet slip: {str(e)}")
 
 
-@api_router.get("/history", response_model=List[BetHistoryResponse])
-async def get_bet_history(current_user: dict = Depends(get_current_user)):
-    # Get user's bet history
-    analyses = await db.bet_analyses.find(
-        {"user_id": current_user['user_id']},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(50).to_list(50)
+# ===== BET HISTORY =====
+HISTORY_DEFAULT_LIMIT = 20
+HISTORY_MAX_LIMIT = 50
+
+# Summary view: what the history cards need, with list fields reduced to counts
+HISTORY_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "win_probability": 1,
+    "recommendation": 1,
+    "confidence_score": 1,
+    "expected_value": 1,
+    "bet_details": 1,
+    "analysis_text": 1,
+    "actual_outcome": 1,
+    "thumbnail_data": 1,
+    "created_at": 1,
+    "legs_count": {"$size": {"$ifNull": ["$individual_bets", []]}},
+    "risk_count": {"$size": {"$ifNull": ["$risk_factors", []]}},
+    "positive_count": {"$size": {"$ifNull": ["$positive_factors", []]}}
+}
+
+# Full view: everything except the full-size image
+HISTORY_FULL_EXCLUSIONS = {"_id": 0, "image_data": 0}
+
+def encode_history_cursor(doc: dict) -> str:
+    """Opaque keyset cursor pointing just past `doc` in (created_at, id) order"""
+    created_at = doc['created_at']
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps({"c": created_at, "i": doc['id']})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('utf-8')
+
+
+def decode_history_cursor(cursor: str) -> dict:
+    """Turn a history cursor into the keyset filter for the next page"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        created_at, last_id = datetime.fromisoformat(data['c']), data['i']
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": last_id}}
+    ]}
+
+
+@api_router.get("/history")
+async def get_bet_history(
+    view: str = "summary",
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get user's bet history, newest first.
+    Keyset-paginated on (created_at, id); pass `next_cursor` back as `cursor`.
+    Images are never inlined - use `thumbnail_data` or fetch `image_url`.
+    """
+    if view not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="view must be 'summary' or 'full'")
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
     
-    # Convert timestamps
-    for analysis in analyses:
-        if isinstance(analysis['created_at'], str):
-            analysis['created_at'] = datetime.fromisoformat(analysis['created_at'])
-    
-    return [
-        BetHistoryResponse(
-            id=a['id'],
-            win_probability=a['win_probability'],
-            analysis_text=a['analysis_text'],
-            bet_details=a.get('bet_details'),
-            individual_bets=a.get('individual_bets'),
-            risk_factors=a.get('risk_factors'),
-            positive_factors=a.get('positive_factors'),
-            expected_value=a.get('expected_value'),
-            kelly_percentage=a.get('kelly_percentage'),
-            recommendation=a.get('recommendation'),
-            confidence_score=a.get('confidence_score'),
-            image_data=a['image_data'],
-            created_at=a['created_at']
-        )
-        for a in analyses
+    match = {"user_id": current_user['user_id']}
+    if cursor:
+        match.update(decode_history_cursor(cursor))
+    
+    projection = HISTORY_SUMMARY_PROJECTION if view == "summary" else HISTORY_FULL_EXCLUSIONS
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection}
     ]
+    analyses = await db.bet_analyses.aggregate(pipeline).to_list(limit + 1)
+    
+    has_more = len(analyses) > limit
+    analyses = analyses[:limit]
+    for analysis in analyses:
+        analysis['image_url'] = f"/api/analysis/{analysis['id']}/image"
+    
+    missing_thumbnails = [a for a in analyses if not a.get('thumbnail_data')]
+    if missing_thumbnails and view == "summary":
+        await backfill_thumbnails(missing_thumbnails)
+    
+    # Full documents carry datetimes beyond created_at (pricing, settlement, ...)
+    return JSONResponse(content=jsonable_encoder({
+        "items": analyses,
+        "next_cursor": encode_history_cursor(analyses[-1]) if has_more else None
+    }))
+
+
+def _make_thumbnails(images: List[dict]) -> Dict[str, Optional[str]]:
+    """Decode and resize stored images; CPU-bound, runs in a worker thread"""
+    return {
+        doc['id']: make_thumbnail(base64.b64decode(doc['image_data']))
+        for doc in images if doc.get('image_data')
+    }
+
+
+async def backfill_thumbnails(analyses: List[dict]):
+    """Create and store thumbnails for analyses saved before thumbnails existed"""
+    ids = [a['id'] for a in analyses]
+    images = await db.bet_analyses.find(
+        {"id": {"$in": ids}},
+        {"_id": 0, "id": 1, "image_data": 1}
+    ).to_list(len(ids))
+    thumbnails = await asyncio.to_thread(_make_thumbnails, images)
+    
+    for analysis in analyses:
+        thumbnail = thumbnails.get(analysis['id'])
+        if thumbnail:
+            analysis['thumbnail_data'] = thumbnail
+            await db.bet_analyses.update_one({"id": analysis['id']}, {"$set": {"thumbnail_data": thumbnail}})
+
+
+@api_router.get("/analysis/{analysis_id}/image")
+async def get_analysis_image(analysis_id: str, current_user: dict = Depends(get_current_user)):
+    """Serve the original bet slip image for one analysis"""
+    analysis = await db.bet_analyses.find_one(
+        {"id": analysis_id, "user_id": current_user['user_id']},
+        {"_id": 0, "image_data": 1}
+    )
+    if not analysis or not analysis.get('image_data'):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    image_bytes = base64.b64decode(analysis['image_data'])
+    return Response(
+        content=image_bytes,
+        media_type=image_media_type(image_bytes),
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+
+@api_router.post("/analysis/{analysis_id}/reprice")
+async def reprice_analysis(analysis_id: str, current_user: dict = Depends(get_current_user)):
+    """Re-run market pricing for a stored analysis against the latest odds"""
+    analysis = await db.bet_analyses.find_one(
+        {"id": analysis_id, "user_id": current_user['user_id']},
+        {"_id": 0, "individual_bets": 1}
+    )
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    market_pricing = await price_bet_legs(analysis.get('individual_bets') or [])
+    if market_pricing is None:
+        raise HTTPException(status_code=422, detail="This analysis has no legs that can be priced")
+    
+    await db.bet_analyses.update_one({"id": analysis_id}, {"$set": {"market_pricing": market_pricing}})
+    return market_pricing
 
 
 class MarkOutcomeRequest(BaseModel):
@@ -1048,19 +1268,10 @@ async def mark_bet_outcome(
     current_user: dict = Depends(get_current_user)
 ):
     """Mark a bet as won/lost/push"""
-    # Verify ownership
-    bet = await db.bet_analyses.find_one(
-        {"id": analysis_id, "user_id": current_user['user_id']},
-        {"_id": 0}
-    )
-    
-    if not bet:
-        raise HTTPException(status_code=404, detail="Bet analysis not found")
-    
     # Update outcome
     update_data = {
         "actual_outcome": outcome_data.outcome,
-        "outcome_marked_at": datetime.now(timezone.utc).isoformat()
+        "outcome_marked_at": datetime.now(timezone.utc)
     }
     
     if outcome_data.stake_amount is not None:
@@ -1068,84 +1279,28 @@ async def mark_bet_outcome(
     if outcome_data.payout_amount is not None:
         update_data["payout_amount"] = outcome_data.payout_amount
     
-    await db.bet_analyses.update_one(
-        {"id": analysis_id},
-        {"$set": update_data}
+    # Verify ownership and update atomically, keeping the previous state for the rollups
+    bet = await db.bet_analyses.find_one_and_update(
+        {"id": analysis_id, "user_id": current_user['user_id']},
+        {"$set": update_data},
+        projection={**ROLLUP_PROJECTION, **CALIBRATION_PROJECTION}
     )
     
+    if not bet:
+        raise HTTPException(status_code=404, detail="Bet analysis not found")
+    
+    updated_bet = {**bet, **update_data}
+    await apply_user_stats_delta(db, current_user['user_id'], user_stats_delta(bet, updated_bet))
+    await apply_calibration_delta(db, calibration_delta(bet, updated_bet))
+    
     return {"message": "Outcome marked successfully", "outcome": outcome_data.outcome}
 
 
 @api_router.get("/stats")
 async def get_user_stats(current_user: dict = Depends(get_current_user)):
     """Get user's betting statistics and AI accuracy"""
-    # Get all completed bets (with outcomes)
-    completed_bets = await db.bet_analyses.find(
-        {
-            "user_id": current_user['user_id'],
-            "actual_outcome": {"$in": ["won", "lost", "push"]}
-        },
-        {"_id": 0}
-    ).to_list(1000)
-    
-    if not completed_bets:
-        return {
-            "total_analyzed": 0,
-            "total_tracked": 0,
-            "accuracy_rate": 0,
-            "total_profit": 0,
-            "roi": 0,
-            "bets_won": 0,
-            "bets_lost": 0,
-            "bets_push": 0,
-            "followed_recommendations": 0
-        }
-    
-    # Calculate stats
-    total_bets = len(completed_bets)
-    bets_won = sum(1 for b in completed_bets if b.get('actual_outcome') == 'won')
-    bets_lost = sum(1 for b in completed_bets if b.get('actual_outcome') == 'lost')
-    bets_push = sum(1 for b in completed_bets if b.get('actual_outcome') == 'push')
-    
-    # Calculate AI accuracy (predicted > 50% should win)
-    correct_predictions = 0
-    for bet in completed_bets:
-        if bet.get('actual_outcome') == 'push':
-            continue
-        predicted_win = bet.get('win_probability', 0) > 50
-        actually_won = bet.get('actual_outcome') == 'won'
-        if predicted_win == actually_won:
-            correct_predictions += 1
-    
-    accuracy_rate = (correct_predictions / (total_bets - bets_push) * 100) if (total_bets - bets_push) > 0 else 0
-    
-    # Calculate profit/loss
-    total_stake = sum(b.get('stake_amount', 0) for b in completed_bets if b.get('stake_amount'))
-    total_payout = sum(b.get('payout_amount', 0) for b in completed_bets if b.get('payout_amount'))
-    total_profit = total_payout - total_stake
-    roi = (total_profit / total_stake * 100) if total_stake > 0 else 0
-    
-    # Check how many followed recommendations
-    followed_recs = sum(
-        1 for b in completed_bets 
-        if b.get('recommendation') in ['BET', 'STRONG BET'] and b.get('actual_outcome') == 'won'
-    )
-    
-    # Get total analyzed (including pending)
-    total_analyzed = await db.bet_analyses.count_documents({"user_id": current_user['user_id']})
-    
-    return {
-        "total_analyzed": total_analyzed,
-        "total_tracked": total_bets,
-        "accuracy_rate": round(accuracy_rate, 1),
-        "total_profit": round(total_profit, 2),
-        "roi": round(roi, 1),
-        "bets_won": bets_won,
-        "bets_lost": bets_lost,
-        "bets_push": bets_push,
-        "followed_recommendations": followed_recs,
-        "win_rate": round((bets_won / (bets_won + bets_lost) * 100) if (bets_won + bets_lost) > 0 else 0, 1)
-    }
+    rollup = await get_user_rollup(db, current_user['user_id'])
+    return format_user_stats(rollup)
 
 
 # ===== SUBSCRIPTION & USAGE ROUTES =====
@@ -1235,7 +1390,7 @@ async def create_subscription_checkout(
             "amount": SUBSCRIPTION_PRICE,
             "currency": "usd",
             "payment_status": "pending",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
         
         return {"url": session.url, "session_id": session.session_id}
@@ -1269,7 +1424,7 @@ async def get_checkout_status(session_id: str, current_user: dict = Depends(get_
                     {"session_id": session_id},
                     {"$set": {
                         "payment_status": "paid",
-                        "paid_at": datetime.now(timezone.utc).isoformat()
+                        "paid_at": datetime.now(timezone.utc)
                     }}
                 )
                 
@@ -1339,6 +1494,44 @@ async def admin_get_stats(admin_user: dict = Depends(get_admin_user)):
     return stats
 
 
+@api_router.get("/admin/calibration")
+async def admin_get_calibration(admin_user: dict = Depends(get_admin_user)):
+    """Reliability of AI win probabilities: overall, per sport, leg count and model"""
+    return await get_calibration_report(db)
+
+
+@api_router.post("/admin/calibration/rebuild")
+async def admin_rebuild_calibration(admin_user: dict = Depends(get_admin_user)):
+    """Recompute calibration rollups from every graded analysis"""
+    slices = await rebuild_calibration(db)
+    return {"message": "Calibration stats rebuilt", "slices": len(slices)}
+
+
+@api_router.get("/admin/probability-calibration")
+async def admin_get_probability_calibration(admin_user: dict = Depends(get_admin_user)):
+    """Which calibration map (if any) is applied to LLM win probabilities"""
+    return calibrator.describe()
+
+
+@api_router.post("/admin/probability-calibration/reload")
+async def admin_reload_probability_calibration(admin_user: dict = Depends(get_admin_user)):
+    """Load a freshly fitted calibration map without restarting"""
+    calibrator.reload()
+    return calibrator.describe()
+
+
+@api_router.get("/admin/llm")
+async def admin_get_llm_gateway(admin_user: dict = Depends(get_admin_user)):
+    """LLM gateway load, circuit breaker state and call counters"""
+    return llm_gateway.describe()
+
+
+@api_router.get("/admin/models")
+async def admin_get_model_routes(admin_user: dict = Depends(get_admin_user)):
+    """Model routes per stage and per-model calls, escalations, latency and cost"""
+    return model_router.describe()
+
+
 @api_router.get("/admin/users")
 async def admin_get_users(
     skip: int = 0,
@@ -1417,33 +1610,45 @@ async def admin_grant_subscription(user_id: str, admin_user: dict = Depends(get_
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    await db.subscriptions.update_one(
+    previous = await db.subscriptions.find_one_and_update(
         {"user_id": user_id},
         {"$set": {
             "user_id": user_id,
             "email": user.get('email', ''),
             "subscription_status": "active",
-            "subscription_start": datetime.now(timezone.utc).isoformat(),
+            "subscription_start": datetime.now(timezone.utc),
             "granted_by_admin": True,
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc)
         }},
+        projection={"_id": 0, "subscription_status": 1},
         upsert=True
     )
+    await increment_admin_stats(
+        db,
+        active_subscribers=subscription_counter_delta(
+            previous.get('subscription_status') if previous else None, "active"
+        )
+    )
     return {"message": f"Pro subscription granted to {user.get('email')}", "success": True}
 
 
 @api_router.post("/admin/users/{user_id}/revoke-subscription")
 async def admin_revoke_subscription(user_id: str, admin_user: dict = Depends(get_admin_user)):
     """Revoke Pro subscription from a user"""
-    result = await db.subscriptions.update_one(
+    previous = await db.subscriptions.find_one_and_update(
         {"user_id": user_id},
         {"$set": {
             "subscription_status": "revoked",
-            "revoked_at": datetime.now(timezone.utc).isoformat(),
+            "revoked_at": datetime.now(timezone.utc),
             "revoked_by_admin": True
-        }}
+        }},
+        projection={"_id": 0, "subscription_status": 1}
     )
-    if result.modified_count > 0:
+    if previous:
+        await increment_admin_stats(
+            db,
+            active_subscribers=subscription_counter_delta(previous.get('subscription_status'), "revoked")
+        )
         return {"message": f"Subscription revoked for user {user_id}", "success": True}
     raise HTTPException(status_code=404, detail="No subscription found")
 
@@ -1455,10 +1660,23 @@ async def admin_delete_user(user_id: str, admin_user: dict = Depends(get_admin_u
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
     # Delete from all collections
-    await db.users.delete_one({"id": user_id})
+    deleted_user = await db.users.find_one_and_delete({"id": user_id}, projection={"_id": 0, "is_banned": 1})
     await db.user_usage.delete_one({"user_id": user_id})
-    await db.subscriptions.delete_one({"user_id": user_id})
-    await db.bet_analyses.delete_many({"user_id": user_id})
+    deleted_subscription = await db.subscriptions.find_one_and_delete(
+        {"user_id": user_id}, projection={"_id": 0, "subscription_status": 1}
+    )
+    deleted_analyses = await db.bet_analyses.delete_many({"user_id": user_id})
+    await db.user_stats.delete_one({"user_id": user_id})
+    
+    await increment_admin_stats(
+        db,
+        total_users=-1 if deleted_user else 0,
+        banned_users=-1 if deleted_user and deleted_user.get('is_banned') else 0,
+        active_subscribers=subscription_counter_delta(
+            deleted_subscription.get('subscription_status') if deleted_subscription else None, None
+        ),
+        total_analyses=-deleted_analyses.deleted_count
+    )
     
     return {"message": f"User {user_id} deleted permanently", "success": True}
 
@@ -1490,32 +1708,16 @@ async def admin_get_top_bets(
 @api_router.get("/admin/top-bets/stats")
 async def admin_get_top_bets_stats(admin_user: dict = Depends(get_admin_user)):
     """Get statistics about top bets"""
-    total_top_bets = await db.top_bets.count_documents({})
-    elite_bets = await db.top_bets.count_documents({"win_probability": {"$gte": 80}})
-    strong_bets = await db.top_bets.count_documents({"win_probability": {"$gte": 70, "$lt": 80}})
-    good_bets = await db.top_bets.count_documents({"win_probability": {"$gte": 60, "$lt": 70}})
-    
-    # Get average probability
-    pipeline = [
-        {"$group": {"_id": None, "avg_probability": {"$avg": "$win_probability"}}}
-    ]
-    avg_result = await db.top_bets.aggregate(pipeline).to_list(1)
-    avg_probability = avg_result[0]["avg_probability"] if avg_result else 0
-    
-    return {
-        "total_top_bets": total_top_bets,
-        "elite_bets_80_plus": elite_bets,
-        "strong_bets_70_79": strong_bets,
-        "good_bets_60_69": good_bets,
-        "average_probability": round(avg_probability, 1) if avg_probability else 0
-    }
+    stats = await get_top_bets_stats(db)
+    return stats
 
 
 @api_router.delete("/admin/top-bets/{bet_id}")
 async def admin_delete_top_bet(bet_id: str, admin_user: dict = Depends(get_admin_user)):
     """Delete a top bet from the collection"""
-    result = await db.top_bets.delete_one({"id": bet_id})
-    if result.deleted_count > 0:
+    deleted = await db.top_bets.find_one_and_delete({"id": bet_id}, projection={"_id": 0, "win_probability": 1})
+    if deleted:
+        await increment_admin_stats(db, **top_bet_counter_deltas(deleted, sign=-1))
         return {"message": f"Top bet {bet_id} deleted", "success": True}
     raise HTTPException(status_code=404, detail="Top bet not found")
 
@@ -1524,6 +1726,17 @@ async def admin_delete_top_bet(bet_id: str, admin_user: dict = Depends(get_admin
 async def admin_clear_top_bets(admin_user: dict = Depends(get_admin_user)):
     """Clear all top bets (use with caution)"""
     result = await db.top_bets.delete_many({})
+    await db.stats.update_one(
+        {"_id": ADMIN_STATS_ID},
+        {"$set": {
+            "total_top_bets": 0,
+            "top_bets_probability_sum": 0,
+            "elite_bets": 0,
+            "strong_bets": 0,
+            "good_bets": 0
+        }},
+        upsert=True
+    )
     return {"message": f"Deleted {result.deleted_count} top bets", "success": True}
 
 
@@ -1560,10 +1773,11 @@ async def admin_create_daily_pick(
         "risk_factors": pick_data.risk_factors or [],
         "game_time": pick_data.game_time,
         "created_by": admin_user['email'],
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": datetime.now(timezone.utc),
         "is_active": True
     }
     await db.daily_picks.insert_one(pick)
+    invalidate_daily_picks_snapshot()
     return {"message": "Daily pick created", "pick": {k: v for k, v in pick.items() if k != '_id'}}
 
 
@@ -1591,7 +1805,7 @@ async def admin_update_daily_pick(
 ):
     """Update a daily pick"""
     update_data = pick_data.model_dump()
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     update_data["updated_by"] = admin_user['email']
     
     result = await db.daily_picks.update_one(
@@ -1600,6 +1814,7 @@ async def admin_update_daily_pick(
     )
     
     if result.modified_count > 0:
+        invalidate_daily_picks_snapshot()
         return {"message": "Daily pick updated", "success": True}
     raise HTTPException(status_code=404, detail="Pick not found")
 
@@ -1612,6 +1827,7 @@ async def admin_delete_daily_pick(
     """Delete a daily pick"""
     result = await db.daily_picks.delete_one({"id": pick_id})
     if result.deleted_count > 0:
+        invalidate_daily_picks_snapshot()
         return {"message": "Daily pick deleted", "success": True}
     raise HTTPException(status_code=404, detail="Pick not found")
 
@@ -1631,46 +1847,44 @@ async def admin_toggle_daily_pick(
         {"id": pick_id},
         {"$set": {"is_active": new_status}}
     )
+    invalidate_daily_picks_snapshot()
     return {"message": f"Pick {'activated' if new_status else 'deactivated'}", "is_active": new_status}
 
 
 # ===== AUTO-GENERATE DAILY PICKS =====
 
+# Sports considered for auto-generated picks
+PICK_SPORTS = [
+    'americanfootball_nfl',
+    'basketball_nba', 
+    'baseball_mlb',
+    'icehockey_nhl'
+]
+
+# How many pre-ranked games are sent to the picks LLM call
+PICKS_CANDIDATE_GAMES = int(os.environ.get('PICKS_CANDIDATE_GAMES', '12'))
+
+
 async def fetch_upcoming_games():
-    """Fetch upcoming games from The Odds API"""
-    ODDS_API_KEY = os.environ.get('ODDS_API_KEY', '')
-    if not ODDS_API_KEY:
-        return []
-    
-    sports = [
-        'americanfootball_nfl',
-        'basketball_nba', 
-        'baseball_mlb',
-        'icehockey_nhl'
-    ]
+    """
+    Fetch upcoming games for all pick sports concurrently.
+    Goes through SportsDataService so odds already cached for analyses are reused.
+    """
+    results = await asyncio.gather(
+        *(SportsDataService.get_live_odds(sport) for sport in PICK_SPORTS),
+        return_exceptions=True
+    )
     
     all_games = []
-    
-    async with aiohttp.ClientSession() as session:
-        for sport in sports:
-            try:
-                url = f"https://api.the-odds-api.com/v4/sports/{sport}/odds"
-                params = {
-                    'apiKey': ODDS_API_KEY,
-                    'regions': 'us',
-                    'markets': 'spreads,h2h,totals',
-                    'oddsFormat': 'american'
-                }
-                
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=15)) as response:
-                    if response.status == 200:
-                        games = await response.json()
-                        for game in games[:5]:  # Limit to 5 games per sport
-                            game['sport_key'] = sport
-                            all_games.append(game)
-            except Exception as e:
-                logging.error(f"Error fetching {sport} odds: {e}")
-                continue
+    for sport, games in zip(PICK_SPORTS, results):
+        if isinstance(games, Exception):
+            logging.error(f"Error fetching {sport} odds: {games}")
+            continue
+        if not games:
+            continue
+        for game in games:
+            # Copy so the cached payload is not mutated
+            all_games.append({**game, 'sport_key': sport})
     
     return all_games
 
@@ -1680,34 +1894,28 @@ async def analyze_games_with_ai(games: list) -> list:
     if not games:
         return []
     
+    # Deterministic pre-rank on market prices so only the strongest candidates reach the prompt
+    ranked_games = rank_games(games, top_k=PICKS_CANDIDATE_GAMES)
+    if not ranked_games:
+        return []
+    
     # Format games for AI analysis
     games_text = ""
-    for i, game in enumerate(games):
+    for i, (game, summary) in enumerate(ranked_games):
         sport = game.get('sport_key', '').replace('_', ' ').title()
         home = game.get('home_team', 'Unknown')
         away = game.get('away_team', 'Unknown')
         commence = game.get('commence_time', '')
         
-        # Get odds
-        spreads = ""
-        moneyline = ""
-        for bookmaker in game.get('bookmakers', [])[:1]:
-            for market in bookmaker.get('markets', []):
-                if market['key'] == 'spreads':
-                    for outcome in market.get('outcomes', []):
-                        if outcome['name'] == home:
-                            spreads = f"{home} {outcome.get('point', '')} ({outcome.get('price', '')})"
-                elif market['key'] == 'h2h':
-                    for outcome in market.get('outcomes', []):
-                        if outcome['name'] == home:
-                            moneyline = f"{home} ML ({outcome.get('price', '')})"
-        
         games_text += f"\n{i+1}. {sport}: {away} @ {home}"
         games_text += f"\n   Time: {commence}"
-        if spreads:
-            games_text += f"\n   Spread: {spreads}"
-        if moneyline:
-            games_text += f"\n   Moneyline: {moneyline}"
+        # Consensus no-vig pricing across all books, per market
+        for line in format_pricing_context(summary['pricing']):
+            games_text += f"\n {line}"
+        games_text += (
+            f"\n   Best moneyline value: {summary['best_team']} {summary['best_price']:.2f} (decimal) at {summary['best_book']}, "
+            f"edge vs consensus {summary['best_edge']:+.1f}%, book disagreement {summary['dispersion']:.1f}%"
+        )
         games_text += "\n"
     
     # AI prompt to analyze and pick best 3
@@ -1724,6 +1932,7 @@ For each of your top 3 picks, provide:
 5. 1-2 risk factors to watch
 
 IMPORTANT: 
+- Games are pre-ranked by market value; the no-vig consensus is the market's fair probability
 - Be realistic with probabilities (most good bets are 55-70%)
 - Only pick bets you genuinely think have edge
 - Consider home/away, recent form, injuries, matchups
@@ -1748,14 +1957,13 @@ Respond in this exact JSON format:
 }}"""
 
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"auto_picks_{uuid.uuid4()}",
-            system_message="You are an elite sports betting analyst. Analyze games and provide the best betting picks with realistic probabilities."
-        )
-        
         msg = UserMessage(text=prompt)
-        response = await chat.send_message(msg)
+        reply = await model_router.call(
+            'picks', msg,
+            system_message="You are an elite sports betting analyst. Analyze games and provide the best betting picks with realistic probabilities.",
+            session_prefix="auto_picks"
+        )
+        response = reply.text
         
         # Parse JSON from response
         response_text = response
@@ -1774,9 +1982,22 @@ Respond in this exact JSON format:
 
 async def auto_generate_daily_picks():
     """Auto-generate daily picks using real odds and AI analysis"""
+    # Only one worker may generate at a time, otherwise concurrent triggers insert duplicate picks
+    async with mongo_lock(db, "generate_daily_picks", DAILY_PICKS_LOCK_TTL) as acquired:
+        if not acquired:
+            return {"message": "Pick generation already in progress", "generated": False}
+        result = await _generate_daily_picks()
+    
+    if result.get("generated"):
+        invalidate_daily_picks_snapshot()
+    return result
+
+
+async def _generate_daily_picks():
+    """Fetch games, ask the AI for the best picks and store them. Call under the generation lock."""
     try:
         # Check if we already have recent picks (within last 20 hours)
-        twenty_hours_ago = (datetime.now(timezone.utc) - timedelta(hours=20)).isoformat()
+        twenty_hours_ago = datetime.now(timezone.utc) - timedelta(hours=20)
         recent_picks = await db.daily_picks.count_documents({
             "is_active": True,
             "created_at": {"$gte": twenty_hours_ago},
@@ -1786,43 +2007,20 @@ async def auto_generate_daily_picks():
         if recent_picks >= 3:
             return {"message": "Recent picks already exist", "generated": False}
         
-        # Fetch upcoming games
-        games = await fetch_upcoming_games()
+        # Only the upstream calls are bounded, below the lock TTL so the lock cannot
+        # expire under a running generation; a timeout leaves the current picks alone
+        try:
+            games, ai_picks = await asyncio.wait_for(_fetch_ai_picks(), DAILY_PICKS_TIMEOUT.total_seconds())
+        except asyncio.TimeoutError:
+            logging.error("Pick generation timed out")
+            return {"message": "Pick generation timed out", "generated": False}
         if not games:
             return {"message": "No upcoming games found", "generated": False}
-        
-        # Analyze with AI
-        ai_picks = await analyze_games_with_ai(games)
         if not ai_picks:
             return {"message": "AI analysis failed", "generated": False}
         
-        # Deactivate old auto-generated picks
-        await db.daily_picks.update_many(
-            {"auto_generated": True},
-            {"$set": {"is_active": False}}
-        )
-        
-        # Create new picks
-        created_picks = []
-        for pick in ai_picks[:3]:  # Only top 3
-            new_pick = {
-                "id": str(uuid.uuid4()),
-                "title": pick.get('title', 'Unknown Bet'),
-                "description": pick.get('description', ''),
-                "win_probability": float(pick.get('win_probability', 60)),
-                "odds": str(pick.get('odds', '-110')),
-                "sport": pick.get('sport', 'NFL'),
-                "confidence": int(pick.get('confidence', 7)),
-                "reasoning": pick.get('reasoning', []),
-                "risk_factors": pick.get('risk_factors', []),
-                "game_time": pick.get('game_time', 'TBD'),
-                "created_by": "AI Auto-Generator",
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "is_active": True,
-                "auto_generated": True
-            }
-            await db.daily_picks.insert_one(new_pick)
-            created_picks.append(new_pick['title'])
+        # Shielded: a cancelled caller must not stop the swap halfway
+        created_picks = await asyncio.shield(_store_daily_picks(ai_picks[:3]))  # Only top 3
         
         return {
             "message": f"Generated {len(created_picks)} new picks",
@@ -1835,6 +2033,47 @@ async def auto_generate_daily_picks():
         return {"message": f"Error: {str(e)}", "generated": False}
 
 
+async def _fetch_ai_picks():
+    """Upcoming games and the AI's picks for them; (games, None) when there are no games to analyze"""
+    games = await fetch_upcoming_games()
+    if not games:
+        return games, None
+    return games, await analyze_games_with_ai(games)
+
+
+async def _store_daily_picks(ai_picks: List[dict]) -> List[str]:
+    """
+    Insert the new picks, then deactivate the older auto-generated ones, so the
+    board is never empty in between. Returns the new picks' titles.
+    """
+    new_picks = []
+    for pick in ai_picks:
+        new_pick = {
+            "id": str(uuid.uuid4()),
+            "title": pick.get('title', 'Unknown Bet'),
+            "description": pick.get('description', ''),
+            "win_probability": float(pick.get('win_probability', 60)),
+            "odds": str(pick.get('odds', '-110')),
+            "sport": pick.get('sport', 'NFL'),
+            "confidence": int(pick.get('confidence', 7)),
+            "reasoning": pick.get('reasoning', []),
+            "risk_factors": pick.get('risk_factors', []),
+            "game_time": pick.get('game_time', 'TBD'),
+            "created_by": "AI Auto-Generator",
+            "created_at": datetime.now(timezone.utc),
+            "is_active": True,
+            "auto_generated": True
+        }
+        new_picks.append(new_pick)
+    
+    await db.daily_picks.insert_many(new_picks)
+    await db.daily_picks.update_many(
+        {"auto_generated": True, "id": {"$nin": [pick['id'] for pick in new_picks]}},
+        {"$set": {"is_active": False}}
+    )
+    return [pick['title'] for pick in new_picks]
+
+
 @api_router.post("/admin/generate-picks")
 async def trigger_auto_generate_picks(admin_user: dict = Depends(get_admin_user)):
     """Manually trigger auto-generation of daily picks (admin only)"""
@@ -1861,30 +2100,174 @@ async def cron_generate_picks(request: Request):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-# Auto-check and generate picks when fetching daily picks
+# ===== DAILY PICKS SNAPSHOT =====
+# Public picks are served from an in-process snapshot; regeneration never runs on the request path
+DAILY_PICKS_SNAPSHOT_TTL = timedelta(seconds=int(os.environ.get('DAILY_PICKS_SNAPSHOT_SECONDS', '60')))
+DAILY_PICKS_LOCK_TTL = timedelta(minutes=5)
+DAILY_PICKS_TIMEOUT = timedelta(minutes=4)
+
+_daily_picks_snapshot = {"body": None, "etag": None, "loaded_at": None, "needs_generation": False}
+_daily_picks_snapshot_lock = asyncio.Lock()
+_daily_picks_regeneration: Optional[asyncio.Task] = None
+
+
+def invalidate_daily_picks_snapshot():
+    """Force the next /daily-picks request to reload from the database"""
+    _daily_picks_snapshot["loaded_at"] = None
+
+
+async def load_daily_picks_snapshot() -> dict:
+    """Return the current picks snapshot, reloading it if stale (one reload per process at a time)"""
+    now = datetime.now(timezone.utc)
+    loaded_at = _daily_picks_snapshot["loaded_at"]
+    if loaded_at and now - loaded_at < DAILY_PICKS_SNAPSHOT_TTL:
+        return _daily_picks_snapshot
+    
+    async with _daily_picks_snapshot_lock:
+        # Another request may have reloaded while we waited
+        loaded_at = _daily_picks_snapshot["loaded_at"]
+        if loaded_at and now - loaded_at < DAILY_PICKS_SNAPSHOT_TTL:
+            return _daily_picks_snapshot
+        
+        picks = await db.daily_picks.find(
+            {"is_active": True},
+            {"_id": 0}
+        ).sort("win_probability", -1).limit(3).to_list(3)
+        
+        # Only an empty board triggers generation: a short AI result or admin-only
+        # picks must not re-run it (Odds API quota + an LLM call) on every reload
+        has_recent = await db.daily_picks.count_documents({
+            "is_active": True,
+            "created_at": {"$gte": now - timedelta(hours=20)}
+        }, limit=1) > 0
+        
+        body = json.dumps(jsonable_encoder({"picks": picks, "count": len(picks)})).encode('utf-8')
+        _daily_picks_snapshot.update({
+            "body": body,
+            "etag": f'"{hashlib.md5(body).hexdigest()}"',
+            "loaded_at": now,
+            "needs_generation": not has_recent
+        })
+    return _daily_picks_snapshot
+
+
+async def _regenerate_daily_picks():
+    """Background task: generate picks (lock-protected) and refresh the snapshot"""
+    try:
+        result = await auto_generate_daily_picks()
+        logging.info(f"Background pick generation: {result.get('message')}")
+    except Exception as e:
+        logging.error(f"Background pick generation failed: {e}")
+
+
+def schedule_daily_picks_regeneration():
+    """Start background generation unless this process already has one running"""
+    global _daily_picks_regeneration
+    # One attempt per snapshot: the flag is re-evaluated on the next reload
+    _daily_picks_snapshot["needs_generation"] = False
+    if _daily_picks_regeneration is None or _daily_picks_regeneration.done():
+        _daily_picks_regeneration = asyncio.create_task(_regenerate_daily_picks())
+
+
 @api_router.get("/daily-picks")
-async def get_daily_picks_with_auto_generate():
-    """Get active daily picks - auto-generates if needed"""
-    # Check if we need to auto-generate
-    twenty_hours_ago = (datetime.now(timezone.utc) - timedelta(hours=20)).isoformat()
-    
-    active_recent_picks = await db.daily_picks.count_documents({
-        "is_active": True,
-        "created_at": {"$gte": twenty_hours_ago}
-    })
-    
-    # If no recent picks, try to auto-generate
-    if active_recent_picks == 0:
-        logging.info("No recent picks found, attempting auto-generation...")
-        await auto_generate_daily_picks()
-    
-    # Fetch active picks
-    picks = await db.daily_picks.find(
-        {"is_active": True},
-        {"_id": 0}
-    ).sort("win_probability", -1).limit(3).to_list(3)
+async def get_daily_picks_with_auto_generate(request: Request):
+    """Get active daily picks - schedules background generation if they are stale"""
+    snapshot = await load_daily_picks_snapshot()
+    
+    if snapshot["needs_generation"]:
+        logging.info("No recent picks found, scheduling background generation...")
+        schedule_daily_picks_regeneration()
     
-    return {"picks": picks, "count": len(picks)}
+    headers = {
+        "ETag": snapshot["etag"],
+        "Cache-Control": f"public, max-age={int(DAILY_PICKS_SNAPSHOT_TTL.total_seconds())}"
+    }
+    if request.headers.get("if-none-match") == snapshot["etag"]:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+
+
+# ===== BACKGROUND SCHEDULER =====
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+# Per-worker live scoreboard feed; not leader-gated since every worker serves requests
+SCOREBOARD_POLLER_ENABLED = os.environ.get('SCOREBOARD_POLLER_ENABLED', 'true').lower() == 'true'
+
+scheduler = Scheduler(db)
+
+
+async def job_generate_picks():
+    return await auto_generate_daily_picks()
+
+
+async def job_warm_odds():
+    # Runs shortly before pick generation so it reads odds from the cache
+    return {"games": await SportsDataService.warm_odds_cache(PICK_SPORTS)}
+
+
+async def job_refresh_injuries():
+    return {"teams_refreshed": await InjuryWeatherService.refresh_cached_injuries()}
+
+
+async def job_cleanup_caches():
+    return {
+        "sports_entries_removed": SportsDataService.prune_cache(),
+        "injury_entries_removed": InjuryWeatherService.prune_cache(),
+        "game_context_entries_removed": prune_context_cache()
+    }
+
+
+async def job_rebuild_calibration():
+    slices = await rebuild_calibration(db)
+    return {"slices": len(slices)}
+
+
+async def job_settle_outcomes():
+    return await settle_pending_outcomes(db)
+
+
+async def job_rebuild_admin_stats():
+    counters = await rebuild_admin_stats(db)
+    return {"total_users": counters["total_users"], "total_analyses": counters["total_analyses"]}
+
+
+scheduler.add_job("generate_picks", os.environ.get('PICKS_CRON', '0 14 * * *'), job_generate_picks, jitter_seconds=60,
+                  timeout_seconds=DAILY_PICKS_LOCK_TTL.total_seconds())
+# Odds, injuries and cache pruning only touch this process's caches: every worker runs them
+scheduler.add_job("warm_odds", os.environ.get('ODDS_WARMUP_CRON', '56 13 * * *'), job_warm_odds, jitter_seconds=30,
+                  leader_only=False)
+scheduler.add_job("refresh_injuries", os.environ.get('INJURY_REFRESH_CRON', '0 */6 * * *'), job_refresh_injuries,
+                  leader_only=False)
+scheduler.add_job("cleanup_caches", os.environ.get('CACHE_CLEANUP_CRON', '*/15 * * * *'), job_cleanup_caches, jitter_seconds=10,
+                  leader_only=False)
+scheduler.add_job("rebuild_admin_stats", os.environ.get('ADMIN_STATS_CRON', '30 */6 * * *'), job_rebuild_admin_stats)
+scheduler.add_job("rebuild_calibration", os.environ.get('CALIBRATION_REBUILD_CRON', '15 4 * * *'), job_rebuild_calibration)
+scheduler.add_job("settle_outcomes", os.environ.get('SETTLEMENT_CRON', '*/30 * * * *'), job_settle_outcomes, jitter_seconds=30)
+
+
+@api_router.get("/admin/scheduler")
+async def admin_get_scheduler(limit: int = 50, admin_user: dict = Depends(get_admin_user)):
+    """Scheduled jobs and their recent runs"""
+    runs = await db.scheduler_runs.find(
+        {},
+        {"_id": 0}
+    ).sort("started_at", -1).limit(limit).to_list(limit)
+    return {
+        "enabled": SCHEDULER_ENABLED,
+        "is_leader": scheduler.is_leader,
+        "jobs": scheduler.describe(),
+        "scoreboard": scoreboard.describe() if SCOREBOARD_POLLER_ENABLED else None,
+        "runs": runs
+    }
+
+
+@api_router.post("/admin/scheduler/{job_name}/run")
+async def admin_run_scheduled_job(job_name: str, admin_user: dict = Depends(get_admin_user)):
+    """Run a scheduled job immediately"""
+    if job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    run = await scheduler.run_job(job_name)
+    return {"job": job_name, "status": run["status"], "result": run.get("result"), "error": run.get("error")}
 
 
 @api_router.get("/")
@@ -1923,6 +2306,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_indexes():
+    """Create the indexes the hot query paths rely on; one failing index never skips the others"""
+    index_builds = [
+        ("bet_analyses history", lambda: db.bet_analyses.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])),
+        ("bet_analyses id", lambda: db.bet_analyses.create_index("id")),
+        ("daily_picks", lambda: db.daily_picks.create_index([("is_active", 1), ("created_at", -1)])),
+        ("locks", lambda: ensure_lock_indexes(db)),
+        ("scheduler_runs", lambda: ensure_scheduler_indexes(db)),
+        ("settlement", lambda: ensure_settlement_indexes(db)),
+        # TTL indexes - only valid on BSON date fields
+        ("top_bets TTL", lambda: db.top_bets.create_index(
+            "created_at",
+            expireAfterSeconds=TOP_BETS_TTL_DAYS * 24 * 3600
+        )),
+        ("payment_transactions TTL", lambda: db.payment_transactions.create_index(
+            "created_at",
+            expireAfterSeconds=PENDING_PAYMENT_TTL_DAYS * 24 * 3600,
+            partialFilterExpression={"payment_status": "pending"}
+        )),
+    ]
+    for name, build in index_builds:
+        try:
+            await build()
+        except Exception as e:
+            logger.error(f"Error creating {name} index: {str(e)}")
+
+@app.on_event("startup")
+async def load_prompt_tokenizer():
+    # Off the request path: the first /api/analyze must not wait on a tokenizer download
+    await load_tokenizer()
+
+@app.on_event("startup")
+async def start_replay():
+    # REPLAY_MODE=record saves upstream HTTP / LLM traffic as fixtures for offline runs (replay_harness.py)
+    install_replay()
+
+@app.on_event("startup")
+async def start_scheduler():
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    if SCOREBOARD_POLLER_ENABLED:
+        scoreboard.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await scheduler.stop()
+    await scoreboard.stop()
+    if _simulation_pool is not None:
+        _simulation_pool.shutdown(wait=False, cancel_futures=True)
     client.close()
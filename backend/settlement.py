@@ -0,0 +1,362 @@
+"""
+Automatic outcome settlement from ESPN final scores
+- Pulls pending analyses in batches and works out each leg's team, market and line
+- Groups legs by team: one schedule fetch per team per run, never per slip
+- Grades moneyline, spread and total legs from final scores; a leg without a
+  known start time is only graded when one game of its team fits the slip
+- Only legs whose sport is known to be NFL/NBA (the priced game, or the leg's own
+  sport) are graded, and their team is looked up in that league's table only;
+  slips with no gradable leg (MLB, NHL, props, unknown sport) are marked skipped
+  once instead of retried for 14 days
+- Writes outcomes with bulk updates and applies user/calibration rollup deltas in aggregate
+"""
+
+import asyncio
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+from calibration import CALIBRATION_PROJECTION, calibration_delta, merge_calibration_deltas, apply_calibration_delta
+from leg_pricing import parse_leg, sport_hint
+from sports_data_service import SportsDataService, TeamSchedule, ScheduleEvent, ESPN_NFL_TEAMS, ESPN_NBA_TEAMS
+from user_stats import ROLLUP_PROJECTION, user_stats_delta, apply_user_stats_delta
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENT_BATCH_SIZE = 1000
+SETTLEMENT_MAX_BATCHES = 10
+SETTLEMENT_LOOKBACK = timedelta(days=14)
+# Don't look at slips younger than this, their games can't be final yet
+SETTLEMENT_MIN_AGE = timedelta(hours=3)
+# Slips that couldn't be settled are retried after this long
+SETTLEMENT_RETRY_AFTER = timedelta(hours=3)
+# Concurrent ESPN schedule fetches
+SCHEDULE_FETCH_CONCURRENCY = 8
+
+# A slip uploaded shortly after kickoff still refers to that game
+GAME_MATCH_SLACK = timedelta(hours=12)
+# Without a start time a leg refers to its team's only game in this window around placement
+UNTIMED_MATCH_BEFORE = timedelta(hours=6)
+UNTIMED_MATCH_AFTER = timedelta(hours=36)
+
+PENDING_OUTCOMES = [None, "pending"]
+
+# Odds API sport key -> ESPN league and its team table; other sports are never graded
+SETTLEMENT_LEAGUES = {
+    'americanfootball_nfl': ('nfl', 'football', ESPN_NFL_TEAMS),
+    'basketball_nba': ('nba', 'basketball', ESPN_NBA_TEAMS)
+}
+
+SETTLEMENT_PROJECTION = {
+    # Whole legs are fetched below; a sub-path next to them is a projection path collision
+    **{name: value for name, value in {**ROLLUP_PROJECTION, **CALIBRATION_PROJECTION}.items()
+       if not name.startswith("individual_bets.")},
+    "id": 1,
+    "user_id": 1,
+    "created_at": 1,
+    "actual_outcome": 1,
+    "individual_bets": 1,
+    "market_pricing.legs": 1
+}
+
+
+# ===== LEG SPECS =====
+
+def _find_team(text: str, sport: str) -> Optional[dict]:
+    """
+    ESPN team info for the first nickname of `sport`'s league named in `text`.
+    Whole words only, and never another league's table: "Giants" in an MLB leg
+    must not become the NFL Giants.
+    """
+    league, sport_name, teams = SETTLEMENT_LEAGUES[sport]
+    text = text.lower()
+    best = None
+    for key, info in teams.items():
+        match = re.search(rf'\b{re.escape(key)}\b', text)
+        if match and (best is None or match.start() < best[0]):
+            best = (match.start(), info)
+    if not best:
+        return None
+    info = best[1]
+    return {'id': info['id'], 'name': info['name'], 'league': league, 'sport': sport_name}
+
+
+def leg_spec(bet: dict, priced: Optional[dict]) -> Optional[dict]:
+    """
+    Team, market and line for one leg, preferring the structured market match
+    recorded at analysis time. None if the leg can't be graded from scores,
+    including any leg whose sport isn't known to be NFL or NBA.
+    """
+    if priced and priced.get('game') and priced.get('market'):
+        sport = priced.get('sport') or sport_hint(bet)
+        if sport not in SETTLEMENT_LEAGUES:
+            return None
+        away, _, home = priced['game'].partition(' @ ')
+        market = priced['market']
+        team = home if market == 'totals' else priced.get('selection')
+        info = _find_team(team or '', sport)
+        if not info:
+            return None
+        return {
+            'team': info,
+            'opponent': away if team == home else home,
+            'market': market,
+            'line': priced.get('line'),
+            'side': priced.get('selection') if market == 'totals' else None,
+            'commence_time': priced.get('commence_time')
+        }
+
+    sport = sport_hint(bet)
+    if sport not in SETTLEMENT_LEAGUES:
+        return None
+    description = bet.get('description') or ''
+    parsed = parse_leg(description)
+    info = _find_team(description, sport)
+    if not parsed or not info:
+        return None
+    return {
+        'team': info,
+        'opponent': None,
+        'market': parsed['market'],
+        'line': parsed['line'],
+        'side': parsed['side'],
+        'commence_time': None
+    }
+
+
+# ===== SCHEDULES =====
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def fetch_schedules(team_infos: Dict[str, dict]) -> Dict[str, Optional[TeamSchedule]]:
+    """One schedule per distinct team, limited concurrency (shared with the analysis cache)"""
+    semaphore = asyncio.Semaphore(SCHEDULE_FETCH_CONCURRENCY)
+
+    async def fetch(key: str, info: dict):
+        async with semaphore:
+            return key, await SportsDataService.get_team_schedule(info)
+
+    results = await asyncio.gather(*(fetch(key, info) for key, info in team_infos.items()))
+    return dict(results)
+
+
+def find_event(schedule: TeamSchedule, spec: dict, placed_at: datetime) -> Optional[ScheduleEvent]:
+    """
+    The game a leg refers to: the one at its known start time, else the team's
+    only game close to when the slip was placed. None when that is ambiguous
+    (back-to-backs, a slip placed days ahead) - the leg stays pending.
+    """
+    commence = _parse_date(spec.get('commence_time'))
+    candidates = []
+    for event in schedule.events:
+        if spec.get('opponent') and not any(
+            _same_team(spec['opponent'], side.name) for side in (event.home, event.away)
+        ):
+            continue
+        if commence:
+            if abs(event.date - commence) <= GAME_MATCH_SLACK:
+                return event
+        elif placed_at - UNTIMED_MATCH_BEFORE <= event.date <= placed_at + UNTIMED_MATCH_AFTER:
+            candidates.append(event)
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def _same_team(a: str, b: str) -> bool:
+    a, b = a.lower(), b.lower()
+    return a in b or b in a or a.split()[-1] == b.split()[-1]
+
+
+# ===== GRADING =====
+
+def grade_leg(spec: dict, event: ScheduleEvent, team_name: str) -> Optional[str]:
+    """'won' / 'lost' / 'push' for a leg from a final score, None if not gradable yet"""
+    if not event.completed or not event.involves(team_name):
+        return None
+    ours, theirs = event.sides(team_name)
+    if ours.score is None or theirs.score is None:
+        return None
+
+    if spec['market'] == 'h2h':
+        margin = ours.score - theirs.score
+    elif spec['market'] == 'spreads':
+        if spec.get('line') is None:
+            return None
+        margin = ours.score + spec['line'] - theirs.score
+    elif spec['market'] == 'totals':
+        if spec.get('line') is None or spec.get('side') not in ('Over', 'Under'):
+            return None
+        total = ours.score + theirs.score
+        margin = total - spec['line'] if spec['side'] == 'Over' else spec['line'] - total
+    else:
+        return None
+
+    if margin > 0:
+        return 'won'
+    if margin < 0:
+        return 'lost'
+    return 'push'
+
+
+def slip_outcome(leg_results: List[Optional[str]]) -> Optional[str]:
+    """Parlay rules: any loss loses, pushes drop out, all pushes refund; None while undecided"""
+    if 'lost' in leg_results:
+        return 'lost'
+    if not leg_results or None in leg_results:
+        return None
+    return 'push' if all(result == 'push' for result in leg_results) else 'won'
+
+
+# ===== WORKER =====
+
+async def _pending_batch(db, now: datetime, after_id: Optional[str]) -> List[dict]:
+    query = {
+        "actual_outcome": {"$in": PENDING_OUTCOMES},
+        "created_at": {"$gte": now - SETTLEMENT_LOOKBACK, "$lte": now - SETTLEMENT_MIN_AGE},
+        "settlement_skipped": {"$exists": False},
+        "$or": [
+            {"settlement_checked_at": {"$exists": False}},
+            {"settlement_checked_at": {"$lte": now - SETTLEMENT_RETRY_AFTER}}
+        ]
+    }
+    if after_id:
+        query["id"] = {"$gt": after_id}
+    return await db.bet_analyses.find(query, SETTLEMENT_PROJECTION).sort("id", 1).limit(SETTLEMENT_BATCH_SIZE).to_list(SETTLEMENT_BATCH_SIZE)
+
+
+async def settle_batch(db, analyses: List[dict], now: datetime) -> Dict[str, int]:
+    """Grade one batch of pending analyses and write the results"""
+    # 1. Work out what every leg needs, grouped by team
+    slips = []
+    skipped_ids = []
+    team_infos: Dict[str, dict] = {}
+    for analysis in analyses:
+        bets = analysis.get('individual_bets') or []
+        priced = (analysis.get('market_pricing') or {}).get('legs') or []
+        legs = []
+        for i, bet in enumerate(bets):
+            spec = leg_spec(bet, priced[i] if i < len(priced) else None)
+            if spec:
+                info = spec['team']
+                key = f"{info['league']}:{info['id']}"
+                team_infos[key] = info
+                legs.append((spec, key))
+            else:
+                legs.append((None, None))
+        if any(key for _, key in legs):
+            slips.append((analysis, legs))
+        else:
+            # No NFL/NBA leg with a known team and a gradable market: retrying can't help
+            skipped_ids.append(analysis['id'])
+
+    # 2. One schedule per team for the whole batch
+    schedules = await fetch_schedules(team_infos)
+
+    # 3. Grade
+    operations = []
+    user_deltas: Dict[str, Dict[str, float]] = {}
+    calibration_deltas = []
+    settled_ids = []
+    unsettled_ids = []
+    for analysis, legs in slips:
+        placed_at = analysis.get('created_at') or now
+        leg_results = []
+        for spec, key in legs:
+            if not spec:
+                leg_results.append(None)
+                continue
+            schedule = schedules.get(key)
+            event = find_event(schedule, spec, placed_at) if schedule else None
+            leg_results.append(grade_leg(spec, event, schedule.team_name) if event else None)
+
+        outcome = slip_outcome(leg_results)
+        if outcome is None:
+            unsettled_ids.append(analysis['id'])
+            continue
+
+        update = {
+            "actual_outcome": outcome,
+            "outcome_marked_at": now,
+            "settled_by": "auto",
+            "leg_results": leg_results
+        }
+        operations.append(UpdateOne(
+            {"id": analysis['id'], "actual_outcome": {"$in": PENDING_OUTCOMES}},
+            {"$set": update}
+        ))
+        settled_ids.append(analysis['id'])
+
+        after = {**analysis, **update}
+        delta = user_stats_delta(analysis, after)
+        totals = user_deltas.setdefault(analysis['user_id'], {})
+        for counter, value in delta.items():
+            totals[counter] = totals.get(counter, 0) + value
+        calibration_deltas.append(calibration_delta(analysis, after))
+
+    # 4. Bulk writes, then rollups in aggregate
+    modified = 0
+    if operations:
+        result = await db.bet_analyses.bulk_write(operations, ordered=False)
+        modified = result.modified_count
+    if unsettled_ids:
+        await db.bet_analyses.update_many(
+            {"id": {"$in": unsettled_ids}},
+            {"$set": {"settlement_checked_at": now}, "$inc": {"settlement_attempts": 1}}
+        )
+    if skipped_ids:
+        await db.bet_analyses.update_many(
+            {"id": {"$in": skipped_ids}},
+            {"$set": {"settlement_checked_at": now, "settlement_skipped": "unsupported"}}
+        )
+
+    if modified == len(operations):
+        for user_id, delta in user_deltas.items():
+            await apply_user_stats_delta(db, user_id, delta)
+        await apply_calibration_delta(db, merge_calibration_deltas(calibration_deltas))
+    else:
+        # Someone marked a slip by hand mid-run: deltas can't be trusted, rebuild instead
+        logger.warning(f"Settlement raced with manual marking ({modified}/{len(operations)} written), scheduling rollup rebuilds")
+        await db.user_stats.update_many(
+            {"user_id": {"$in": list(user_deltas.keys())}},
+            {"$unset": {"rebuilt_at": ""}}
+        )
+        await db.calibration_stats.update_one({"_id": "overall"}, {"$unset": {"rebuilt_at": ""}})
+
+    return {
+        "checked": len(analyses),
+        "settled": modified,
+        "unsettled": len(unsettled_ids),
+        "skipped": len(skipped_ids),
+        "schedules_fetched": len(team_infos)
+    }
+
+
+async def settle_pending_outcomes(db) -> Dict[str, int]:
+    """Scheduler entry point: settle pending slips in batches"""
+    now = datetime.now(timezone.utc)
+    totals = {"checked": 0, "settled": 0, "unsettled": 0, "skipped": 0, "schedules_fetched": 0}
+    after_id = None
+    for _ in range(SETTLEMENT_MAX_BATCHES):
+        analyses = await _pending_batch(db, now, after_id)
+        if not analyses:
+            break
+        result = await settle_batch(db, analyses, now)
+        for key, value in result.items():
+            totals[key] += value
+        after_id = analyses[-1]['id']
+    logger.info(f"Settlement run: {totals}")
+    return totals
+
+
+async def ensure_settlement_indexes(db):
+    await db.bet_analyses.create_index([("actual_outcome", 1), ("created_at", 1)])
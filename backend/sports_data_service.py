@@ -1,13 +1,17 @@
 import os
+import asyncio
 import aiohttp
 import logging
-from typing import Dict, Optional, List
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, List, Tuple
 from datetime import datetime, timezone, timedelta
 import json
 import re
 from dotenv import load_dotenv
 from pathlib import Path
 
+from pricing_engine import price_games, format_pricing_context
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -17,6 +21,9 @@ logger = logging.getLogger(__name__)
 # The Odds API configuration
 ODDS_API_KEY = os.environ.get('ODDS_API_KEY', '')
 ODDS_API_BASE = 'https://api.the-odds-api.com/v4'
+# Odds feeds searched for a slip's games, in order
+MARKET_SPORTS = ['americanfootball_nfl', 'basketball_nba', 'baseball_mlb']
+LEAGUE_ODDS_SPORTS = {'nfl': 'americanfootball_nfl', 'nba': 'basketball_nba'}
 
 # ESPN API base
 ESPN_API_BASE = 'https://site.api.espn.com/apis/site/v2/sports'
@@ -25,6 +32,15 @@ ESPN_API_BASE = 'https://site.api.espn.com/apis/site/v2/sports'
 _cache = {}
 CACHE_DURATION = timedelta(minutes=5)  # Cache for 5 minutes
 
+# One in-flight fetch per cache key, so concurrent callers share a single upstream request
+_fetch_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _fetch_lock(cache_key: str) -> asyncio.Lock:
+    if cache_key not in _fetch_locks:
+        _fetch_locks[cache_key] = asyncio.Lock()
+    return _fetch_locks[cache_key]
+
 # Team ID mappings for ESPN API
 ESPN_NFL_TEAMS = {
     'chiefs': {'id': '12', 'name': 'Kansas City Chiefs'},
@@ -88,6 +104,127 @@ ESPN_NBA_TEAMS = {
 }
 
 
+# ===== SCHEDULE MODEL =====
+
+@dataclass(slots=True, frozen=True)
+class Competitor:
+    name: str
+    score: Optional[int]
+    winner: bool
+
+
+@dataclass(slots=True, frozen=True)
+class ScheduleEvent:
+    """One ESPN game, from a team schedule or a league scoreboard"""
+    id: str
+    name: str
+    date: datetime
+    state: str                 # 'pre', 'in' or 'post'
+    status: str                # ESPN status description, e.g. 'Final'
+    home: Competitor
+    away: Competitor
+
+    @property
+    def completed(self) -> bool:
+        return self.state == 'post'
+
+    @property
+    def live(self) -> bool:
+        return self.state == 'in'
+
+    def involves(self, team_name: str) -> bool:
+        team_name = team_name.lower()
+        return team_name in self.home.name.lower() or team_name in self.away.name.lower()
+
+    def sides(self, team_name: str) -> Tuple[Competitor, Competitor]:
+        """(team, opponent); the team is matched by name, defaulting to away"""
+        if team_name.lower() in self.home.name.lower():
+            return self.home, self.away
+        return self.away, self.home
+
+
+def _parse_score(value) -> Optional[int]:
+    if isinstance(value, dict):
+        value = value.get('value')
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_espn_event(event: Dict) -> Optional[ScheduleEvent]:
+    """ESPN schedule/scoreboard event -> ScheduleEvent, None if unusable"""
+    competition = (event.get('competitions') or [{}])[0]
+    try:
+        date = datetime.fromisoformat(event.get('date', '').replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    sides = {}
+    for comp in competition.get('competitors', []):
+        sides['home' if comp.get('homeAway') == 'home' else 'away'] = Competitor(
+            name=comp.get('team', {}).get('displayName', ''),
+            score=_parse_score(comp.get('score')),
+            winner=bool(comp.get('winner', False))
+        )
+    if len(sides) != 2:
+        return None
+
+    status = competition.get('status', {}).get('type', {})
+    state = status.get('state', '').lower()
+    if status.get('completed', False):
+        state = 'post'
+    elif status.get('name', '').lower() in ['in progress', 'halftime', 'live']:
+        state = 'in'
+
+    return ScheduleEvent(
+        id=str(event.get('id', '')),
+        name=event.get('name', 'Unknown Game'),
+        date=date,
+        state=state or 'pre',
+        status=status.get('description', 'Unknown'),
+        home=sides['home'],
+        away=sides['away']
+    )
+
+
+@dataclass(slots=True, frozen=True)
+class TeamSchedule:
+    """A team's season schedule, parsed once per download and shared by every consumer"""
+    team_id: str
+    league: str
+    team_name: str
+    events: Tuple[ScheduleEvent, ...]   # ascending by date
+
+    @classmethod
+    def from_espn(cls, team_info: Dict, data: Dict) -> 'TeamSchedule':
+        events = [parsed for parsed in map(parse_espn_event, data.get('events', [])) if parsed]
+        events.sort(key=lambda e: e.date)
+        return cls(team_info['id'], team_info['league'], team_info['name'], tuple(events))
+
+    def recent_results(self, limit: int = 5) -> List[Dict]:
+        """Last N completed games from this team's point of view, newest first"""
+        results = []
+        for event in reversed(self.events):
+            if len(results) >= limit:
+                break
+            if not event.completed:
+                continue
+            ours, theirs = event.sides(self.team_name)
+            our_score, their_score = ours.score or 0, theirs.score or 0
+            results.append({
+                'date': event.date.isoformat().replace('+00:00', 'Z'),
+                'opponent': theirs.name,
+                'home_away': 'home' if ours is event.home else 'away',
+                'score': f"{our_score}-{their_score}",
+                'result': 'W' if ours.winner else 'L',
+                'point_diff': our_score - their_score
+            })
+        return results
+
+
 class SportsDataService:
     """Service to fetch real-time sports data for bet analysis"""
     
@@ -174,80 +311,34 @@ class SportsDataService:
         if not team_info:
             return []
         
+        schedule = await SportsDataService.get_team_schedule(team_info)
+        return schedule.recent_results(limit) if schedule else []
+    
+    @staticmethod
+    async def get_team_schedule(team_info: Dict) -> Optional[TeamSchedule]:
+        """Parsed ESPN schedule for a team (cached, one in-flight fetch per team)"""
         cache_key = f"schedule_{team_info['id']}_{team_info['league']}"
-        if cache_key in _cache:
-            cached_entry = _cache[cache_key]
-            if isinstance(cached_entry, tuple) and len(cached_entry) == 2:
-                cached_data, cached_time = cached_entry
-                if datetime.now(timezone.utc) - cached_time < CACHE_DURATION:
-                    return cached_data[:limit]
-        
-        try:
-            url = f"{ESPN_API_BASE}/{team_info['sport']}/{team_info['league']}/teams/{team_info['id']}/schedule"
+        cached = SportsDataService._cached(cache_key)
+        if cached is not None:
+            return cached
+        
+        async with _fetch_lock(cache_key):
+            cached = SportsDataService._cached(cache_key)
+            if cached is not None:
+                return cached
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        events = data.get('events', [])
-                        
-                        recent_games = []
-                        for event in events:
-                            competition = event.get('competitions', [{}])[0]
-                            status = competition.get('status', {}).get('type', {})
-                            
-                            # Only include completed games
-                            if status.get('completed', False):
-                                competitors = competition.get('competitors', [])
-                                
-                                home_team = None
-                                away_team = None
-                                for comp in competitors:
-                                    # Handle score as either dict or int/string
-                                    score_val = comp.get('score', 0)
-                                    if isinstance(score_val, dict):
-                                        score_val = int(score_val.get('value', 0))
-                                    else:
-                                        try:
-                                            score_val = int(score_val) if score_val else 0
-                                        except (ValueError, TypeError):
-                                            score_val = 0
-                                    
-                                    team_data = {
-                                        'name': comp.get('team', {}).get('displayName', ''),
-                                        'score': score_val,
-                                        'winner': comp.get('winner', False)
-                                    }
-                                    
-                                    if comp.get('homeAway') == 'home':
-                                        home_team = team_data
-                                    else:
-                                        away_team = team_data
-                                
-                                if home_team and away_team:
-                                    # Determine if our team won
-                                    our_team_home = team_info['name'].lower() in home_team['name'].lower()
-                                    our_team = home_team if our_team_home else away_team
-                                    opponent = away_team if our_team_home else home_team
-                                    
-                                    game_result = {
-                                        'date': event.get('date', ''),
-                                        'opponent': opponent['name'],
-                                        'home_away': 'home' if our_team_home else 'away',
-                                        'score': f"{our_team['score']}-{opponent['score']}",
-                                        'result': 'W' if our_team['winner'] else 'L',
-                                        'point_diff': our_team['score'] - opponent['score']
-                                    }
-                                    recent_games.append(game_result)
-                        
-                        # Sort by date descending and take last N games
-                        recent_games.sort(key=lambda x: x['date'], reverse=True)
-                        _cache[cache_key] = (recent_games, datetime.now(timezone.utc))
-                        return recent_games[:limit]
-        except Exception as e:
-            logger.error(f"Error fetching recent games: {str(e)}")
-        
-        return []
+            try:
+                url = f"{ESPN_API_BASE}/{team_info['sport']}/{team_info['league']}/teams/{team_info['id']}/schedule"
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                        if response.status == 200:
+                            schedule = TeamSchedule.from_espn(team_info, await response.json())
+                            _cache[cache_key] = (schedule, datetime.now(timezone.utc))
+                            return schedule
+                        logger.error(f"ESPN schedule error for {team_info['name']}: {response.status}")
+            except Exception as e:
+                logger.error(f"Error fetching schedule for {team_info['name']}: {str(e)}")
+        return None
     
     @staticmethod
     async def get_team_stats(team_name: str) -> Optional[Dict]:
@@ -344,11 +435,32 @@ class SportsDataService:
         }
     
     @staticmethod
-    async def check_games_status(team_names: List[str]) -> Dict:
+    async def check_games_status(team_names: List[str], scoreboard=None) -> Dict:
         """
         Check if games involving these teams have already ended or are upcoming.
         Returns status info to warn users about expired bets.
+        Reads the live scoreboard feed when it is fresh (no network call),
+        otherwise the teams' schedules.
         """
+        if not team_names:
+            return SportsDataService.summarize_games_status([])
+        
+        try:
+            team_names = team_names[:2]  # Max 2 teams
+            events = scoreboard.events_for_teams(team_names) if scoreboard else None
+            if events is None:
+                team_infos = [info for info in map(SportsDataService.get_team_info, team_names) if info]
+                schedules = await asyncio.gather(*(SportsDataService.get_team_schedule(info) for info in team_infos))
+                events = [event for schedule in schedules if schedule for event in schedule.events]
+            return SportsDataService.summarize_games_status(events)
+        except Exception as e:
+            logger.error(f"Error checking games status: {str(e)}")
+        
+        return SportsDataService.summarize_games_status([])
+    
+    @staticmethod
+    def summarize_games_status(events: List[ScheduleEvent]) -> Dict:
+        """Expired / live / upcoming games (within a week) and the warning to show"""
         result = {
             'has_expired': False,
             'has_live': False,
@@ -357,85 +469,76 @@ class SportsDataService:
             'upcoming_games': [],
             'warning_message': None
         }
-        
-        if not team_names:
-            return result
-        
-        try:
-            # Check each team's schedule for game status
-            for team_name in team_names[:2]:  # Max 2 teams
-                team_info = SportsDataService.get_team_info(team_name)
-                if not team_info:
-                    continue
-                
-                url = f"{ESPN_API_BASE}/{team_info['sport']}/{team_info['league']}/teams/{team_info['id']}/schedule"
-                
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            events = data.get('events', [])
-                            
-                            now = datetime.now(timezone.utc)
-                            
-                            for event in events:
-                                competition = event.get('competitions', [{}])[0]
-                                status = competition.get('status', {}).get('type', {})
-                                event_date_str = event.get('date', '')
-                                event_name = event.get('name', 'Unknown Game')
-                                
-                                # Parse event date
-                                try:
-                                    if event_date_str:
-                                        event_date = datetime.fromisoformat(event_date_str.replace('Z', '+00:00'))
-                                    else:
-                                        continue
-                                except:
-                                    continue
-                                
-                                # Check game status
-                                is_completed = status.get('completed', False)
-                                is_in_progress = status.get('name', '').lower() in ['in progress', 'halftime', 'live']
-                                state = status.get('state', '').lower()
-                                
-                                game_info = {
-                                    'name': event_name,
-                                    'date': event_date_str,
-                                    'status': status.get('description', 'Unknown')
-                                }
-                                
-                                if is_completed or state == 'post':
-                                    # Check if it's a recent completed game (within last 7 days)
-                                    days_ago = (now - event_date).days
-                                    if 0 <= days_ago <= 7:
-                                        game_info['days_ago'] = days_ago
-                                        result['expired_games'].append(game_info)
-                                        result['has_expired'] = True
-                                        
-                                elif is_in_progress or state == 'in':
-                                    result['live_games'].append(game_info)
-                                    result['has_live'] = True
-                                    
-                                elif state == 'pre' and event_date > now:
-                                    # Upcoming game within next 7 days
-                                    days_until = (event_date - now).days
-                                    if days_until <= 7:
-                                        game_info['days_until'] = days_until
-                                        result['upcoming_games'].append(game_info)
+        now = datetime.now(timezone.utc)
+        
+        seen = set()
+        for event in events:
+            # Head-to-head games appear on both teams' schedules
+            if (event.name, event.date) in seen:
+                continue
+            seen.add((event.name, event.date))
+            
+            game_info = {
+                'name': event.name,
+                'date': event.date.isoformat().replace('+00:00', 'Z'),
+                'status': event.status
+            }
             
-            # Generate warning message
-            if result['has_expired'] and not result['upcoming_games']:
-                result['warning_message'] = "⚠️ This bet slip appears to contain games that have already ended. The analysis is for informational purposes only."
-            elif result['has_live']:
-                result['warning_message'] = "🔴 Live games detected! Some games on this slip are currently in progress."
-            elif result['has_expired'] and result['upcoming_games']:
-                result['warning_message'] = "⚠️ Some games on this slip may have already ended. Please verify game times."
+            if event.completed:
+                # Check if it's a recent completed game (within last 7 days)
+                days_ago = (now - event.date).days
+                if 0 <= days_ago <= 7:
+                    game_info['days_ago'] = days_ago
+                    result['expired_games'].append(game_info)
+                    result['has_expired'] = True
+                    
+            elif event.live:
+                result['live_games'].append(game_info)
+                result['has_live'] = True
                 
-        except Exception as e:
-            logger.error(f"Error checking games status: {str(e)}")
+            elif event.date > now:
+                # Upcoming game within next 7 days
+                days_until = (event.date - now).days
+                if days_until <= 7:
+                    game_info['days_until'] = days_until
+                    result['upcoming_games'].append(game_info)
+        
+        # Generate warning message
+        if result['has_expired'] and not result['upcoming_games']:
+            result['warning_message'] = "⚠️ This bet slip appears to contain games that have already ended. The analysis is for informational purposes only."
+        elif result['has_live']:
+            result['warning_message'] = "🔴 Live games detected! Some games on this slip are currently in progress."
+        elif result['has_expired'] and result['upcoming_games']:
+            result['warning_message'] = "⚠️ Some games on this slip may have already ended. Please verify game times."
         
         return result
     
+    @staticmethod
+    def prune_cache() -> int:
+        """Drop expired entries from the in-memory cache, returns number removed"""
+        now = datetime.now(timezone.utc)
+        expired = [
+            key for key, entry in _cache.items()
+            if not (isinstance(entry, tuple) and len(entry) == 2) or now - entry[1] >= CACHE_DURATION
+        ]
+        for key in expired:
+            _cache.pop(key, None)
+        return len(expired)
+    
+    @staticmethod
+    async def warm_odds_cache(sports: List[str]) -> Dict[str, int]:
+        """Fetch odds for each sport so requests in the next few minutes hit the cache"""
+        for sport in sports:
+            _cache.pop(f'odds_{sport}', None)
+        results = await asyncio.gather(
+            *(SportsDataService.get_live_odds(sport) for sport in sports),
+            return_exceptions=True
+        )
+        return {
+            sport: len(odds) if odds and not isinstance(odds, Exception) else 0
+            for sport, odds in zip(sports, results)
+        }
+    
     @staticmethod
     async def get_live_odds(sport: str = 'americanfootball_nfl') -> Optional[Dict]:
         """
@@ -445,39 +548,66 @@ class SportsDataService:
         cache_key = f'odds_{sport}'
         
         # Check cache first
-        if cache_key in _cache:
-            cached_data, cached_time = _cache[cache_key]
-            if datetime.now(timezone.utc) - cached_time < CACHE_DURATION:
-                logger.info(f"Using cached odds for {sport}")
-                return cached_data
+        cached = SportsDataService._cached(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached odds for {sport}")
+            return cached
         
         if not ODDS_API_KEY:
             logger.warning("ODDS_API_KEY not set, skipping live odds fetch")
             return None
         
-        try:
-            url = f'{ODDS_API_BASE}/sports/{sport}/odds/'
-            params = {
-                'apiKey': ODDS_API_KEY,
-                'regions': 'us',
-                'markets': 'h2h,spreads,totals',
-                'oddsFormat': 'american'
-            }
+        async with _fetch_lock(cache_key):
+            # A concurrent caller may have filled the cache while we waited
+            cached = SportsDataService._cached(cache_key)
+            if cached is not None:
+                return cached
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Cache the result
-                        _cache[cache_key] = (data, datetime.now(timezone.utc))
-                        logger.info(f"Fetched {len(data)} live odds for {sport}")
-                        return data
-                    else:
-                        logger.error(f"Odds API error: {response.status}")
-                        return None
-        except Exception as e:
-            logger.error(f"Error fetching odds: {str(e)}")
-            return None
+            try:
+                url = f'{ODDS_API_BASE}/sports/{sport}/odds/'
+                params = {
+                    'apiKey': ODDS_API_KEY,
+                    'regions': 'us',
+                    'markets': 'h2h,spreads,totals',
+                    'oddsFormat': 'american'
+                }
+                
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            # Cache the result
+                            _cache[cache_key] = (data, datetime.now(timezone.utc))
+                            logger.info(f"Fetched {len(data)} live odds for {sport}")
+                            return data
+                        else:
+                            logger.error(f"Odds API error: {response.status}")
+                            return None
+            except Exception as e:
+                logger.error(f"Error fetching odds: {str(e)}")
+                return None
+    
+    @staticmethod
+    async def get_odds_for_sports(sports: List[str]) -> List[Dict]:
+        """All games across several sports (cached feeds, fetched concurrently)"""
+        results = await asyncio.gather(
+            *(SportsDataService.get_live_odds(sport) for sport in sports),
+            return_exceptions=True
+        )
+        games = []
+        for odds in results:
+            if odds and not isinstance(odds, Exception):
+                games.extend(odds)
+        return games
+    
+    @staticmethod
+    def _cached(cache_key: str) -> Optional[Any]:
+        """Return a cached entry if still fresh"""
+        if cache_key in _cache:
+            cached_data, cached_time = _cache[cache_key]
+            if datetime.now(timezone.utc) - cached_time < CACHE_DURATION:
+                return cached_data
+        return None
     
     @staticmethod
     async def find_matching_games(team_names: List[str], sport: str = 'americanfootball_nfl') -> List[Dict]:
@@ -521,6 +651,15 @@ class SportsDataService:
         
         return found_teams
     
+    @staticmethod
+    def market_sports_for_team(team_name: str) -> List[str]:
+        """Odds feeds enrich_bet_analysis reads before reaching this team's sport"""
+        team_info = SportsDataService.get_team_info(team_name)
+        sport = LEAGUE_ODDS_SPORTS.get(team_info['league']) if team_info else None
+        if sport is None:
+            return list(MARKET_SPORTS)
+        return MARKET_SPORTS[:MARKET_SPORTS.index(sport) + 1]
+    
     @staticmethod
     async def enrich_bet_analysis(individual_bets: List[Dict], bet_details: str) -> Dict:
         """
@@ -540,43 +679,26 @@ class SportsDataService:
             return enrichment
         
         # Try to match with NFL first, then NBA, then MLB
-        sports_to_try = [
-            'americanfootball_nfl',
-            'basketball_nba', 
-            'baseball_mlb'
-        ]
-        
-        for sport in sports_to_try:
+        for sport in MARKET_SPORTS:
             matching_games = await SportsDataService.find_matching_games(team_names, sport)
             if matching_games:
                 enrichment['live_odds_available'] = True
                 
-                for game in matching_games:
+                # Consensus no-vig pricing over every bookmaker, all games in one pass
+                pricing = price_games(matching_games)
+                
+                for game, game_pricing in zip(matching_games, pricing):
+                    bookmakers = game.get('bookmakers', [])
                     game_context = {
                         'home_team': game.get('home_team'),
                         'away_team': game.get('away_team'),
                         'commence_time': game.get('commence_time'),
-                        'bookmakers_count': len(game.get('bookmakers', []))
+                        'bookmakers_count': len(bookmakers),
+                        'sport': sport,
+                        'pricing': game_pricing
                     }
                     
-                    # Analyze bookmaker consensus
-                    bookmakers = game.get('bookmakers', [])
                     if bookmakers:
-                        # Get average odds across bookmakers
-                        all_odds = []
-                        for bookmaker in bookmakers:
-                            for market in bookmaker.get('markets', []):
-                                for outcome in market.get('outcomes', []):
-                                    all_odds.append({
-                                        'bookmaker': bookmaker.get('title'),
-                                        'market': market.get('key'),
-                                        'team': outcome.get('name'),
-                                        'price': outcome.get('price'),
-                                        'point': outcome.get('point')
-                                    })
-                        
-                        game_context['odds_sample'] = all_odds[:5]  # First 5 for context
-                        
                         # Check for line movement (simplified)
                         if len(bookmakers) > 3:
                             enrichment['sharp_indicators'].append(
@@ -590,61 +712,9 @@ class SportsDataService:
         return enrichment
 
 
-async def get_enhanced_context_for_analysis(individual_bets: List[Dict], bet_details: str) -> str:
-    """
-    Get enhanced context string to add to AI prompt
-    Includes: live odds, team records, recent form, key stats
-    """
+async def get_market_context_lines(individual_bets: List[Dict], bet_details: str) -> List[str]:
+    """Real-time market section of the AI prompt: consensus fair odds and market indicators"""
     context_parts = []
-    
-    # Extract team names
-    team_names = SportsDataService.extract_team_names(bet_details)
-    
-    # Get enhanced team data for each team found
-    if team_names:
-        context_parts.append("\n\n📊 TEAM DATA & ANALYSIS:")
-        
-        for team_name in team_names[:2]:  # Limit to 2 teams
-            team_context = []
-            
-            # Get team record
-            record = await SportsDataService.get_team_record(team_name)
-            if record:
-                team_context.append(f"\n**{record['team_name']}**")
-                if record.get('overall'):
-                    team_context.append(f"  Record: {record['overall']}")
-                if record.get('home'):
-                    team_context.append(f"  Home: {record['home']} | Away: {record.get('away', 'N/A')}")
-                if record.get('standing'):
-                    team_context.append(f"  Standing: {record['standing']}")
-            
-            # Get recent games (form)
-            recent_games = await SportsDataService.get_recent_games(team_name, limit=5)
-            if recent_games:
-                form = SportsDataService.calculate_form_rating(recent_games)
-                team_context.append(f"  Last 5: {form['form']} ({form['rating']})")
-                team_context.append(f"  Recent margin: {'+' if form['avg_margin'] > 0 else ''}{form['avg_margin']} pts/game")
-                
-                # Show last 3 games
-                team_context.append("  Recent results:")
-                for game in recent_games[:3]:
-                    team_context.append(f"    {game['result']} vs {game['opponent']} ({game['score']})")
-            
-            # Get key stats
-            stats = await SportsDataService.get_team_stats(team_name)
-            if stats and stats.get('key_stats'):
-                key_stats = stats['key_stats']
-                team_context.append("  Key Stats:")
-                stat_count = 0
-                for stat_name, value in key_stats.items():
-                    if stat_count < 5:  # Limit to 5 most relevant stats
-                        team_context.append(f"    - {stat_name}: {value}")
-                        stat_count += 1
-            
-            if team_context:
-                context_parts.extend(team_context)
-    
-    # Get live odds data
     enrichment = await SportsDataService.enrich_bet_analysis(individual_bets, bet_details)
     
     if enrichment['live_odds_available']:
@@ -655,12 +725,10 @@ async def get_enhanced_context_for_analysis(individual_bets: List[Dict], bet_det
             context_parts.append(f"\nGame: {game_data['away_team']} @ {game_data['home_team']}")
             context_parts.append(f"Books offering: {game_data['bookmakers_count']}")
             
-            if game_data.get('odds_sample'):
-                context_parts.append("Current market odds sample:")
-                for odds in game_data['odds_sample'][:3]:
-                    context_parts.append(
-                        f"  - {odds['bookmaker']}: {odds['team']} {odds['market']} {odds.get('price', 'N/A')}"
-                    )
+            pricing_lines = format_pricing_context(game_data['pricing'])
+            if pricing_lines:
+                context_parts.append("Consensus fair odds (vig removed) and best available price:")
+                context_parts.extend(pricing_lines)
         
         # Add sharp indicators
         if enrichment['sharp_indicators']:
@@ -668,7 +736,4 @@ async def get_enhanced_context_for_analysis(individual_bets: List[Dict], bet_det
             for indicator in enrichment['sharp_indicators']:
                 context_parts.append(f"  - {indicator}")
     
-    if context_parts:
-        context_parts.append("\n\n⚠️ Use this data to adjust your probability assessment. Consider recent form, head-to-head history, and market sentiment.")
-    
-    return "\n".join(context_parts)
+    return context_parts
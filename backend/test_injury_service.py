@@ -9,8 +9,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
-from injury_weather_service import InjuryWeatherService, get_enhanced_game_context
-from sports_data_service import SportsDataService, get_enhanced_context_for_analysis
+from injury_weather_service import InjuryWeatherService
+from game_context import get_enhanced_context_for_analysis, get_enhanced_game_context
+from sports_data_service import SportsDataService
 
 async def test_injury_service():
     """Test ESPN Injury API integration"""
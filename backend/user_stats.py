@@ -0,0 +1,175 @@
+"""
+Per-user betting statistics for BetrSlip
+- Rollup document per user in the `user_stats` collection
+- Incremental updates when an analysis is stored or an outcome is marked
+- Single aggregation to (re)build a rollup from `bet_analyses`
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACKED_OUTCOMES = ["won", "lost", "push"]
+FOLLOWED_RECOMMENDATIONS = ["BET", "STRONG BET"]
+
+# Only these fields of an analysis affect the rollup
+ROLLUP_PROJECTION = {
+    "_id": 0,
+    "actual_outcome": 1,
+    "win_probability": 1,
+    "recommendation": 1,
+    "stake_amount": 1,
+    "payout_amount": 1
+}
+
+ROLLUP_COUNTERS = [
+    "total_tracked", "bets_won", "bets_lost", "bets_push",
+    "correct_predictions", "total_stake", "total_payout", "followed_recommendations"
+]
+
+
+def outcome_contribution(bet: Optional[dict]) -> Dict[str, float]:
+    """What a single analysis contributes to its owner's rollup counters"""
+    contribution = {counter: 0 for counter in ROLLUP_COUNTERS}
+    if not bet:
+        return contribution
+
+    outcome = bet.get('actual_outcome')
+    if outcome not in TRACKED_OUTCOMES:
+        return contribution
+
+    contribution["total_tracked"] = 1
+    contribution[f"bets_{outcome}"] = 1
+
+    # AI accuracy: predicted > 50% should win
+    if outcome != 'push':
+        predicted_win = (bet.get('win_probability') or 0) > 50
+        if predicted_win == (outcome == 'won'):
+            contribution["correct_predictions"] = 1
+
+    contribution["total_stake"] = bet.get('stake_amount') or 0
+    contribution["total_payout"] = bet.get('payout_amount') or 0
+
+    if bet.get('recommendation') in FOLLOWED_RECOMMENDATIONS and outcome == 'won':
+        contribution["followed_recommendations"] = 1
+
+    return contribution
+
+
+def user_stats_delta(before: Optional[dict], after: Optional[dict]) -> Dict[str, float]:
+    """Counter changes caused by an analysis going from `before` to `after`"""
+    old = outcome_contribution(before)
+    new = outcome_contribution(after)
+    return {k: new[k] - old[k] for k in ROLLUP_COUNTERS if new[k] != old[k]}
+
+
+async def apply_user_stats_delta(db, user_id: str, delta: Dict[str, float]):
+    """$inc the user's rollup with the given counter changes"""
+    delta = {k: v for k, v in delta.items() if v}
+    if not delta:
+        return
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$inc": delta},
+        upsert=True
+    )
+
+
+def user_stats_pipeline(user_id: str) -> list:
+    """Aggregation that computes a full rollup for one user server-side"""
+    is_tracked = {"$in": [{"$ifNull": ["$actual_outcome", None]}, TRACKED_OUTCOMES]}
+
+    def count_if(condition):
+        return {"$sum": {"$cond": [condition, 1, 0]}}
+
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$project": ROLLUP_PROJECTION},
+        {"$group": {
+            "_id": None,
+            "total_analyzed": {"$sum": 1},
+            "total_tracked": count_if(is_tracked),
+            "bets_won": count_if({"$eq": ["$actual_outcome", "won"]}),
+            "bets_lost": count_if({"$eq": ["$actual_outcome", "lost"]}),
+            "bets_push": count_if({"$eq": ["$actual_outcome", "push"]}),
+            "correct_predictions": count_if({"$or": [
+                {"$and": [{"$eq": ["$actual_outcome", "won"]}, {"$gt": ["$win_probability", 50]}]},
+                {"$and": [{"$eq": ["$actual_outcome", "lost"]}, {"$lte": [{"$ifNull": ["$win_probability", 0]}, 50]}]}
+            ]}),
+            "total_stake": {"$sum": {"$cond": [is_tracked, {"$ifNull": ["$stake_amount", 0]}, 0]}},
+            "total_payout": {"$sum": {"$cond": [is_tracked, {"$ifNull": ["$payout_amount", 0]}, 0]}},
+            "followed_recommendations": count_if({"$and": [
+                {"$eq": ["$actual_outcome", "won"]},
+                {"$in": ["$recommendation", FOLLOWED_RECOMMENDATIONS]}
+            ]})
+        }}
+    ]
+
+
+async def rebuild_user_stats(db, user_id: str) -> dict:
+    """Recompute a user's rollup from scratch with one aggregation"""
+    result = await db.bet_analyses.aggregate(user_stats_pipeline(user_id)).to_list(1)
+    rollup = result[0] if result else {}
+    rollup.pop("_id", None)
+
+    rollup = {
+        "total_analyzed": rollup.get("total_analyzed", 0),
+        **{counter: rollup.get(counter, 0) for counter in ROLLUP_COUNTERS},
+        "rebuilt_at": datetime.now(timezone.utc)
+    }
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$set": rollup},
+        upsert=True
+    )
+    return rollup
+
+
+async def get_user_rollup(db, user_id: str) -> dict:
+    """Read a user's rollup, building it on first access"""
+    rollup = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if not rollup or not rollup.get('rebuilt_at'):
+        rollup = await rebuild_user_stats(db, user_id)
+    return rollup
+
+
+def format_user_stats(rollup: dict) -> dict:
+    """Turn rollup counters into the /api/stats response"""
+    total_tracked = rollup.get("total_tracked", 0)
+    if not total_tracked:
+        return {
+            "total_analyzed": rollup.get("total_analyzed", 0) if rollup else 0,
+            "total_tracked": 0,
+            "accuracy_rate": 0,
+            "total_profit": 0,
+            "roi": 0,
+            "bets_won": 0,
+            "bets_lost": 0,
+            "bets_push": 0,
+            "followed_recommendations": 0
+        }
+
+    bets_won = rollup.get("bets_won", 0)
+    bets_lost = rollup.get("bets_lost", 0)
+    bets_push = rollup.get("bets_push", 0)
+    decided = total_tracked - bets_push
+    accuracy_rate = (rollup.get("correct_predictions", 0) / decided * 100) if decided > 0 else 0
+
+    total_stake = rollup.get("total_stake", 0)
+    total_profit = rollup.get("total_payout", 0) - total_stake
+    roi = (total_profit / total_stake * 100) if total_stake > 0 else 0
+
+    return {
+        "total_analyzed": rollup.get("total_analyzed", 0),
+        "total_tracked": total_tracked,
+        "accuracy_rate": round(accuracy_rate, 1),
+        "total_profit": round(total_profit, 2),
+        "roi": round(roi, 1),
+        "bets_won": bets_won,
+        "bets_lost": bets_lost,
+        "bets_push": bets_push,
+        "followed_recommendations": rollup.get("followed_recommendations", 0),
+        "win_rate": round((bets_won / (bets_won + bets_lost) * 100) if (bets_won + bets_lost) > 0 else 0, 1)
+    }
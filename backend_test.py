@@ -187,10 +187,12 @@ class BetAnalyzerAPITester:
         )
         
         if success:
-            if isinstance(response, list):
-                print(f"   History items: {len(response)}")
-                if response:
-                    first_item = response[0]
+            if isinstance(response, dict) and isinstance(response.get('items'), list):
+                items = response['items']
+                print(f"   History items: {len(items)}")
+                print(f"   Next cursor: {'yes' if response.get('next_cursor') else 'none'}")
+                if items:
+                    first_item = items[0]
                     print(f"   First item keys: {list(first_item.keys())}")
             else:
                 print(f"   Unexpected response type: {type(response)}")
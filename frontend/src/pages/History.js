@@ -12,7 +12,9 @@ const API = `${BACKEND_URL}/api`;
 
 const History = ({ onLogout }) => {
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [marking, setMarking] = useState({});
   const navigate = useNavigate();
 
@@ -23,7 +25,8 @@ const History = ({ onLogout }) => {
   const loadHistory = async () => {
     try {
       const response = await axios.get(`${API}/history`);
-      setHistory(response.data);
+      setHistory(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load history');
     } finally {
@@ -31,6 +34,20 @@ const History = ({ onLogout }) => {
     }
   };
 
+  const loadMoreHistory = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/history`, { params: { cursor: nextCursor } });
+      setHistory(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to load more history');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const markOutcome = async (betId, outcome, stake = null, payout = null) => {
     setMarking(prev => ({ ...prev, [betId]: true }));
     try {
@@ -144,12 +161,14 @@ const History = ({ onLogout }) => {
               >
                 {/* Image */}
                 <div className="aspect-video bg-slate-900 overflow-hidden">
-                  <img
-                    src={`data:image/jpeg;base64,${item.image_data}`}
-                    alt="Bet slip"
-                    className="w-full h-full object-cover"
-                    data-testid="history-item-image"
-                  />
+                  {item.thumbnail_data && (
+                    <img
+                      src={`data:image/jpeg;base64,${item.thumbnail_data}`}
+                      alt="Bet slip"
+                      className="w-full h-full object-cover"
+                      data-testid="history-item-image"
+                    />
+                  )}
                 </div>
 
                 {/* Content */}
@@ -173,26 +192,26 @@ const History = ({ onLogout }) => {
                   </p>
 
                   {/* Individual Bets Count */}
-                  {item.individual_bets && item.individual_bets.length > 0 && (
+                  {item.legs_count > 0 && (
                     <div className="bg-slate-900/70 rounded-sm p-2 text-center">
                       <p className="text-slate-400 text-xs">
-                        {item.individual_bets.length} bet{item.individual_bets.length > 1 ? 's' : ''} analyzed
+                        {item.legs_count} bet{item.legs_count > 1 ? 's' : ''} analyzed
                       </p>
                     </div>
                   )}
 
                   {/* Risk/Positive Indicators */}
                   <div className="flex gap-2 justify-center">
-                    {item.risk_factors && item.risk_factors.length > 0 && (
+                    {item.risk_count > 0 && (
                       <div className="flex items-center gap-1 text-xs text-red-400">
                         <AlertCircle className="w-3 h-3" />
-                        <span>{item.risk_factors.length} risks</span>
+                        <span>{item.risk_count} risks</span>
                       </div>
                     )}
-                    {item.positive_factors && item.positive_factors.length > 0 && (
+                    {item.positive_count > 0 && (
                       <div className="flex items-center gap-1 text-xs text-emerald-400">
                         <CheckCircle2 className="w-3 h-3" />
-                        <span>{item.positive_factors.length} positives</span>
+                        <span>{item.positive_count} positives</span>
                       </div>
                     )}
                   </div>
@@ -251,6 +270,20 @@ const History = ({ onLogout }) => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="text-center mt-8">
+            <Button
+              data-testid="load-more-history-btn"
+              variant="ghost"
+              disabled={loadingMore}
+              className="text-slate-300 hover:text-white hover:bg-violet-500/10"
+              onClick={loadMoreHistory}
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
       </main>
     </div>
   );
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The backend is a flat set of modules, imported the way server.py imports them
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+# Never pick up a real key or client from the environment during tests
+os.environ.setdefault('LLM_FAKE_MODEL', 'true')
@@ -0,0 +1,48 @@
+import pytest
+
+# analysis_pipeline builds its messages with emergentintegrations types
+pytest.importorskip("emergentintegrations")
+
+from analysis_pipeline import EXTRACTION_MIN_CONFIDENCE, _accept_extraction, extraction_confidence, extraction_legs  # noqa: E402
+from llm_gateway import FAKE_EXTRACTION  # noqa: E402
+
+HEADER = "SPORTSBOOK: FanDuel\nBET_TYPE: Straight\nTOTAL_STAKE: $20\nPOTENTIAL_PAYOUT: $38.18\n\n"
+
+
+def leg(team: str, odds: str) -> str:
+    return f"1. Team/Player: {team}\n   Bet Type: Moneyline\n   Odds: {odds}\n"
+
+
+def test_clean_extraction_scores_full():
+    assert extraction_legs(FAKE_EXTRACTION) == 2
+    assert extraction_confidence(FAKE_EXTRACTION) == 1.0
+    assert extraction_confidence(HEADER + leg("Dallas Cowboys", "-110")) == 1.0
+
+
+def test_no_selections_scores_zero():
+    assert extraction_confidence("") == 0.0
+    assert extraction_confidence(HEADER) == 0.0
+
+
+def test_missing_header_fields_cost_a_tenth_each():
+    text = "SPORTSBOOK: FanDuel\n" + leg("Dallas Cowboys", "-110")
+    assert extraction_confidence(text) == 0.7
+
+
+def test_unclear_and_unreadable_odds_cost_a_fifth_each():
+    assert extraction_confidence(HEADER + leg("Dallas [unclear]", "-110")) == 0.8
+    assert extraction_confidence(HEADER + leg("Dallas Cowboys", "+5O")) == 0.8
+    # A selection with no odds line at all
+    assert extraction_confidence(HEADER + "1. Team/Player: Dallas Cowboys\n") == 0.8
+
+
+def test_confident_parlays_are_accepted():
+    parlay = HEADER + "".join(leg(team, "-110") for team in ("Chiefs", "Bills", "Lions", "Eagles"))
+    assert extraction_legs(parlay) == 4
+    assert _accept_extraction(parlay)
+
+
+def test_shaky_reads_escalate():
+    shaky = HEADER + leg("Chiefs", "-11O") + leg("Bills [unclear]", "+150")
+    assert extraction_confidence(shaky) < EXTRACTION_MIN_CONFIDENCE
+    assert not _accept_extraction(shaky)
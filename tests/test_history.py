@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# server imports emergentintegrations at module level
+pytest.importorskip("emergentintegrations")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import server  # noqa: E402
+
+USER = {"user_id": "u1", "email": "u1@example.com"}
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def analysis(i: int) -> dict:
+    return {
+        "id": f"a{i}",
+        "user_id": USER['user_id'],
+        "bet_type": "Straight",
+        "recommendation": "TAKE",
+        "actual_outcome": "won",
+        "image_data": "aGk=",
+        "thumbnail_data": "aGk=",
+        "created_at": NOW - timedelta(hours=i),
+        "outcome_marked_at": NOW,
+        "settlement_checked_at": NOW,
+        "market_pricing": {"legs": [], "legs_total": 1, "legs_priced": 1, "priced_at": NOW},
+        "individual_bets": [{"description": "Chiefs ML", "result": "won", "settled_at": NOW}]
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock_motor.AsyncMongoMockClient()['history_test']
+    asyncio.run(database.bet_analyses.insert_many([analysis(i) for i in range(3)]))
+    monkeypatch.setattr(server, 'db', database)
+    return database
+
+
+def get(**kwargs) -> dict:
+    response = asyncio.run(server.get_bet_history(current_user=USER, **kwargs))
+    assert response.status_code == 200
+    return server.json.loads(response.body)
+
+
+def test_full_view_encodes_nested_datetimes(db):
+    page = get(view="full", limit=2)
+    first = page['items'][0]
+    assert first['id'] == 'a0'
+    assert 'image_data' not in first
+    assert first['market_pricing']['priced_at'].startswith('2026-10-19T12:00:00')
+    assert first['settlement_checked_at'].startswith('2026-10-19T12:00:00')
+    assert first['individual_bets'][0]['settled_at'].startswith('2026-10-19T12:00:00')
+
+    rest = get(view="full", limit=2, cursor=page['next_cursor'])
+    assert [item['id'] for item in rest['items']] == ['a2']
+    assert rest['next_cursor'] is None
+
+
+def test_summary_view(db):
+    page = get(limit=5)
+    assert [item['id'] for item in page['items']] == ['a0', 'a1', 'a2']
+    assert page['items'][0]['created_at'].startswith('2026-10-19T12:00:00')
+    assert 'market_pricing' not in page['items'][0]
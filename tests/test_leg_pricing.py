@@ -0,0 +1,78 @@
+import pytest
+
+from leg_pricing import match_game, parse_leg, price_legs, sport_hint
+
+
+def game(sport_key, home, away, *prices):
+    return {
+        "sport_key": sport_key,
+        "home_team": home,
+        "away_team": away,
+        "commence_time": "2026-10-25T17:00:00Z",
+        "bookmakers": [
+            {"key": f"book{b}", "title": f"Book {b}", "markets": [
+                {"key": "h2h", "outcomes": [{"name": home, "price": price[0]}, {"name": away, "price": price[1]}]},
+                {"key": "spreads", "outcomes": [
+                    {"name": home, "price": -110, "point": -3.5}, {"name": away, "price": -110, "point": 3.5}
+                ]}
+            ]}
+            for b, price in enumerate(prices)
+        ]
+    }
+
+
+GAMES = [
+    game("baseball_mlb", "San Francisco Giants", "Los Angeles Dodgers", (120, -140), (125, -145)),
+    game("americanfootball_nfl", "New York Giants", "Dallas Cowboys", (150, -170), (145, -165)),
+    game("americanfootball_nfl", "Kansas City Chiefs", "Las Vegas Raiders", (-200, 170), (-195, 165)),
+]
+
+
+@pytest.mark.parametrize("description, expected", [
+    ("Chiefs -3.5", {'market': 'spreads', 'line': -3.5, 'side': None}),
+    ("Over 47.5", {'market': 'totals', 'line': 47.5, 'side': 'Over'}),
+    ("Chiefs ML -200", {'market': 'h2h', 'line': None, 'side': None}),
+    ("Chiefs pk", {'market': 'spreads', 'line': 0.0, 'side': None}),
+    ("Mahomes over 2.5 passing touchdowns", None),
+])
+def test_parse_leg(description, expected):
+    assert parse_leg(description) == expected
+
+
+def test_shared_nickname_without_sport_is_not_matched():
+    assert match_game("Giants ML", GAMES) is None
+
+
+def test_sport_hint_resolves_shared_nickname():
+    assert match_game("Giants ML", GAMES, 'americanfootball_nfl') == (1, 0)
+    assert match_game("Giants ML", GAMES, 'baseball_mlb') == (0, 0)
+
+
+def test_full_name_beats_shared_nickname():
+    assert match_game("New York Giants +3", GAMES) == (1, 0)
+
+
+def test_line_belongs_to_the_team_before_it():
+    assert match_game("Raiders @ Chiefs -3.5", GAMES) == (2, 0)
+    assert match_game("Raiders +3.5 @ Chiefs", GAMES) == (2, 1)
+    # No line to anchor on: the first team named
+    assert match_game("Raiders vs Chiefs", GAMES) == (2, 1)
+    legs = price_legs([{"description": "Raiders @ Chiefs -3.5", "odds": "-110"}], GAMES)['legs']
+    assert legs[0]['selection'] == "Kansas City Chiefs"
+    legs = price_legs([{"description": "Raiders +3.5 @ Chiefs", "odds": "-110"}], GAMES)['legs']
+    assert legs[0]['selection'] == "Las Vegas Raiders"
+
+
+def test_sport_hint_sources():
+    assert sport_hint({"sport": "NFL", "description": "Giants ML"}) == 'americanfootball_nfl'
+    assert sport_hint({"sport": "baseball_mlb"}) == 'baseball_mlb'
+    assert sport_hint({"description": "NBA: Lakers -4"}) == 'basketball_nba'
+    assert sport_hint({"description": "Giants ML"}) is None
+
+
+def test_price_legs_uses_leg_sport():
+    summary = price_legs([{"description": "Giants ML", "sport": "MLB", "odds": "+120"}], GAMES)
+    leg = summary['legs'][0]
+    assert leg['matched']
+    assert leg['sport'] == 'baseball_mlb'
+    assert leg['selection'] == "San Francisco Giants"
@@ -0,0 +1,289 @@
+"""LLM gateway: concurrency limits, deadlines, retries and the circuit breaker, against FakeLLMClient"""
+
+import asyncio
+import base64
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import llm_gateway
+from llm_gateway import (
+    FAKE_EXTRACTION, CircuitBreaker, FakeLLMClient, LLMGateway, LLMTimeoutError, LLMUnavailableError
+)
+
+PROMPT = "EXTRACT ALL TEXT from this bet slip"
+
+
+class Tracker:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+
+class ScriptedClient(FakeLLMClient):
+    """FakeLLMClient that fails its first `failures` calls and records how many run at once"""
+
+    def __init__(self, tracker: Tracker, latency: float = 0.0, failures: int = 0, failure_rate: float = 0.0):
+        super().__init__("test_session", "system")
+        self.tracker = tracker
+        self.latency = latency
+        self.failures = failures
+        self.failure_rate = failure_rate
+
+    async def send_message(self, message) -> str:
+        self.tracker.calls += 1
+        self.tracker.active += 1
+        self.tracker.peak = max(self.tracker.peak, self.tracker.active)
+        try:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("fake model: 503 service unavailable")
+            return await super().send_message(message)
+        finally:
+            self.tracker.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(llm_gateway, 'LLM_RETRY_BASE_SECONDS', 0.01)
+    monkeypatch.setattr(llm_gateway, 'LLM_RETRY_MAX_SECONDS', 0.02)
+
+
+def make_gateway(**kwargs) -> LLMGateway:
+    kwargs.setdefault('client_factory', FakeLLMClient)
+    return LLMGateway(**kwargs)
+
+
+def test_per_user_limit():
+    gateway = make_gateway(max_concurrency=10, max_per_user=1)
+    tracker = Tracker()
+
+    async def run():
+        return await asyncio.gather(*(
+            gateway.call(ScriptedClient(tracker, latency=0.05), PROMPT, user_id="user-1") for _ in range(3)
+        ))
+
+    assert asyncio.run(run()) == [FAKE_EXTRACTION] * 3
+    assert tracker.peak == 1
+
+
+def test_global_limit_across_users():
+    gateway = make_gateway(max_concurrency=2, max_per_user=2)
+    tracker = Tracker()
+
+    async def run():
+        await asyncio.gather(*(
+            gateway.call(ScriptedClient(tracker, latency=0.05), PROMPT, user_id=f"user-{i}") for i in range(5)
+        ))
+
+    asyncio.run(run())
+    assert tracker.peak == 2
+    assert tracker.calls == 5
+
+
+def test_deadline_expires_while_queued():
+    gateway = make_gateway(max_concurrency=1)
+    tracker = Tracker()
+
+    async def run():
+        slow = asyncio.create_task(gateway.call(ScriptedClient(tracker, latency=0.3), PROMPT, user_id="user-1"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMTimeoutError):
+            await gateway.call(ScriptedClient(tracker), PROMPT, user_id="user-2", timeout=0.05)
+        return await slow
+
+    assert asyncio.run(run()) == FAKE_EXTRACTION
+    # The queued call never reached the model, and queueing says nothing about the provider
+    assert tracker.calls == 1
+    assert gateway.stats["timeouts"] == 1
+    assert gateway.breaker.state == 'closed'
+
+
+def test_transient_error_is_retried():
+    gateway = make_gateway(max_retries=2)
+    tracker = Tracker()
+    client = ScriptedClient(tracker, failures=1)
+
+    assert asyncio.run(gateway.call(client, PROMPT, timeout=5)) == FAKE_EXTRACTION
+    assert tracker.calls == 2
+    assert gateway.stats["retries"] == 1
+    assert gateway.stats["succeeded"] == 1
+
+
+def test_non_transient_error_is_not_retried():
+    class BadRequest(FakeLLMClient):
+        async def send_message(self, message):
+            raise ValueError("invalid image")
+
+    gateway = make_gateway(max_retries=2)
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.call(BadRequest("s", "system"), PROMPT))
+    assert gateway.stats["retries"] == 0
+    assert gateway.breaker.failures == 0
+
+
+def test_breaker_opens_then_half_open_allows_one_probe():
+    gateway = make_gateway(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, cooldown=0.1))
+    tracker = Tracker()
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await gateway.call(ScriptedClient(tracker, failure_rate=1.0), PROMPT)
+        assert gateway.breaker.state == 'open'
+        with pytest.raises(LLMUnavailableError):
+            await gateway.call(ScriptedClient(tracker), PROMPT)
+
+        await asyncio.sleep(0.15)
+        # Half open: the first call is the probe, a concurrent one is turned away
+        return await asyncio.gather(
+            gateway.call(ScriptedClient(tracker, latency=0.05), PROMPT),
+            gateway.call(ScriptedClient(tracker, latency=0.05), PROMPT),
+            return_exceptions=True
+        )
+
+    probe, concurrent = asyncio.run(run())
+    assert probe == FAKE_EXTRACTION
+    assert isinstance(concurrent, LLMUnavailableError)
+    assert gateway.breaker.state == 'closed'
+    assert tracker.calls == 3
+    assert gateway.stats["rejected"] == 2
+
+
+def test_failed_probe_reopens_breaker():
+    gateway = make_gateway(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, cooldown=0.05))
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await gateway.call(ScriptedClient(Tracker(), failure_rate=1.0), PROMPT)
+        await asyncio.sleep(0.06)
+        with pytest.raises(ConnectionError):
+            await gateway.call(ScriptedClient(Tracker(), failure_rate=1.0), PROMPT)
+
+    asyncio.run(run())
+    assert gateway.breaker.state == 'open'
+
+
+def test_slot_drops_idle_user_semaphores():
+    gateway = make_gateway(max_concurrency=1, max_per_user=1)
+    tracker = Tracker()
+
+    async def run():
+        await asyncio.gather(*(
+            gateway.call(ScriptedClient(tracker, latency=0.01), PROMPT, user_id=f"user-{i % 2}") for i in range(4)
+        ))
+        # A call that times out in the queue cleans up too
+        slow = asyncio.create_task(gateway.call(ScriptedClient(tracker, latency=0.2), PROMPT, user_id="user-a"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMTimeoutError):
+            await gateway.call(ScriptedClient(tracker), PROMPT, user_id="user-b", timeout=0.02)
+        await slow
+
+    asyncio.run(run())
+    assert gateway._users == {}
+    assert gateway._user_waiters == {}
+    assert gateway.in_flight == 0
+    assert gateway.queued == 0
+
+
+def test_streaming_reports_growing_text():
+    gateway = make_gateway()
+    client = FakeLLMClient("s", "system")
+    client.latency = 0
+    seen = []
+
+    text = asyncio.run(gateway.call(client, PROMPT, on_text=seen.append))
+    assert text == FAKE_EXTRACTION
+    assert len(seen) > 1
+    assert seen[-1] == FAKE_EXTRACTION
+    assert all(later.startswith(earlier) for earlier, later in zip(seen, seen[1:]))
+
+
+# ===== LITELLM CLIENT =====
+
+class Chunk:
+    def __init__(self, text):
+        self.choices = [type('Choice', (), {'delta': type('Delta', (), {'content': text})()})()]
+
+
+class FakeLiteLLM:
+    """Stand-in for the litellm module: streams `replies` in chunks, optionally dropping the first stream midway"""
+
+    def __init__(self, replies, drop_first: bool = False):
+        self.replies = list(replies)
+        self.drop_first = drop_first
+        self.requests = []
+
+    async def acompletion(self, **kwargs):
+        self.requests.append(kwargs)
+        reply = self.replies[0]
+        drop = self.drop_first and len(self.requests) == 1
+        if not drop:
+            self.replies.pop(0)
+
+        async def stream():
+            for i in range(0, len(reply), 4):
+                if drop and i >= 8:
+                    raise ConnectionError("connection reset by peer")
+                yield Chunk(reply[i:i + 4])
+        return stream()
+
+
+@pytest.fixture
+def fake_litellm(monkeypatch):
+    def install(replies, drop_first=False):
+        module = FakeLiteLLM(replies, drop_first)
+        monkeypatch.setitem(sys.modules, 'litellm', module)
+        return module
+    return install
+
+
+def test_default_client_is_emergent(monkeypatch):
+    monkeypatch.setattr(llm_gateway, 'LLM_FAKE_MODEL', False)
+    monkeypatch.setattr(llm_gateway, 'LLM_CLIENT', 'emergent')
+    assert LLMGateway().client_factory is llm_gateway.emergent_client_factory
+    monkeypatch.setattr(llm_gateway, 'LLM_CLIENT', 'litellm')
+    assert LLMGateway().client_factory is llm_gateway.LiteLLMStreamingClient
+
+
+def test_litellm_stream_keeps_history(fake_litellm):
+    module = fake_litellm(["first answer here", "second answer"])
+    client = llm_gateway.LiteLLMStreamingClient("s", "system prompt", "openai", "gpt-4o-mini")
+
+    async def run():
+        chunks = [chunk async for chunk in client.stream_message("hello")]
+        return "".join(chunks), await client.send_message("again")
+
+    first, second = asyncio.run(run())
+    assert (first, second) == ("first answer here", "second answer")
+    assert module.requests[0]['model'] == "openai/gpt-4o-mini"
+    assert module.requests[0]['stream'] is True
+    assert [m['role'] for m in module.requests[1]['messages']] == ['system', 'user', 'assistant', 'user']
+    assert client.messages[-1] == {"role": "assistant", "content": "second answer"}
+
+
+def test_litellm_stream_retry_starts_clean(fake_litellm):
+    module = fake_litellm(["a complete streamed answer"], drop_first=True)
+    client = llm_gateway.LiteLLMStreamingClient("s", "system")
+    seen = []
+
+    text = asyncio.run(make_gateway(max_retries=1).call(client, "hello", timeout=5, on_text=seen.append))
+    assert text == "a complete streamed answer"
+    assert len(module.requests) == 2
+    # The dropped stream left no trace in the conversation
+    assert module.requests[1]['messages'] == [{"role": "system", "content": "system"}, {"role": "user", "content": "hello"}]
+    assert [m['role'] for m in client.messages] == ['system', 'user', 'assistant']
+    assert seen[-1] == text
+
+
+def test_litellm_labels_images_by_content(fake_litellm):
+    module = fake_litellm(["ok"])
+    client = llm_gateway.LiteLLMStreamingClient("s", "system")
+    png = base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'\0' * 16).decode()
+    # Shaped like emergentintegrations' UserMessage / ImageContent
+    message = SimpleNamespace(text="read this", file_contents=[SimpleNamespace(image_base64=png)])
+    asyncio.run(client.send_message(message))
+    image = module.requests[0]['messages'][1]['content'][1]
+    assert image['image_url']['url'].startswith("data:image/png;base64,")
@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pytest
+
+from odds_math import (
+    american_to_decimal, american_to_decimal_array, calculate_expected_value, calculate_kelly_criterion,
+    convert_odds_batch, decimal_to_american, decimal_to_american_array, decimal_to_implied_prob,
+    parlay_decimal, parse_american, parse_american_array, probability_to_american_odds, to_json_list
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("+150", 150.0), ("-110", -110.0), ("EVEN", 100.0), (" evs ", 100.0), (200, 200.0), (-105.0, -105.0)
+])
+def test_parse_american(value, expected):
+    assert parse_american(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "abc", "+50", 99, True, None, float('nan'), float('inf')])
+def test_parse_american_rejects(value):
+    with pytest.raises(ValueError):
+        parse_american(value)
+
+
+def test_american_decimal_round_trip():
+    assert american_to_decimal("+150") == pytest.approx(2.5)
+    assert american_to_decimal("-200") == pytest.approx(1.5)
+    for odds in (-500, -110, 100, 120, 900):
+        assert decimal_to_american(american_to_decimal(odds)) == pytest.approx(odds)
+    with pytest.raises(ValueError):
+        decimal_to_american(1.0)
+
+
+def test_array_variants_match_scalars():
+    american = [-300, -110, 100, 145, 1000]
+    decimal = american_to_decimal_array(american)
+    assert decimal == pytest.approx([american_to_decimal(a) for a in american])
+    assert decimal_to_american_array(decimal) == pytest.approx(american)
+
+
+def test_parse_american_array_reports_errors():
+    odds, errors = parse_american_array(["-110", "junk", 150, "+20"])
+    assert odds[0] == -110 and odds[2] == 150
+    assert np.isnan(odds[1]) and np.isnan(odds[3])
+    assert [index for index, _ in errors] == [1, 3]
+
+
+def test_kelly_and_ev():
+    # Fair coin at +100: no edge
+    assert calculate_kelly_criterion(50, 2.0) == 0
+    assert calculate_expected_value(50, 2.0) == pytest.approx(0)
+    # 60% at +100: Kelly 20%, EV +20%
+    assert calculate_kelly_criterion(60, 2.0) == pytest.approx(20)
+    assert calculate_expected_value(60, 2.0) == pytest.approx(20)
+    # Capped
+    assert calculate_kelly_criterion(95, 3.0) == 25.0
+
+
+def test_implied_probability_and_odds_strings():
+    assert decimal_to_implied_prob(2.0) == pytest.approx(50)
+    assert probability_to_american_odds(60) == "-150"
+    assert probability_to_american_odds(25) == "+300"
+    with pytest.raises(ValueError):
+        probability_to_american_odds(100)
+
+
+def test_parlay_decimal():
+    assert parlay_decimal([2.0, 1.5, 1.9]) == pytest.approx(5.7)
+
+
+def test_to_json_list_replaces_nan():
+    assert to_json_list(np.array([1.23456, np.nan]), 2) == [1.23, None]
+
+
+def test_convert_odds_batch():
+    result = convert_odds_batch(["-110", "+150", "bad"], 'american', [55, 40, 50])
+    assert result['count'] == 3
+    assert result['decimal'][:2] == [pytest.approx(1.9091, abs=1e-4), 2.5]
+    assert result['american'][2] is None
+    assert result['errors'][0]['index'] == 2
+    assert result['expected_value'][1] == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize("win_probabilities", [[55], [55, 101], [-1, 50], [math.nan, 50]])
+def test_convert_odds_batch_validates_win_probabilities(win_probabilities):
+    with pytest.raises(ValueError):
+        convert_odds_batch([-110, 150], 'american', win_probabilities)
+
+
+def test_convert_odds_batch_unknown_format():
+    with pytest.raises(ValueError):
+        convert_odds_batch([1.5], 'fractional')
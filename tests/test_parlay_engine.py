@@ -0,0 +1,95 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from parlay_engine import LegSet, best_subset, parlay_distribution, round_robin_distribution, teaser_distribution
+
+
+def brute_force_parlay(win, push, odds):
+    """Enumerate every loss/push/win combination of independent legs"""
+    p_win = p_push = expected = 0.0
+    for outcome in product(range(3), repeat=len(win)):
+        prob = np.prod([(1 - w - p, p, w)[o] for o, w, p in zip(outcome, win, push)])
+        if 0 in outcome:
+            continue
+        payout = np.prod([odds[i] for i, o in enumerate(outcome) if o == 2])
+        expected += prob * payout
+        if all(o == 1 for o in outcome):
+            p_push += prob
+        else:
+            p_win += prob
+    return p_win, p_push, expected
+
+
+def test_parlay_matches_brute_force():
+    win, push, odds = [0.55, 0.48, 0.6], [0.0, 0.04, 0.02], [1.91, 2.05, 1.8]
+    legs = LegSet.from_arrays([w * 100 for w in win], odds, [p * 100 for p in push])
+    result = parlay_distribution(legs)
+    p_win, p_push, expected = brute_force_parlay(win, push, odds)
+
+    assert result['win_probability'] == pytest.approx(p_win * 100, abs=0.01)
+    assert result['push_probability'] == pytest.approx(p_push * 100, abs=0.01)
+    assert result['win_probability'] + result['push_probability'] + result['loss_probability'] == pytest.approx(100, abs=0.02)
+    assert result['expected_value'] == pytest.approx((expected - 1) * 100, abs=0.01)
+
+
+def test_independent_parlay_is_product_of_legs():
+    legs = LegSet.from_arrays([50, 50], [2.0, 2.0])
+    result = parlay_distribution(legs)
+    assert result['win_probability'] == pytest.approx(25)
+    assert result['decimal_odds'] == 4.0
+    assert result['expected_value'] == pytest.approx(0)
+
+
+def test_full_correlation_moves_legs_together():
+    legs = LegSet.from_arrays([60, 60], [1.8, 1.8], groups=["g", "g"], correlation=1.0)
+    result = parlay_distribution(legs)
+    # Comonotone legs with equal probabilities win or lose together
+    assert result['win_probability'] == pytest.approx(60)
+    assert result['independent_win_probability'] == pytest.approx(36)
+
+
+def test_teaser_refunds_below_min_legs():
+    legs = LegSet.from_arrays([70, 70], [1.91, 1.91], [10, 10])
+    result = teaser_distribution(legs)
+    total = result['win_probability'] + result['push_probability'] + result['loss_probability']
+    assert total == pytest.approx(100, abs=0.01)
+    # Both legs must win for a two-leg teaser to pay
+    assert result['win_probability'] == pytest.approx(49, abs=0.01)
+
+
+def test_round_robin_expected_return():
+    legs = LegSet.from_arrays([50, 50, 50], [2.0, 2.0, 2.0])
+    result = round_robin_distribution(legs, [2])
+    by_size = result['sizes'][0]
+    assert by_size['parlays'] == 3
+    # Fair legs: each parlay returns its stake on average
+    assert by_size['expected_return_units'] == pytest.approx(3)
+    with pytest.raises(ValueError):
+        round_robin_distribution(legs, [4])
+
+
+def test_best_subset_picks_highest_ev_legs():
+    legs = LegSet.from_arrays([50, 60, 40, 55], [2.0, 2.0, 2.0, 2.0])
+    result = best_subset(legs, 2)
+    assert result['indices'] == [1, 3]
+
+
+def test_from_arrays_validates():
+    with pytest.raises(ValueError):
+        LegSet.from_arrays([50, 50], [2.0])
+    with pytest.raises(ValueError):
+        LegSet.from_arrays([80], [2.0], [30])
+    with pytest.raises(ValueError):
+        LegSet.from_arrays([50], [1.0])
+
+
+def test_from_bets_tolerates_unreadable_odds():
+    legs = LegSet.from_bets([
+        {"description": "Chiefs -3", "odds": "-110", "individual_probability": 55},
+        {"description": "Over 47.5", "odds": "n/a"}
+    ])
+    assert legs.win_prob.tolist() == [0.55, 0.5]
+    assert np.isnan(legs.decimal_odds[1])
+    assert parlay_distribution(legs)['expected_value'] is None
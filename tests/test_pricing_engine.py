@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from pricing_engine import (
+    MARKET_INDEX, build_market_tensor, modal_line, price_games, price_markets, price_outcome, remove_vig
+)
+
+
+def book(key, spread=None, total=None, h2h=(-150, 130)):
+    markets = [{"key": "h2h", "outcomes": [
+        {"name": "Kansas City Chiefs", "price": h2h[0]}, {"name": "Buffalo Bills", "price": h2h[1]}
+    ]}]
+    if spread is not None:
+        markets.append({"key": "spreads", "outcomes": [
+            {"name": "Kansas City Chiefs", "price": -110, "point": spread},
+            {"name": "Buffalo Bills", "price": -110, "point": -spread}
+        ]})
+    if total is not None:
+        markets.append({"key": "totals", "outcomes": [
+            {"name": "Over", "price": -105, "point": total}, {"name": "Under", "price": -115, "point": total}
+        ]})
+    return {"key": key, "title": key.title(), "markets": markets}
+
+
+def game(*bookmakers):
+    return {
+        "home_team": "Kansas City Chiefs",
+        "away_team": "Buffalo Bills",
+        "commence_time": "2026-10-25T17:00:00Z",
+        "bookmakers": list(bookmakers)
+    }
+
+
+def test_remove_vig_multiplicative_sums_to_one():
+    implied = np.array([[1 / 1.91, 1 / 1.91], [0.6, 0.45]])
+    fair = remove_vig(implied)
+    assert fair.sum(axis=-1) == pytest.approx([1, 1])
+    assert fair[0] == pytest.approx([0.5, 0.5])
+
+
+def test_remove_vig_shin_favours_the_favourite_less():
+    implied = np.array([0.8, 0.28])
+    multiplicative = remove_vig(implied)
+    shin = remove_vig(implied, 'shin')
+    assert shin.sum() == pytest.approx(1, abs=1e-6)
+    # Shin puts more of the margin on the longshot
+    assert shin[1] < multiplicative[1]
+
+
+def test_tensor_shape_and_missing_quotes():
+    tensor = build_market_tensor([game(book("dk", spread=-3), book("fd"))])
+    assert tensor.decimal_odds.shape == (1, 2, 3, 2)
+    assert np.isnan(tensor.points[0, 1, MARKET_INDEX['spreads'], 0])
+    assert tensor.decimal_odds[0, 0, MARKET_INDEX['h2h'], 0] == pytest.approx(1 + 100 / 150)
+
+
+def test_modal_line_is_always_a_quoted_line():
+    # Two books at -3, two at -3.5: a median would say -3.25
+    points = np.array([-3, -3.5, -3.5, -3])
+    assert modal_line(points, axis=0) in (-3, -3.5)
+    assert modal_line(np.array([-3, -3.5, -3.5, -4]), axis=0) == -3.5
+    assert np.isnan(modal_line(np.array([np.nan, np.nan]), axis=0))
+
+
+def test_price_markets_uses_modal_line():
+    games = [game(book("a", spread=-3), book("b", spread=-3.5), book("c", spread=-3.5), book("d", spread=-3))]
+    pricing = price_markets(build_market_tensor(games))
+    m = MARKET_INDEX['spreads']
+    assert pricing.line[0, m, 0] in (-3, -3.5)
+    assert pricing.book_count[0, m] == 2
+    assert pricing.fair_prob[0, m] == pytest.approx([0.5, 0.5])
+
+
+def test_price_outcome_at_requested_line():
+    games = [game(book("a", total=47.5), book("b", total=47.5), book("c", total=48.5))]
+    tensor = build_market_tensor(games)
+    over = price_outcome(tensor, 0, 'totals', 0, line=47.5)
+    assert over['books'] == 2
+    assert over['line'] == 47.5
+    # Over -105 / Under -115: the over is the underdog
+    assert 0.47 < over['fair_prob'] < 0.5
+    assert price_outcome(tensor, 0, 'totals', 0, line=48.5) is None
+
+
+def test_price_outcome_without_line_uses_consensus():
+    games = [game(book("a", spread=-3), book("b", spread=-3), book("c", spread=-3.5))]
+    result = price_outcome(build_market_tensor(games), 0, 'spreads', 1)
+    assert result['line'] == 3
+    assert result['books'] == 2
+
+
+def test_price_games_summary():
+    summary = price_games([game(book("a", h2h=(-150, 130)), book("b", h2h=(-140, 120)))])[0]
+    h2h = summary['markets']['h2h']
+    assert h2h['books'] == 2
+    home, away = h2h['outcomes']
+    assert home['name'] == "Kansas City Chiefs"
+    assert home['fair_prob'] + away['fair_prob'] == pytest.approx(100, abs=0.2)
+    assert away['best_book'] == "A"
+    # Markets quoted by fewer than MIN_BOOKS books are left out
+    assert 'spreads' not in summary['markets']
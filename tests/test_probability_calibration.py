@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from probability_calibration import (
+    GRID_SIZE, ProbabilityCalibrator, build_calibration_map, fit_isotonic, fit_platt, save_calibration_map
+)
+
+
+def test_isotonic_pools_adjacent_violators():
+    p = np.array([0.1, 0.2, 0.3, 0.4])
+    y = np.array([0, 1, 0, 1])
+    table = fit_isotonic(p, y)
+    assert len(table) == GRID_SIZE + 1
+    assert np.all(np.diff(table) >= -1e-12)
+    # The violating pair (0.2 -> 1, 0.3 -> 0) is pooled to 0.5 at its mean prediction 0.25
+    assert table[250] == pytest.approx(0.5)
+    assert table[100] == pytest.approx(0.0)
+    assert table[400] == pytest.approx(1.0)
+
+
+def test_isotonic_keeps_monotone_data():
+    p = np.array([0.2, 0.4, 0.6, 0.8])
+    y = np.array([0, 0, 1, 1])
+    table = fit_isotonic(p, y)
+    assert table[200] == 0 and table[800] == 1
+
+
+def test_platt_recovers_calibrated_probabilities():
+    rng = np.random.default_rng(7)
+    p = rng.uniform(0.05, 0.95, 20000)
+    y = (rng.uniform(size=p.size) < p).astype(float)
+    table = fit_platt(p, y)
+    # Already calibrated: the map stays close to the identity
+    assert table[300] == pytest.approx(0.3, abs=0.03)
+    assert table[700] == pytest.approx(0.7, abs=0.03)
+    assert np.all(np.diff(table) > 0)
+
+
+def test_platt_shrinks_overconfident_probabilities():
+    rng = np.random.default_rng(11)
+    true_p = rng.uniform(0.3, 0.7, 20000)
+    y = (rng.uniform(size=true_p.size) < true_p).astype(float)
+    # Reported probabilities are twice as far from 50% as the truth
+    reported = np.clip(0.5 + 2 * (true_p - 0.5), 0.01, 0.99)
+    table = fit_platt(reported, y)
+    assert 0.55 < table[800] < 0.7
+
+
+def samples(n, rng):
+    p = rng.uniform(20, 80, n)
+    won = rng.uniform(size=n) < (p / 100) ** 1.5
+    return [{"probability": float(pi), "won": bool(w), "legs": 1 if i % 2 else 3} for i, (pi, w) in enumerate(zip(p, won))]
+
+
+def test_build_calibration_map_and_calibrate(tmp_path):
+    rng = np.random.default_rng(3)
+    artifact = build_calibration_map(samples(400, rng), 'isotonic')
+    assert set(artifact['maps']) == {'default', 'legs:1', 'legs:3'}
+    assert artifact['maps']['default']['brier_after'] <= artifact['maps']['default']['brier_before']
+
+    path = tmp_path / 'calibration_map.json'
+    save_calibration_map(artifact, path)
+    calibrator = ProbabilityCalibrator(path)
+    assert calibrator.version == artifact['version']
+    calibrated = calibrator.calibrate(60.0, legs=3)
+    table = artifact['maps']['legs:3']['table']
+    assert calibrated == round(table[600] * 100, 1)
+
+
+def test_build_calibration_map_needs_enough_samples():
+    with pytest.raises(ValueError):
+        build_calibration_map([{"probability": 50, "won": True}] * 10)
+    with pytest.raises(ValueError):
+        build_calibration_map(samples(400, np.random.default_rng(1)), 'beta')
+
+
+def test_calibrator_is_identity_without_a_valid_map(tmp_path):
+    assert ProbabilityCalibrator(tmp_path / 'missing.json').calibrate(63.0) == 63.0
+    bad = tmp_path / 'bad.json'
+    bad.write_text(json.dumps({"grid_size": 10, "maps": {}}))
+    assert ProbabilityCalibrator(bad).calibrate(63.0) == 63.0
@@ -0,0 +1,71 @@
+import pytest
+
+import prompt_builder
+from prompt_builder import TRUNCATION_MARKER, PromptSection, build_prompt, estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def length_estimator(monkeypatch):
+    # chars/4 keeps the token arithmetic below exact, whether or not tiktoken is installed
+    monkeypatch.setattr(prompt_builder, '_encodings', {})
+
+
+def lines(prefix: str, count: int, width: int = 39) -> str:
+    return "\n".join(f"{prefix}{i:03d}".ljust(width, '.') for i in range(count))
+
+
+def test_fits_without_trimming():
+    built = build_prompt([PromptSection('slip', 'a' * 40), PromptSection('context', 'b' * 40, priority=1)], budget=100)
+    assert built.text == 'a' * 40 + "\n" + 'b' * 40
+    assert built.trimmed == []
+    assert built.estimator == 'chars/4'
+    assert built.tokens == estimate_tokens(built.text)
+
+
+def test_empty_sections_are_skipped():
+    built = build_prompt([PromptSection('slip', 'abc'), PromptSection('weather', '', priority=2)], budget=100)
+    assert built.text == 'abc'
+    assert 'weather' not in built.sections
+
+
+def test_summary_used_before_cutting():
+    sections = [
+        PromptSection('slip', 'x' * 200),
+        PromptSection('injuries', lines('injury', 20), priority=1, summary='injuries: 20 players out')
+    ]
+    built = build_prompt(sections, budget=80)
+    assert built.sections == {'slip': 'full', 'injuries': 'summarized'}
+    assert 'injuries: 20 players out' in built.text
+    assert built.tokens <= 80
+
+
+def test_least_important_section_goes_first():
+    sections = [
+        PromptSection('slip', 'x' * 200),
+        PromptSection('odds', lines('odds', 10), priority=1),
+        PromptSection('weather', lines('weather', 10), priority=3),
+    ]
+    built = build_prompt(sections, budget=160)
+    assert built.sections['slip'] == 'full'
+    assert built.sections['odds'] == 'full'
+    assert built.sections['weather'] in ('truncated', 'dropped')
+    assert built.tokens <= 160
+
+
+def test_truncation_keeps_whole_lines():
+    sections = [PromptSection('slip', 'x' * 40), PromptSection('news', lines('news', 20), priority=1)]
+    built = build_prompt(sections, budget=60)
+    assert built.sections['news'] == 'truncated'
+    news = built.text.split("\n", 1)[1]
+    assert news.endswith(TRUNCATION_MARKER)
+    kept = news.split("\n")[:-1]
+    assert kept and all(len(line) == 39 for line in kept)
+    assert built.tokens <= 60
+
+
+def test_required_sections_are_never_trimmed():
+    sections = [PromptSection('slip', 'x' * 400), PromptSection('extra', 'y' * 40, priority=1)]
+    built = build_prompt(sections, budget=50)
+    assert built.sections == {'slip': 'full', 'extra': 'dropped'}
+    assert built.text == 'x' * 400
+    assert built.tokens > built.budget
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from scheduler import CronSchedule, _parse_cron_field
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("spec, low, high, expected", [
+    ("*", 0, 5, {0, 1, 2, 3, 4, 5}),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("1-5", 0, 23, {1, 2, 3, 4, 5}),
+    ("10-20/5", 0, 59, {10, 15, 20}),
+    ("3,7,9", 0, 23, {3, 7, 9}),
+    ("5/20", 0, 59, {5, 25, 45}),
+])
+def test_parse_cron_field(spec, low, high, expected):
+    assert _parse_cron_field(spec, low, high) == expected
+
+
+@pytest.mark.parametrize("spec", ["60", "5-2", "*/0", "a", "-1"])
+def test_parse_cron_field_rejects(spec):
+    with pytest.raises(ValueError):
+        _parse_cron_field(spec, 0, 59)
+
+
+def test_expression_needs_five_fields():
+    with pytest.raises(ValueError):
+        CronSchedule("0 14 * *")
+
+
+def test_next_after_is_strictly_later():
+    schedule = CronSchedule("0 14 * * *")
+    assert schedule.next_after(utc(2026, 10, 19, 13, 59, 30)) == utc(2026, 10, 19, 14, 0)
+    assert schedule.next_after(utc(2026, 10, 19, 14, 0)) == utc(2026, 10, 20, 14, 0)
+
+
+def test_every_quarter_hour():
+    schedule = CronSchedule("*/15 * * * *")
+    assert schedule.next_after(utc(2026, 12, 31, 23, 50)) == utc(2027, 1, 1, 0, 0)
+
+
+def test_weekday_only():
+    # 2026-10-19 is a Monday; 5 = Friday
+    assert CronSchedule("30 9 * * 5").next_after(utc(2026, 10, 19)) == utc(2026, 10, 23, 9, 30)
+    # 7 is Sunday too
+    assert CronSchedule("0 0 * * 7").next_after(utc(2026, 10, 19)) == utc(2026, 10, 25, 0, 0)
+
+
+def test_day_and_weekday_restricted_match_either():
+    # Classic cron: the 1st of the month OR a Friday
+    schedule = CronSchedule("0 12 1 * 5")
+    assert schedule.next_after(utc(2026, 10, 19)) == utc(2026, 10, 23, 12, 0)
+    assert schedule.next_after(utc(2026, 10, 30, 13)) == utc(2026, 11, 1, 12, 0)
+
+
+@pytest.mark.parametrize("expression", ["0 9 1-31 * 1", "0 9 */1 * 1"])
+def test_full_range_day_field_counts_as_unrestricted(expression):
+    # Only Mondays, not "any day of the month or a Monday"
+    assert CronSchedule(expression).next_after(utc(2026, 10, 20)) == utc(2026, 10, 26, 9, 0)
+
+
+def test_full_range_weekday_field_counts_as_unrestricted():
+    # Only the 13th, not "the 13th or any weekday"
+    assert CronSchedule("0 9 13 * 0-6").next_after(utc(2026, 10, 19)) == utc(2026, 11, 13, 9, 0)
+
+
+def test_month_and_leap_day():
+    assert CronSchedule("0 0 29 2 *").next_after(utc(2026, 3, 1)) == utc(2028, 2, 29, 0, 0)
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(utc(2026, 1, 1))
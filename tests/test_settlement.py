@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import settlement
+from settlement import find_event, grade_leg, leg_spec, settle_batch, slip_outcome
+from sports_data_service import Competitor, ScheduleEvent, SportsDataService, TeamSchedule
+
+PLACED = datetime(2026, 10, 18, 15, 0, tzinfo=timezone.utc)
+
+
+def event(home, away, home_score=None, away_score=None, hours=2, state='post'):
+    date = PLACED + timedelta(hours=hours)
+    return ScheduleEvent(
+        f"{away}@{home}:{hours}", f"{away} at {home}", date, state, 'Final',
+        Competitor(home, home_score, bool(home_score and away_score is not None and home_score > away_score)),
+        Competitor(away, away_score, bool(away_score and home_score is not None and away_score > home_score))
+    )
+
+
+def spec(market, line=None, side=None, opponent=None, commence_time=None):
+    return {'team': None, 'opponent': opponent, 'market': market, 'line': line, 'side': side, 'commence_time': commence_time}
+
+
+CHIEFS_WIN = event("Kansas City Chiefs", "Las Vegas Raiders", 27, 24)
+
+
+# ===== LEG SPECS =====
+
+@pytest.mark.parametrize("bet", [
+    {"description": "Giants ML", "sport": "MLB"},
+    {"description": "Cardinals -1.5", "sport": "baseball_mlb"},
+    {"description": "Kings ML", "sport": "NHL"},
+    # Sport unknown: a shared nickname is never guessed
+    {"description": "Giants ML"},
+])
+def test_non_nfl_nba_legs_are_not_graded(bet):
+    assert leg_spec(bet, None) is None
+
+
+def test_leg_sport_picks_the_league_table():
+    nfl = leg_spec({"description": "Giants ML", "sport": "NFL"}, None)
+    assert nfl['team']['name'] == "New York Giants" and nfl['team']['league'] == 'nfl'
+    assert nfl['market'] == 'h2h'
+    nba = leg_spec({"description": "NBA: Knicks -4.5"}, None)
+    assert nba['team']['league'] == 'nba' and nba['line'] == -4.5
+
+
+def priced(game, sport, market='h2h', selection=None, line=None):
+    return {'matched': True, 'game': game, 'sport': sport, 'market': market,
+            'selection': selection, 'line': line, 'commence_time': '2026-10-18T17:00:00Z'}
+
+
+def test_priced_leg_uses_its_sport():
+    bet = {"description": "Panthers ML"}
+    nhl = priced("Boston Bruins @ Florida Panthers", 'icehockey_nhl', selection="Florida Panthers")
+    assert leg_spec(bet, nhl) is None
+    nfl = priced("Atlanta Falcons @ Carolina Panthers", 'americanfootball_nfl', selection="Carolina Panthers")
+    result = leg_spec(bet, nfl)
+    assert result['team']['name'] == "Carolina Panthers"
+    assert result['opponent'] == "Atlanta Falcons"
+
+
+def test_priced_total_grades_from_the_home_team():
+    leg = priced("Las Vegas Raiders @ Kansas City Chiefs", 'americanfootball_nfl', 'totals', 'Over', 47.5)
+    result = leg_spec({"description": "Over 47.5"}, leg)
+    assert result['team']['name'] == "Kansas City Chiefs"
+    assert result['side'] == 'Over' and result['line'] == 47.5
+
+
+# ===== GRADING =====
+
+@pytest.mark.parametrize("leg, expected", [
+    (spec('h2h'), 'won'),
+    (spec('spreads', -3.5), 'lost'),
+    (spec('spreads', -3.0), 'push'),
+    (spec('spreads', -2.5), 'won'),
+    (spec('totals', 51.0, 'Over'), 'push'),
+    (spec('totals', 51.0, 'Under'), 'push'),
+    (spec('totals', 50.5, 'Over'), 'won'),
+    (spec('totals', 50.5, 'Under'), 'lost'),
+    (spec('totals', 50.5), None),
+    (spec('spreads'), None),
+])
+def test_grade_leg(leg, expected):
+    assert grade_leg(leg, CHIEFS_WIN, "Kansas City Chiefs") == expected
+
+
+def test_grade_leg_from_the_away_side():
+    assert grade_leg(spec('spreads', 3.0), CHIEFS_WIN, "Las Vegas Raiders") == 'push'
+    assert grade_leg(spec('h2h'), CHIEFS_WIN, "Las Vegas Raiders") == 'lost'
+
+
+def test_unfinished_game_is_not_graded():
+    live = event("Kansas City Chiefs", "Las Vegas Raiders", 14, 10, state='in')
+    assert grade_leg(spec('h2h'), live, "Kansas City Chiefs") is None
+
+
+@pytest.mark.parametrize("results, expected", [
+    (['won', 'won'], 'won'),
+    (['won', 'push'], 'won'),
+    (['push', 'push'], 'push'),
+    (['push', 'lost'], 'lost'),
+    # A loss decides the slip even with legs still open
+    (['lost', None], 'lost'),
+    (['won', None], None),
+    (['push', None], None),
+    ([], None),
+])
+def test_slip_outcome(results, expected):
+    assert slip_outcome(results) == expected
+
+
+# ===== GAME MATCHING =====
+
+def schedule(*events):
+    return TeamSchedule('13', 'nba', "Los Angeles Lakers", tuple(events))
+
+
+def test_untimed_leg_needs_a_single_game_in_the_window():
+    only = event("Los Angeles Lakers", "Boston Celtics", 110, 100, hours=4)
+    far = event("Los Angeles Lakers", "Denver Nuggets", 120, 90, hours=72)
+    assert find_event(schedule(only, far), spec('h2h'), PLACED) is only
+
+
+def test_untimed_leg_on_a_back_to_back_stays_pending():
+    first = event("Los Angeles Lakers", "Boston Celtics", 110, 100, hours=4)
+    second = event("Los Angeles Lakers", "Denver Nuggets", 90, 120, hours=28)
+    assert find_event(schedule(first, second), spec('h2h'), PLACED) is None
+
+
+def test_known_start_time_or_opponent_resolves_a_back_to_back():
+    first = event("Los Angeles Lakers", "Boston Celtics", 110, 100, hours=4)
+    second = event("Los Angeles Lakers", "Denver Nuggets", 90, 120, hours=28)
+    timed = spec('h2h', commence_time=second.date.isoformat())
+    assert find_event(schedule(first, second), timed, PLACED) is second
+    assert find_event(schedule(first, second), spec('h2h', opponent="Denver Nuggets"), PLACED) is second
+
+
+# ===== WORKER =====
+
+def test_settle_batch_grades_nfl_and_skips_namesakes(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()['settlement_test']
+    giants = TeamSchedule('19', 'nfl', "New York Giants", (event("New York Giants", "Dallas Cowboys", 20, 17),))
+
+    async def get_team_schedule(info):
+        assert info['league'] == 'nfl'
+        return giants
+    monkeypatch.setattr(SportsDataService, 'get_team_schedule', staticmethod(get_team_schedule))
+
+    analyses = [
+        {"id": "nfl", "user_id": "u1", "created_at": PLACED, "actual_outcome": None,
+         "individual_bets": [{"description": "Giants ML", "sport": "NFL"}]},
+        {"id": "mlb", "user_id": "u1", "created_at": PLACED, "actual_outcome": None,
+         "individual_bets": [{"description": "Giants ML", "sport": "MLB"}]},
+    ]
+
+    async def run():
+        await db.bet_analyses.insert_many([dict(a) for a in analyses])
+        result = await settle_batch(db, analyses, PLACED + timedelta(days=1))
+        return result, {doc['id']: doc async for doc in db.bet_analyses.find({})}
+
+    result, docs = asyncio.run(run())
+    assert result['settled'] == 1 and result['skipped'] == 1 and result['schedules_fetched'] == 1
+    assert docs['nfl']['actual_outcome'] == 'won'
+    assert docs['mlb']['actual_outcome'] is None
+    assert docs['mlb']['settlement_skipped'] == 'unsupported'
+    assert settlement.SETTLEMENT_LEAGUES.keys() == {'americanfootball_nfl', 'basketball_nba'}